@@ -1,5 +1,6 @@
-from typing import Dict, List, Tuple
-from ..pfai.types import Event
+from typing import Dict, Iterable, List, Tuple, Union
+import numpy as np
+from ..pfai.types import Event, EventTable, as_event_table
 from ..features.patterns import (
     is_neighbor_turn,
     is_repeat_reartic,
@@ -9,34 +10,40 @@ from ..features.patterns import (
 from ..pfai.config import ModelConfig as mc
 
 def collect_margin_notes(
-    events: List[Event],
+    events: Union[EventTable, Iterable[Event]],
     fingering: Dict[int, List[int]],
     cfg: mc,
     hand_label: str
 ) -> List[Tuple[float, str]]:
     """
     Emits short pedagogical notes whenever a rollover fired or a walkthrough was avoided.
+    Only single notes are considered; fingered chord members are ignored.
     """
     notes: List[Tuple[float, str]] = []
-    seq = [e for e in events if e.idx in fingering]
-    seq.sort(key=lambda e: e.time)
+    table = as_event_table(events)
+    rows = table.positions(np.fromiter(fingering, dtype=np.int64, count=len(fingering)))
+    rows = np.sort(rows[rows >= 0])
+    rows = rows[~table.is_chord[rows]]
+    rows = rows[np.argsort(table.time[rows], kind="stable")]
+    idx = table.idx[rows].tolist()
+    pitch = table.pitch[rows].tolist()
+    time = table.time[rows].tolist()
+    finger = [fingering[k][0] for k in idx]
 
-    for i in range(2, len(seq)):
-        e2, e1, e0 = seq[i-2], seq[i-1], seq[i]
-        f2, f1, f0 = fingering[e2.idx][0], fingering[e1.idx][0], fingering[e0.idx][0]
+    for i in range(2, len(idx)):
+        p2, p1, p0 = pitch[i-2], pitch[i-1], pitch[i]
+        f2, f1, f0 = finger[i-2], finger[i-1], finger[i]
 
-        if is_neighbor_turn(e2.pitch, e1.pitch, e0.pitch, cfg) or is_repeat_reartic(e2.pitch, e1.pitch, e0.pitch, cfg):
+        if is_neighbor_turn(p2, p1, p0, cfg) or is_repeat_reartic(p2, p1, p0, cfg):
             if (f2, f1, f0) == (1, 2, 1):
-                notes.append((e0.time, f"Rollover 1–2–1 ({hand_label})"))
+                notes.append((time[i], f"Rollover 1–2–1 ({hand_label})"))
             elif (f2, f1, f0) == (1, 3, 1):
-                notes.append((e0.time, f"Rollover 1–3–1 ({hand_label})"))
+                notes.append((time[i], f"Rollover 1–3–1 ({hand_label})"))
             elif is_consecutive_walkthrough(f2, f1, f0):
-                notes.append((e0.time, f"Avoided walk‑through ({hand_label})"))
+                notes.append((time[i], f"Avoided walk‑through ({hand_label})"))
 
-    for i in range(1, len(seq)):
-        e_prev, e_cur = seq[i-1], seq[i]
-        f_cur = fingering[e_cur.idx][0]
-        if is_large_leap(e_prev.pitch, e_cur.pitch, cfg):
-            notes.append((e_prev.time, f"Move early ({hand_label})"))
-            notes.append((e_cur.time, f"Aim {f_cur} ({hand_label})"))
+    for i in range(1, len(idx)):
+        if is_large_leap(pitch[i-1], pitch[i], cfg):
+            notes.append((time[i-1], f"Move early ({hand_label})"))
+            notes.append((time[i], f"Aim {finger[i]} ({hand_label})"))
     return notes
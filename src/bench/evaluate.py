@@ -0,0 +1,132 @@
+"""
+Quality and speed of the decoders against human fingerings.
+
+A corpus of fingered MusicXML scores (see
+:func:`~..rules.learning.load_corpus`) is decoded under every combination
+of engine and configuration, one job per staff of each score, on a process
+pool. Each job reports:
+
+===============  ==========================================================
+``agreement``    fraction of the annotated notes decoded with the reference finger
+``cost_gap``     model cost of the decoded fingering minus the reference's
+                 (negative: the model prefers its own fingering)
+``optimum_gap``  model cost of the decoded fingering minus the exact optimum
+                 (``"numpy"`` engine); 0 for every exact engine
+``events_per_sec``  notes fingered per second of decoding
+===============  ==========================================================
+
+Costs are those of the monophonic model on the staff's single notes. A
+partially fingered staff is compared against the cheapest fingering that
+agrees with every annotated finger. Rows are summed over the corpus per
+configuration, engine and staff, so a speedup can be gated on its rows
+matching the exact engine's.
+"""
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from ..pfai.config import HandProfile, ModelConfig
+from ..rules.learning import Example
+
+class Run(NamedTuple):
+    """One decoder setting to evaluate: a labelled configuration and an engine."""
+    label: str
+    profile: HandProfile
+    cfg: ModelConfig
+    engine: str
+
+class JobResult(NamedTuple):
+    matches: int
+    notes: int        # annotated notes
+    events: int       # notes fingered by the engine
+    seconds: float    # best decode time
+    cost: float
+    reference_cost: float
+    optimum_cost: float
+
+def _evaluate_job(example: Example, run: Run, repeat: int = 1) -> JobResult:
+    """Decodes one staff under one run; the decode is timed ``repeat`` times. Runs in the pool workers."""
+    from ..decoding.incremental import decode_incremental
+    from ..decoding.second_order_dp import decode_monophonic_second_order, fingering_cost
+
+    seq, staff, profile, cfg = example.seq, example.staff, run.profile, run.cfg
+    seconds = float("inf")
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        fingering = decode_monophonic_second_order(seq, profile, cfg, staff, engine=run.engine)
+        seconds = min(seconds, time.perf_counter() - t0)
+    optimum = fingering if run.engine == "numpy" else decode_monophonic_second_order(seq, profile, cfg, staff)
+    reference = decode_incremental(seq, profile, cfg, staff, pins=example.reference)
+    matches = sum(fingering.get(k, [None])[0] == f for k, f in example.reference.items())
+    return JobResult(
+        matches=matches,
+        notes=len(example.reference),
+        events=len(fingering),
+        seconds=seconds,
+        cost=fingering_cost(seq, fingering, profile, cfg, staff),
+        reference_cost=fingering_cost(seq, reference, profile, cfg, staff),
+        optimum_cost=fingering_cost(seq, optimum, profile, cfg, staff),
+    )
+
+def evaluate(
+    examples: List[Example],
+    runs: Sequence[Run],
+    workers: Optional[int] = None,
+    executor: Optional[Executor] = None,
+    repeat: int = 1,
+) -> List[dict]:
+    """
+    Evaluates every run on every example and returns one row per run and
+    staff, in the order of ``runs``. ``workers`` > 1 starts a process pool
+    for the call, or pass ``executor`` to reuse one; decode times are then
+    measured on busy cores.
+    """
+    jobs = [(example, run) for run in runs for example in examples]
+    own_pool = None
+    if executor is None and workers is not None and workers > 1 and len(jobs) > 1:
+        own_pool = executor = ProcessPoolExecutor(max_workers=min(workers, len(jobs)))
+    try:
+        if executor is None:
+            results = [_evaluate_job(example, run, repeat) for example, run in jobs]
+        else:
+            results = list(executor.map(_evaluate_job, *zip(*jobs), [repeat] * len(jobs)))
+    finally:
+        if own_pool is not None:
+            own_pool.shutdown()
+
+    totals: Dict[Tuple[str, str, int], dict] = {}
+    for (example, run), r in zip(jobs, results):
+        row = totals.setdefault((run.label, run.engine, example.staff), {
+            "config": run.label, "engine": run.engine, "staff": example.staff, "files": 0, "notes": 0,
+            "matches": 0, "cost_gap": 0.0, "optimum_gap": 0.0, "events": 0, "seconds": 0.0,
+        })
+        row["files"] += 1
+        row["notes"] += r.notes
+        row["matches"] += r.matches
+        row["cost_gap"] += r.cost - r.reference_cost
+        row["optimum_gap"] += r.cost - r.optimum_cost
+        row["events"] += r.events
+        row["seconds"] += r.seconds
+    rows = []
+    for row in totals.values():
+        matches = row.pop("matches")
+        row["agreement"] = matches / row["notes"] if row["notes"] else 1.0
+        row["events_per_sec"] = row["events"] / row["seconds"] if row["seconds"] > 0 else float("inf")
+        rows.append(row)
+    return rows
+
+def gate(rows: List[dict], max_drop: float, tolerance: float = 1e-9) -> List[dict]:
+    """
+    Rows that lose quality against the first engine evaluated under the same
+    configuration and staff: agreement lower by more than ``max_drop``, or
+    a higher cost (beyond ``tolerance``).
+    """
+    first: Dict[Tuple[str, int], dict] = {}
+    failed = []
+    for row in rows:
+        base = first.setdefault((row["config"], row["staff"]), row)
+        if row is base:
+            continue
+        if row["agreement"] < base["agreement"] - max_drop or row["optimum_gap"] > base["optimum_gap"] + tolerance:
+            failed.append(row)
+    return failed
@@ -0,0 +1,204 @@
+"""
+Throughput benchmarks for the fingering pipeline.
+
+Each case is a score file: the bundled Moonlight sonata movement and
+synthetic monophonic streams (see :mod:`.synthetic`) at several sizes. Every
+stage is timed on its own, with its inputs prepared outside the timer:
+
+==============  ==========================================================
+``parse``       :func:`~..io.musicxml.load_score`
+``extract``     :func:`~..io.musicxml.extract_monophonic_events`
+``read_events`` :func:`~..io.musicxml_stream.read_events`
+``decode``      :func:`~..decoding.second_order_dp.decode_monophonic_second_order`, both staves
+``margin_notes`` :func:`~..annotate.notes.collect_margin_notes`, both staves
+``write``       :func:`~..io.musicxml.write_fingerings_and_notes` on a parsed score
+``write_xml``   :func:`~..io.musicxml_stream.write_fingerings_xml`
+==============  ==========================================================
+
+music21 stages are skipped for cases above ``music21_limit`` events; a stage
+that raises is recorded under ``failed`` and the rest still run. Results
+are plain JSON so they can be kept as baselines and compared later.
+"""
+import os
+import platform
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from ..pfai.config import DEFAULT_CONFIG, PROFILE_M
+from .synthetic import write_synthetic_score
+
+MOONLIGHT = Path(__file__).resolve().parents[2] / "Sonate No. 14 Moonlight 3rd Movement.musicxml"
+SCALES = {"1k": 1_000, "10k": 10_000, "100k": 100_000}
+STAGES = ("parse", "extract", "read_events", "decode", "margin_notes", "write", "write_xml")
+MUSIC21_STAGES = frozenset({"parse", "extract", "write"})
+DEFAULT_MUSIC21_LIMIT = 5_000
+DEFAULT_THRESHOLD = 0.25
+# Differences below this are treated as timer noise whatever the ratio.
+DEFAULT_MIN_SECONDS = 0.005
+
+def parse_scale(label: str) -> int:
+    """``"10k"`` -> 10000; plain integers are accepted too."""
+    label = label.strip().lower()
+    if label.endswith("k"):
+        return int(float(label[:-1]) * 1_000)
+    return int(label)
+
+def prepare_cases(scales: Sequence[str], workdir: str, moonlight: bool = True) -> List[Tuple[str, str]]:
+    """``(case name, score path)`` for Moonlight (if bundled) and one synthetic score per scale."""
+    cases = []
+    if moonlight and MOONLIGHT.exists():
+        cases.append(("moonlight", str(MOONLIGHT)))
+    for label in scales:
+        n = parse_scale(label)
+        path = os.path.join(workdir, f"synthetic-{label}.musicxml")
+        cases.append((f"synthetic-{label}", write_synthetic_score(path, n, seed=n)))
+    return cases
+
+def _time(fn: Callable[[], object], repeat: int, setup: Optional[Callable[[], None]] = None) -> dict:
+    runs = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - t0)
+    return {"best": min(runs), "median": statistics.median(runs), "runs": runs}
+
+def run_case(path: str, repeat: int = 3, music21_limit: int = DEFAULT_MUSIC21_LIMIT,
+             stages: Sequence[str] = STAGES) -> dict:
+    """Times each requested stage on one score."""
+    from ..annotate.notes import collect_margin_notes
+    from ..decoding.second_order_dp import decode_monophonic_second_order
+    from ..io.musicxml_stream import read_events_with_ordinals, write_fingerings_xml
+
+    events, ordinals = read_events_with_ordinals(path)
+    staves = sorted(set(events.staff.tolist()))
+    labels = {1: "RH", 2: "LH"}
+    result: Dict[str, object] = {"path": path, "events": len(events), "stages": {}, "skipped": [], "failed": {}}
+    timings = result["stages"]
+
+    def decode():
+        return {s: decode_monophonic_second_order(events, PROFILE_M, DEFAULT_CONFIG, s) for s in staves}
+
+    def margin_notes():
+        notes = []
+        for s in staves:
+            notes += [(t, text, s) for t, text in
+                      collect_margin_notes(events, by_staff[s], DEFAULT_CONFIG, labels.get(s, f"staff {s}"))]
+        return notes
+
+    by_staff = decode()
+    fingering = {k: v for s in staves for k, v in by_staff[s].items()}
+    notes = margin_notes()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, "out.musicxml")
+        for stage in stages:
+            if stage in MUSIC21_STAGES and len(events) > music21_limit:
+                result["skipped"].append(stage)
+                continue
+            try:
+                if stage == "read_events":
+                    timings[stage] = _time(lambda: read_events_with_ordinals(path), repeat)
+                elif stage == "decode":
+                    timings[stage] = _time(decode, repeat)
+                elif stage == "margin_notes":
+                    timings[stage] = _time(margin_notes, repeat)
+                elif stage == "write_xml":
+                    timings[stage] = _time(lambda: write_fingerings_xml(path, out, fingering, notes, ordinals), repeat)
+                else:
+                    timings[stage] = _time_music21_stage(stage, path, out, fingering, notes, repeat)
+            except Exception as exc:
+                # e.g. music21 cannot export some imported editions; keep timing the other stages.
+                result["failed"][stage] = f"{type(exc).__name__}: {exc}"
+    return result
+
+def _time_music21_stage(stage: str, path: str, out: str, fingering, notes, repeat: int) -> dict:
+    from ..io.musicxml import ScorePipeline, extract_monophonic_events, load_score, write_fingerings_and_notes
+
+    if stage == "parse":
+        return _time(lambda: load_score(path), repeat)
+    if stage == "extract":
+        score = load_score(path)
+        return _time(lambda: extract_monophonic_events(score), repeat)
+    # write: every run gets a freshly parsed score so annotations never pile up.
+    pipeline: List[ScorePipeline] = []
+
+    def setup():
+        pipeline[:] = [ScorePipeline(path)]
+        pipeline[0].extract()
+    return _time(lambda: write_fingerings_and_notes(path, out, fingering, notes, pipeline=pipeline[0]),
+                 repeat, setup)
+
+def run_suite(cases: Sequence[Tuple[str, str]], repeat: int = 3, music21_limit: int = DEFAULT_MUSIC21_LIMIT,
+              stages: Sequence[str] = STAGES, progress: Optional[Callable[[str], None]] = None) -> dict:
+    """Runs every case and returns the results document (see :func:`compare`)."""
+    import numpy as np
+
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+            "repeat": repeat,
+            "music21_limit": music21_limit,
+        },
+        "cases": {},
+    }
+    for name, path in cases:
+        if progress is not None:
+            progress(name)
+        results["cases"][name] = run_case(path, repeat, music21_limit, stages)
+    return results
+
+def compare(baseline: dict, current: dict, threshold: float = DEFAULT_THRESHOLD,
+            min_seconds: float = DEFAULT_MIN_SECONDS) -> List[dict]:
+    """
+    One row per (case, stage) timed in both documents, comparing best-of
+    times. A row regresses when it is more than ``threshold`` (a fraction)
+    slower than the baseline and the difference exceeds ``min_seconds``.
+    """
+    rows = []
+    for case, cur in current["cases"].items():
+        base = baseline["cases"].get(case)
+        if base is None:
+            continue
+        for stage, timing in cur["stages"].items():
+            if stage not in base["stages"]:
+                continue
+            before, after = base["stages"][stage]["best"], timing["best"]
+            ratio = after / before if before > 0 else float("inf")
+            rows.append({
+                "case": case,
+                "stage": stage,
+                "baseline": before,
+                "current": after,
+                "ratio": ratio,
+                "regressed": ratio > 1 + threshold and after - before > min_seconds,
+            })
+    return rows
+
+def format_results(results: dict) -> str:
+    lines = [f"{'case':<20} {'events':>8} {'stage':<13} {'best s':>10} {'median s':>10} {'us/event':>10}"]
+    for case, res in results["cases"].items():
+        for stage, t in res["stages"].items():
+            per_event = 1e6 * t["best"] / max(1, res["events"])
+            lines.append(f"{case:<20} {res['events']:>8} {stage:<13} {t['best']:>10.4f} {t['median']:>10.4f} "
+                         f"{per_event:>10.2f}")
+        if res["skipped"]:
+            lines.append(f"{case:<20} {res['events']:>8} skipped: {', '.join(res['skipped'])}")
+        for stage, error in res.get("failed", {}).items():
+            lines.append(f"{case:<20} {res['events']:>8} {stage:<13} failed: {error.splitlines()[0][:60]}")
+    return "\n".join(lines)
+
+def format_comparison(rows: List[dict]) -> str:
+    lines = [f"{'case':<20} {'stage':<13} {'baseline s':>11} {'current s':>11} {'ratio':>7}"]
+    for r in rows:
+        flag = "  REGRESSION" if r["regressed"] else ""
+        lines.append(f"{r['case']:<20} {r['stage']:<13} {r['baseline']:>11.4f} {r['current']:>11.4f} "
+                     f"{r['ratio']:>7.2f}{flag}")
+    return "\n".join(lines)
@@ -0,0 +1,93 @@
+"""
+Synthetic monophonic scores for benchmarks and scale tests.
+
+Streams are built from short figures that exercise every cost term: slurred
+stepwise runs, staccato repeated notes, neighbor turns (which open rollover
+windows) and leaps wider than an octave (which trigger margin notes). The
+result is written as a one-staff MusicXML file in 4/4 quarter notes, so the
+readers, decoder and writers all see it exactly like a real score.
+"""
+import random
+from typing import List, Tuple
+
+_NAMES = [("C", 0), ("C", 1), ("D", 0), ("D", 1), ("E", 0), ("F", 0),
+          ("F", 1), ("G", 0), ("G", 1), ("A", 0), ("A", 1), ("B", 0)]
+LOW, HIGH = 48, 84
+
+# One synthetic note: (midi pitch, slur start, slur stop, staccato)
+Note = Tuple[int, bool, bool, bool]
+
+def _clamp(p: int) -> int:
+    return min(HIGH, max(LOW, p))
+
+def synthetic_notes(n: int, seed: int = 0) -> List[Note]:
+    """``n`` notes drawn from the figure mix above, deterministic for ``seed``."""
+    rng = random.Random(seed)
+    notes: List[Note] = []
+    pitch = 60
+    while len(notes) < n:
+        figure = rng.choice(("run", "run", "staccato", "turn", "turn", "leap"))
+        if figure == "run":
+            direction = rng.choice((-1, 1))
+            length = rng.randint(4, 8)
+            run = []
+            for _ in range(length):
+                pitch = _clamp(pitch + direction * rng.choice((1, 2, 2)))
+                run.append(pitch)
+            notes.extend((p, j == 0, j == length - 1, False) for j, p in enumerate(run))
+        elif figure == "staccato":
+            for _ in range(rng.randint(2, 4)):
+                notes.append((pitch, False, False, True))
+            pitch = _clamp(pitch + rng.choice((-2, 2)))
+            notes.append((pitch, False, False, True))
+        elif figure == "turn":
+            other = _clamp(pitch + rng.choice((-2, -1, 1, 2)))
+            notes.extend((p, False, False, False) for p in (pitch, other, pitch))
+        else:
+            pitch = _clamp(pitch + rng.choice((-1, 1)) * rng.randint(13, 19))
+            notes.append((pitch, False, False, False))
+    notes = notes[:n]
+    # A run cut off at the end must still close its slur.
+    open_slur = False
+    for _, start, stop, _ in notes:
+        open_slur = (open_slur or start) and not stop
+    if open_slur:
+        p, start, _, stacc = notes[-1]
+        notes[-1] = (p, start, True, stacc)
+    return notes
+
+def _note_xml(pitch: int, slur_start: bool, slur_stop: bool, staccato: bool) -> str:
+    step, alter = _NAMES[pitch % 12]
+    alter_xml = f"<alter>{alter}</alter>" if alter else ""
+    notations = ""
+    if slur_start:
+        notations += '<slur type="start" number="1"/>'
+    if slur_stop:
+        notations += '<slur type="stop" number="1"/>'
+    if staccato:
+        notations += "<articulations><staccato/></articulations>"
+    notations_xml = f"<notations>{notations}</notations>" if notations else ""
+    return (
+        f"<note><pitch><step>{step}</step>{alter_xml}<octave>{pitch // 12 - 1}</octave></pitch>"
+        f"<duration>1</duration><voice>1</voice><type>quarter</type>{notations_xml}</note>"
+    )
+
+def write_synthetic_score(path: str, n: int, seed: int = 0) -> str:
+    """Writes a synthetic ``n``-note score to ``path`` and returns the path."""
+    notes = synthetic_notes(n, seed)
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write(
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<score-partwise version="3.1"><part-list><score-part id="P1"><part-name>Piano</part-name>'
+            "</score-part></part-list><part id=\"P1\">"
+        )
+        for m, lo in enumerate(range(0, len(notes), 4), start=1):
+            attributes = (
+                "<attributes><divisions>1</divisions><time><beats>4</beats><beat-type>4</beat-type></time>"
+                "<clef><sign>G</sign><line>2</line></clef></attributes>"
+            ) if m == 1 else ""
+            fh.write(f'<measure number="{m}">{attributes}')
+            fh.write("".join(_note_xml(*note) for note in notes[lo:lo + 4]))
+            fh.write("</measure>")
+        fh.write("</part></score-partwise>\n")
+    return path
@@ -0,0 +1,213 @@
+"""
+``piano-fingering batch``: finger whole directories of scores on a process pool.
+
+Each worker imports music21 and the decoder once (pool initializer) and is then
+reused for every file it receives. A JSON manifest records per-file status,
+timings and errors.
+"""
+import argparse
+import contextlib
+import glob
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from ..pfai import profiling
+from ..pfai.config import DEFAULT_CONFIG, HandProfile, ModelConfig
+from .main import (
+    add_model_arguments,
+    annotate_file,
+    cache_from_args,
+    config_from_args,
+    engine_options_from_args,
+    format_cache_report,
+    profile_from_args,
+)
+
+SCORE_SUFFIXES = (".musicxml", ".xml", ".mxl")
+DEFAULT_OUTPUT_TAG = ".fingered"
+
+def _warm_worker(backend: str) -> None:
+    """Pool initializer: pay the heavy imports once per worker process."""
+    from ..decoding import second_order_dp  # noqa: F401
+    if backend == "music21":
+        import music21  # noqa: F401
+
+def collect_inputs(patterns: List[str], output_tag: str = DEFAULT_OUTPUT_TAG) -> List[Tuple[Path, Path]]:
+    """
+    Expands directories (recursively) and glob patterns into score files.
+    Returns ``(file, root)`` pairs, where ``root`` is the directory the file's
+    mirrored output path is taken relative to. Previous outputs are skipped.
+    """
+    found: List[Tuple[Path, Path]] = []
+    seen = set()
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            root = path
+            candidates = sorted(p for p in path.rglob("*") if p.suffix.lower() in SCORE_SUFFIXES)
+        else:
+            matches = sorted(glob.glob(pattern, recursive=True)) or ([pattern] if path.exists() else [])
+            candidates = [Path(m) for m in matches]
+            root = Path(_glob_base(pattern)) if glob.has_magic(pattern) else path.parent
+        for p in candidates:
+            if not p.is_file() or p.stem.endswith(output_tag):
+                continue
+            key = p.resolve()
+            if key not in seen:
+                seen.add(key)
+                found.append((p, root))
+    return found
+
+def _glob_base(pattern: str) -> str:
+    """Leading directory components of ``pattern`` that contain no wildcards."""
+    parts = Path(pattern).parts
+    base = []
+    for part in parts:
+        if glob.has_magic(part):
+            break
+        base.append(part)
+    return str(Path(*base)) if base else "."
+
+def output_path(src: Path, root: Path, outdir: Optional[Path], output_tag: str = DEFAULT_OUTPUT_TAG,
+                suffix: Optional[str] = None) -> Path:
+    """
+    Next to the input (``name.fingered.musicxml``) or, with ``outdir``, at the
+    same relative location in a mirror tree.
+    """
+    ext = suffix or (".musicxml" if src.suffix.lower() == ".mxl" else src.suffix)
+    name = f"{src.stem}{output_tag}{ext}"
+    if outdir is None:
+        return src.with_name(name)
+    try:
+        rel = src.resolve().parent.relative_to(root.resolve())
+    except ValueError:
+        rel = Path()
+    return outdir / rel / name
+
+def _run_one(infile: str, outfile: str, profile: HandProfile, cfg: ModelConfig,
+             staff: str, engine: str, backend: str, engine_options: Optional[dict] = None,
+             collect_profile: bool = False, cache_options: Optional[dict] = None) -> dict:
+    entry = {"input": infile, "output": outfile, "worker": os.getpid()}
+    t0 = time.perf_counter()
+    try:
+        Path(outfile).parent.mkdir(parents=True, exist_ok=True)
+        with contextlib.ExitStack() as stack:
+            cache = None
+            if cache_options is not None:
+                from ..io.cache import ResultCache
+                cache = stack.enter_context(ResultCache(**cache_options))
+            prof = stack.enter_context(profiling.Profiler()) if collect_profile else None
+            result = annotate_file(infile, outfile, profile, cfg, staff=staff, engine=engine, backend=backend,
+                                   engine_options=engine_options, cache=cache)
+        entry.update(status="ok", **result)
+        if prof is not None:
+            entry["profile"] = prof.report()
+    except Exception as exc:
+        entry.update(status="error", error=f"{type(exc).__name__}: {exc}", traceback=traceback.format_exc())
+    entry["seconds"] = time.perf_counter() - t0
+    return entry
+
+def run_batch(
+    jobs: List[Tuple[str, str]],
+    profile: HandProfile,
+    cfg: ModelConfig = DEFAULT_CONFIG,
+    staff: str = "both",
+    engine: str = "numpy",
+    backend: str = "music21",
+    workers: Optional[int] = None,
+    engine_options: Optional[dict] = None,
+    collect_profile: bool = False,
+    cache_options: Optional[dict] = None,
+) -> dict:
+    """
+    Fingers every ``(infile, outfile)`` job and returns the manifest dict.
+    ``workers=1`` runs in-process; otherwise a process pool of ``workers``
+    (default: CPU count) is used. ``collect_profile`` adds each file's
+    profiler report to its manifest entry. ``cache_options`` (keyword
+    arguments for :class:`~..io.cache.ResultCache`) enable the result cache;
+    each job opens its own connection.
+    """
+    workers = workers or os.cpu_count() or 1
+    t0 = time.perf_counter()
+    entries = []
+    if workers == 1 or len(jobs) <= 1:
+        _warm_worker(backend)
+        for infile, outfile in jobs:
+            entries.append(_run_one(infile, outfile, profile, cfg, staff, engine, backend, engine_options,
+                                    collect_profile, cache_options))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), initializer=_warm_worker,
+                                 initargs=(backend,)) as pool:
+            futures = [pool.submit(_run_one, i, o, profile, cfg, staff, engine, backend, engine_options,
+                                   collect_profile, cache_options)
+                       for i, o in jobs]
+            for fut in as_completed(futures):
+                entries.append(fut.result())
+    order = {infile: k for k, (infile, _) in enumerate(jobs)}
+    entries.sort(key=lambda e: order[e["input"]])
+    manifest = {
+        "workers": workers,
+        "backend": backend,
+        "engine": engine,
+        "hand_profile": profile.name,
+        "seconds": time.perf_counter() - t0,
+        "ok": sum(e["status"] == "ok" for e in entries),
+        "failed": sum(e["status"] != "ok" for e in entries),
+        "files": entries,
+    }
+    if cache_options is not None:
+        totals = {"hits": {}, "misses": {}}
+        for e in entries:
+            for outcome in ("hits", "misses"):
+                for kind, n in e.get("cache", {}).get(outcome, {}).items():
+                    totals[outcome][kind] = totals[outcome].get(kind, 0) + n
+        manifest["cache"] = totals
+    return manifest
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="piano-fingering batch",
+        description="Finger every score under the given directories or glob patterns.",
+    )
+    parser.add_argument("inputs", nargs="+", help="Score files, directories (searched recursively) or glob patterns")
+    parser.add_argument("--outdir", help="Write outputs into this mirror tree instead of next to each input")
+    parser.add_argument("--format", choices=["musicxml", "pdf"], help="Output format (default: same as input)")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument("--manifest", help="Manifest path (default: <outdir or cwd>/fingering-manifest.json)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Record per-stage time, peak memory and counters for each file in the manifest")
+    add_model_arguments(parser)
+    args = parser.parse_args(argv)
+
+    outdir = Path(args.outdir) if args.outdir else None
+    suffix = f".{args.format}" if args.format else None
+    inputs = collect_inputs(args.inputs)
+    if not inputs:
+        parser.error("no score files matched")
+    jobs = [(str(src), str(output_path(src, root, outdir, suffix=suffix))) for src, root in inputs]
+
+    try:
+        profile, cfg = profile_from_args(args), config_from_args(args)
+    except (OSError, ValueError) as exc:
+        parser.error(f"cannot load --config {args.config}: {exc}")
+    cache = cache_from_args(args)
+    cache_options = None
+    if cache is not None:
+        cache_options = {"directory": str(cache.directory), "max_bytes": cache.max_bytes}
+        cache.close()
+    manifest = run_batch(jobs, profile, cfg, staff=args.staff,
+                         engine=args.engine, backend=args.backend, workers=args.workers,
+                         engine_options=engine_options_from_args(args), collect_profile=args.profile,
+                         cache_options=cache_options)
+    manifest_path = Path(args.manifest) if args.manifest else (outdir or Path.cwd()) / "fingering-manifest.json"
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    manifest_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    print(f"{manifest['ok']} ok, {manifest['failed']} failed in {manifest['seconds']:.1f}s; manifest: {manifest_path}")
+    if "cache" in manifest:
+        print(format_cache_report(manifest["cache"]))
+    return 1 if manifest["failed"] else 0
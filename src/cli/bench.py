@@ -0,0 +1,77 @@
+"""
+``piano-fingering bench``: time parse, extract, decode, margin notes and
+export on Moonlight and synthetic streams, save the results as a JSON
+baseline, and compare against an earlier baseline.
+"""
+import argparse
+import json
+import sys
+import tempfile
+from typing import List, Optional
+
+from ..bench.suite import (
+    DEFAULT_MIN_SECONDS,
+    DEFAULT_MUSIC21_LIMIT,
+    DEFAULT_THRESHOLD,
+    STAGES,
+    compare,
+    format_comparison,
+    format_results,
+    prepare_cases,
+    run_suite,
+)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="piano-fingering bench",
+        description="Benchmark each pipeline stage; optionally fail on regressions against a baseline.",
+    )
+    parser.add_argument("--scales", default="1k,10k,100k", help="Comma-separated synthetic stream sizes (e.g. 1k,10k)")
+    parser.add_argument("--no-moonlight", action="store_true", help="Skip the bundled Moonlight score")
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"Comma-separated subset of {', '.join(STAGES)}")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage; the best time is compared")
+    parser.add_argument("--music21-limit", type=int, default=DEFAULT_MUSIC21_LIMIT,
+                        help="Skip music21 stages (parse, extract, write) for cases with more events")
+    parser.add_argument("--workdir", help="Where to write synthetic scores (default: a temporary directory)")
+    parser.add_argument("--out", help="Save the results JSON here (use it as a later --baseline)")
+    parser.add_argument("--results", help="Compare these saved results instead of running the suite")
+    parser.add_argument("--baseline", help="Baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed slowdown as a fraction of the baseline time (default: %(default)s)")
+    parser.add_argument("--min-seconds", type=float, default=DEFAULT_MIN_SECONDS,
+                        help="Ignore slowdowns smaller than this many seconds (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(sorted(unknown))}")
+
+    if args.results:
+        with open(args.results, encoding="utf-8") as fh:
+            results = json.load(fh)
+    else:
+        scales = [s.strip() for s in args.scales.split(",") if s.strip()]
+        def progress(name):
+            print(f"running {name} ...", file=sys.stderr)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            cases = prepare_cases(scales, args.workdir or tmp, moonlight=not args.no_moonlight)
+            results = run_suite(cases, args.repeat, args.music21_limit, stages, progress)
+        print(format_results(results))
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline, encoding="utf-8") as fh:
+        baseline = json.load(fh)
+    rows = compare(baseline, results, args.threshold, args.min_seconds)
+    print(format_comparison(rows))
+    regressions = [r for r in rows if r["regressed"]]
+    if regressions:
+        print(f"{len(regressions)} regression(s) above {args.threshold:.0%}", file=sys.stderr)
+        return 1
+    return 0
@@ -0,0 +1,59 @@
+"""
+``piano-fingering decode``: finger an event file written by
+``piano-fingering extract``. Only NumPy and the decoder are imported, so
+re-decoding a score under new weights skips the score parser entirely.
+"""
+import argparse
+import json
+from typing import List, Optional
+
+from ..pfai import profiling
+from .main import (
+    add_decoder_arguments,
+    check_alternatives,
+    config_from_args,
+    engine_options_from_args,
+    finger_events,
+    profile_from_args,
+)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="piano-fingering decode",
+        description="Decode fingerings for a JSON or NPZ event file and write them as JSON.",
+    )
+    parser.add_argument("--events", required=True, help="Event file from 'piano-fingering extract' (.json or .npz)")
+    parser.add_argument("--out", help="Write the JSON result here instead of stdout")
+    add_decoder_arguments(parser)
+    parser.add_argument("--profile", metavar="PATH", help="Write a JSON per-stage profile to PATH")
+    args = parser.parse_args(argv)
+    try:
+        check_alternatives(args.engine, args.alternatives)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    from ..io.eventfile import read_event_file
+
+    def run():
+        with profiling.stage("read_events"):
+            events = read_event_file(args.events)
+        return finger_events(events, profile_from_args(args), config_from_args(args), staff=args.staff,
+                             engine=args.engine, engine_options=engine_options_from_args(args),
+                             alternatives=args.alternatives)
+
+    try:
+        if args.profile:
+            with profiling.Profiler() as prof:
+                result = run()
+            prof.to_json(args.profile)
+        else:
+            result = run()
+    except (OSError, ValueError) as exc:
+        parser.error(f"cannot decode {args.events}: {exc}")
+    text = json.dumps(result)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            fh.write(text)
+    else:
+        print(text)
+    return 0
@@ -0,0 +1,89 @@
+"""
+``piano-fingering evaluate``: decode fingered MusicXML scores under several
+engines and configurations and tabulate agreement with the written
+fingerings, cost gaps and throughput, optionally failing when an engine
+loses quality against the first one.
+"""
+import argparse
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+from ..pfai.config import DEFAULT_CONFIG, load_config
+from .main import _profile_from_name
+from .sweep import _format_rows
+
+COLUMNS = ("config", "engine", "staff", "files", "notes", "agreement", "cost_gap", "optimum_gap",
+           "events", "seconds", "events_per_sec")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from ..decoding.second_order_dp import ENGINES
+
+    parser = argparse.ArgumentParser(
+        prog="piano-fingering evaluate",
+        description="Compare decoders and weights against the fingerings written in a corpus of MusicXML scores.",
+    )
+    parser.add_argument("corpus", nargs="+",
+                        help="Fingered MusicXML files or directories (searched recursively for .musicxml/.xml)")
+    parser.add_argument("--engines", default="numpy", metavar="E1,E2,...",
+                        help=f"Decoder engines to run, the reference first (among {', '.join(ENGINES)})")
+    parser.add_argument("--config", action="append", default=[], metavar="PATH",
+                        help="Weights file to evaluate, labelled by its name (repeatable; default: the built-in weights)")
+    parser.add_argument("--hand-profile", default="M", choices=["S","M","L","XL"], help="Hand size profile")
+    parser.add_argument("--staff", default="both", choices=["RH","LH","both"], help="Which staves to evaluate")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: in-process)")
+    parser.add_argument("--repeat", type=int, default=1, help="Decode each staff this many times; the best time counts")
+    parser.add_argument("--format", default="csv", choices=["csv","json"], help="Table format")
+    parser.add_argument("--out", help="Write the table here instead of stdout")
+    parser.add_argument("--gate", type=float, metavar="DROP",
+                        help="Exit 1 if an engine's agreement falls more than DROP below the first engine's, "
+                             "or its cost rises, for the same configuration and staff")
+    args = parser.parse_args(argv)
+
+    engines = [e.strip() for e in args.engines.split(",") if e.strip()]
+    unknown = sorted(set(engines) - set(ENGINES))
+    if not engines or unknown:
+        parser.error(f"unknown engine(s): {', '.join(unknown) or '(none given)'}")
+
+    from ..bench.evaluate import Run, evaluate, gate
+    from ..rules.learning import corpus_files, load_corpus
+
+    base = _profile_from_name(args.hand_profile)
+    settings = [("default", base, DEFAULT_CONFIG)]
+    if args.config:
+        if len(set(args.config)) < len(args.config):
+            parser.error("the same --config file is given twice")
+        # Rows are keyed by label: files sharing a name are labelled by their full path.
+        stems = [Path(path).stem for path in args.config]
+        settings = []
+        for path, stem in zip(args.config, stems):
+            try:
+                settings.append((stem if stems.count(stem) == 1 else path, *load_config(path, base)))
+            except (OSError, ValueError) as exc:
+                parser.error(f"cannot load --config {path}: {exc}")
+    runs = [Run(label, profile, cfg, engine) for label, profile, cfg in settings for engine in engines]
+
+    staves = [s for s, label in ((1, "RH"), (2, "LH")) if args.staff in (label, "both")]
+    try:
+        examples = load_corpus(corpus_files(args.corpus), staves, include_chords="chord" in engines)
+    except (OSError, ValueError, SyntaxError) as exc:  # ET.ParseError is a SyntaxError
+        parser.error(f"cannot read the corpus: {exc}")
+    if not examples:
+        parser.error("no fingered notes found in the corpus")
+
+    rows = evaluate(examples, runs, workers=args.workers, repeat=args.repeat)
+    table = [{k: row[k] for k in COLUMNS} for row in rows]
+    text = _format_rows(table, args.format)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8", newline="") as fh:
+            fh.write(text)
+    else:
+        print(text, end="" if text.endswith("\n") else "\n")
+
+    if args.gate is None:
+        return 0
+    failed = gate(rows, args.gate)
+    for row in failed:
+        print(f"quality gate: {row['config']}/{row['engine']} staff {row['staff']}: agreement "
+              f"{row['agreement']:.4f}, optimum gap {row['optimum_gap']:.4f}", file=sys.stderr)
+    return 1 if failed else 0
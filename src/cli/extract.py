@@ -0,0 +1,33 @@
+"""
+``piano-fingering extract``: read a score once and save its note events as a
+compact event file (``.json`` or ``.npz``, see :mod:`~..io.eventfile`), so
+``piano-fingering decode`` can re-finger it without parsing the score again.
+"""
+import argparse
+import sys
+from typing import List, Optional
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="piano-fingering extract",
+        description="Extract note events from a MusicXML score into a JSON or NPZ event file.",
+    )
+    parser.add_argument("--infile", required=True, help="Input MusicXML file")
+    parser.add_argument("--out", required=True, help="Event file to write; .npz for NumPy arrays, else JSON")
+    parser.add_argument("--backend", default="xml", choices=["music21","xml"],
+                        help="Score reader: streaming XML (no music21 import), or a full music21 parse")
+    args = parser.parse_args(argv)
+
+    from ..io.eventfile import write_event_file
+
+    if args.backend == "xml":
+        from ..io.musicxml_stream import read_events_with_ordinals
+        events, ordinals = read_events_with_ordinals(args.infile)
+    else:
+        from ..io.musicxml import ScorePipeline
+        pipeline = ScorePipeline(args.infile)
+        pipeline.extract()
+        events, ordinals = pipeline.events, None
+    write_event_file(args.out, events, ordinals)
+    print(f"{len(events)} events -> {args.out}", file=sys.stderr)
+    return 0
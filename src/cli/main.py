@@ -1,10 +1,37 @@
+"""
+``piano-fingering``: finger a score end to end, or dispatch to a subcommand.
+
+Only this module and the argument parsers are imported at start-up; music21
+is imported by the stages that need a score tree and NumPy by the decoder,
+so ``--help``, ``extract --backend xml`` and ``decode`` never load music21.
+"""
 import argparse
+import importlib
+import sys
+import time
+from dataclasses import replace
+from typing import List, Optional
+from ..pfai import profiling
 from ..pfai.config import (
     DEFAULT_CONFIG,
     PROFILE_S, PROFILE_M, PROFILE_L, PROFILE_XL,
     HandProfile, ModelConfig,
+    load_config,
 )
 
+# Subcommand name -> module under ``cli`` exposing ``main(argv)``.
+SUBCOMMANDS = {
+    "batch": "batch",
+    "sweep": "sweep",
+    "bench": "bench",
+    "serve": "serve",
+    "extract": "extract",
+    "decode": "decode",
+    "stream": "stream",
+    "train": "train",
+    "evaluate": "evaluate",
+}
+
 def _profile_from_name(name: str) -> HandProfile:
     name = name.upper()
     profiles: dict[str, HandProfile] = {
@@ -13,62 +40,319 @@ def _profile_from_name(name: str) -> HandProfile:
     return profiles.get(name, PROFILE_M)
     # The get method in _profile_from_name returns PROFILE_M if the name is not found.
     # This ensures the return type is always HandProfile.
-    
-def app():
-    from ..io.musicxml import (
-        load_score,
-        extract_monophonic_events,
-        write_fingerings_and_notes,
-    )
-    from ..decoding.second_order_dp import decode_monophonic_second_order
-    from ..annotate.notes import collect_margin_notes
 
-    parser = argparse.ArgumentParser(description="Piano Fingering auto-annotator (monophonic, rollover-aware).")
-    parser.add_argument("--infile", required=True, help="Input MusicXML file")
-    parser.add_argument(
-        "--outfile",
-        required=True,
-        help="Output MusicXML or PDF file",
-    )
+def add_model_arguments(parser: argparse.ArgumentParser) -> None:
+    """Options shared by every command that reads a score and decodes it: backend, cache and decoder options."""
+    parser.add_argument("--backend", default="music21", choices=["music21","xml"],
+                        help="Score I/O: full music21 round-trip, or streaming XML (MusicXML output only)")
+    add_decoder_arguments(parser)
+    parser.add_argument("--no-cache", action="store_true", help="Don't read or write the on-disk result cache")
+    parser.add_argument("--clear-cache", action="store_true", help="Empty the result cache before running")
+    parser.add_argument("--cache-dir", help="Result cache directory (default: $PIANO_FINGERING_CACHE_DIR or ~/.cache/piano-fingering)")
+    parser.add_argument("--cache-size-mb", type=float, help="Evict least recently used cache entries beyond this size")
+
+def add_decoder_arguments(parser: argparse.ArgumentParser) -> None:
+    """Options shared by every command that decodes: hand, staff, engine and weight overrides."""
     parser.add_argument("--hand-profile", default="M", choices=["S","M","L","XL"], help="Hand size profile")
     parser.add_argument("--staff", default="both", choices=["RH","LH","both"], help="Which staff to process")
+    parser.add_argument("--engine", default="numpy", choices=["numpy","python","segmented","compact","motif","chord"],
+                        help="Decoder implementation (chord also fingers chords)")
+    parser.add_argument("--checkpoint", action="store_true",
+                        help="With --engine compact, keep only sqrt(N) checkpoints instead of all backpointers")
+    parser.add_argument("--decode-workers", type=int, help="Worker processes for --engine segmented (default: in-process)")
+    parser.add_argument("--segment-length", type=int, help="Target steps per segment for --engine segmented")
+    parser.add_argument("--motif-window", type=int, help="Target steps per memoized window for --engine motif")
+    parser.add_argument("--alternatives", type=int, default=1, metavar="K",
+                        help="Also give each note the other fingers it gets among the K best fingerings "
+                             "(written as alternate fingerings by --backend xml)")
+    parser.add_argument("--config", metavar="PATH",
+                        help="Weights file, e.g. written by 'piano-fingering train' (hand size still comes from --hand-profile)")
     # Optional overrides for key weights (so you can tune without editing code)
     parser.add_argument("--rollover121", type=float, help="Reward for 1-2-1 rollover (negative is better)")
     parser.add_argument("--rollover131", type=float, help="Reward for 1-3-1 rollover (negative is better)")
     parser.add_argument("--jump14", type=float, help="Reward for 1↔4 jumps (negative is better)")
-    args = parser.parse_args()
-
-    score = load_score(args.infile)
-    events = extract_monophonic_events(score)
 
+def profile_from_args(args: argparse.Namespace) -> HandProfile:
+    """Hand profile named by ``--hand-profile`` with the ``--config`` file and the CLI weight overrides applied."""
     profile = _profile_from_name(args.hand_profile)
-    cfg = DEFAULT_CONFIG
-
-    # Allow quick CLI tuning
+    if getattr(args, "config", None):
+        profile = load_config(args.config, profile)[0]
+    # Allow quick CLI tuning (on a copy, so the predefined profiles stay intact)
     if args.rollover121 is not None:
-        profile.rollover_bonus_121 = args.rollover121
+        profile = replace(profile, rollover_bonus_121=args.rollover121)
     if args.rollover131 is not None:
-        profile.rollover_bonus_131 = args.rollover131
+        profile = replace(profile, rollover_bonus_131=args.rollover131)
     if args.jump14 is not None:
-        profile.jump_bonus_1_to_4 = args.jump14
-        profile.jump_bonus_4_to_1 = args.jump14
+        profile = replace(profile, jump_bonus_1_to_4=args.jump14, jump_bonus_4_to_1=args.jump14)
+    return profile
 
-    fing_all = {}
+def config_from_args(args: argparse.Namespace) -> ModelConfig:
+    """The ``--config`` file's model weights, or :data:`DEFAULT_CONFIG`."""
+    if getattr(args, "config", None):
+        return load_config(args.config, _profile_from_name(args.hand_profile))[1]
+    return DEFAULT_CONFIG
+
+def engine_options_from_args(args: argparse.Namespace) -> dict:
+    """Decoder keyword options implied by the engine-specific CLI flags."""
+    options = {}
+    if args.engine == "segmented":
+        if args.decode_workers:
+            options["workers"] = args.decode_workers
+        if args.segment_length:
+            options["segment_length"] = args.segment_length
+    elif args.engine == "compact" and args.checkpoint:
+        options["checkpoint"] = True
+    elif args.engine == "motif" and args.motif_window:
+        options["window"] = args.motif_window
+    return options
+
+def check_alternatives(engine: str, alternatives: int) -> None:
+    """Raises ValueError for ``alternatives`` > 1 with an engine the k-best decoder does not rank."""
+    if alternatives > 1 and engine == "chord":
+        raise ValueError("--alternatives ranks single-note fingerings and cannot be combined with --engine chord")
+
+def cache_from_args(args: argparse.Namespace):
+    """Opens the result cache named by the cache flags (clearing it on request); None with ``--no-cache``."""
+    from ..io.cache import DEFAULT_CACHE_BYTES, ResultCache
 
-    if args.staff in ("RH", "both"):
-        fing_RH = decode_monophonic_second_order(events, profile, cfg, hand_staff=1)
-        fing_all.update(fing_RH)
-    if args.staff in ("LH", "both"):
-        fing_LH = decode_monophonic_second_order(events, profile, cfg, hand_staff=2)
-        fing_all.update(fing_LH)
+    if args.no_cache and not args.clear_cache:
+        return None
+    max_bytes = int(args.cache_size_mb * (1 << 20)) if args.cache_size_mb else DEFAULT_CACHE_BYTES
+    cache = ResultCache(args.cache_dir, max_bytes=max_bytes)
+    if args.clear_cache:
+        cache.clear()
+    if args.no_cache:
+        cache.close()
+        return None
+    return cache
 
+def format_cache_report(report: dict) -> str:
+    """One-line summary of ``annotate_file(...)["cache"]`` style hit/miss counts."""
+    parts = []
+    for kind in ("events", "fingering"):
+        hits, misses = report["hits"].get(kind, 0), report["misses"].get(kind, 0)
+        if hits or misses:
+            parts.append(f"{kind} {hits}/{hits + misses} hit")
+    return "cache: " + (", ".join(parts) or "unused")
+
+def finger_events(
+    events,
+    profile: HandProfile,
+    cfg: ModelConfig,
+    staff: str = "both",
+    engine: str = "numpy",
+    engine_options: Optional[dict] = None,
+    alternatives: int = 1,
+) -> dict:
+    """
+    Decodes already extracted events (an EventTable or Events) without
+    touching a score: ``{"events", "fingerings", "margin_notes"}`` with
+    fingerings keyed by the event idx as a string, ready for JSON. With
+    ``alternatives`` > 1 the result also maps notes to the other fingers
+    they get among that many best fingerings, under ``"alternatives"``.
+    """
+    from ..decoding.second_order_dp import decode_monophonic_second_order
+    from ..annotate.notes import collect_margin_notes
+
+    check_alternatives(engine, alternatives)
+    fingerings = {}
+    extra = {}
     notes = []
-    if args.staff in ("RH", "both"):
-        notes += collect_margin_notes(events, {k:v for k,v in fing_all.items() if any(e.idx==k and e.staff==1 for e in events)}, cfg, "RH")
-    if args.staff in ("LH", "both"):
-        notes += collect_margin_notes(events, {k:v for k,v in fing_all.items() if any(e.idx==k and e.staff==2 for e in events)}, cfg, "LH")
+    for hand_staff, label in ((1, "RH"), (2, "LH")):
+        if staff not in (label, "both"):
+            continue
+        with profiling.stage("decode"):
+            fmap = decode_monophonic_second_order(events, profile, cfg, hand_staff, engine=engine,
+                                                  **(engine_options or {}))
+        fingerings.update({str(k): v[0] for k, v in fmap.items()})
+        if alternatives > 1:
+            from ..decoding.kbest import with_alternatives
+            with profiling.stage("alternatives"):
+                extended = with_alternatives(fmap, events, profile, cfg, hand_staff, alternatives)
+            extra.update({str(k): v[1:] for k, v in extended.items() if len(v) > 1})
+        with profiling.stage("margin_notes"):
+            notes += [{"time": t, "text": text, "staff": hand_staff}
+                      for t, text in collect_margin_notes(events, fmap, cfg, label)]
+    result = {"events": len(events), "fingerings": fingerings, "margin_notes": notes}
+    if alternatives > 1:
+        result["alternatives"] = extra
+    return result
+
+def annotate_file(
+    infile: str,
+    outfile: str,
+    profile: HandProfile,
+    cfg: ModelConfig,
+    staff: str = "both",
+    engine: str = "numpy",
+    backend: str = "music21",
+    engine_options: Optional[dict] = None,
+    cache=None,
+    alternatives: int = 1,
+) -> dict:
+    """
+    Fingers one score end to end: load, decode each requested staff, collect
+    margin notes and write ``outfile``. Returns per-stage timings (seconds)
+    and the number of events. Run it inside a
+    :class:`~piano_fingering.pfai.profiling.Profiler` for memory and counters.
+
+    With a :class:`~piano_fingering.io.cache.ResultCache`, the extracted
+    events and each staff's fingering are reused when the input bytes and
+    model parameters match an earlier run; the result then also carries this
+    call's cache hit/miss counts under ``"cache"``.
+
+    With ``alternatives`` > 1, each note is also marked with the other
+    fingers it gets among that many best fingerings. The ``"xml"`` backend
+    writes them as ``<fingering alternate="yes">``; music21 keeps only the
+    first fingering of a note. The ``"chord"`` engine has none (ValueError).
+    """
+    from ..decoding.second_order_dp import decode_monophonic_second_order, hand_sequence
+    from ..annotate.notes import collect_margin_notes
+
+    check_alternatives(engine, alternatives)
+    engine_options = dict(engine_options or {})
+    if backend == "xml":
+        from ..io.musicxml_stream import XMLStreamPipeline as Pipeline
+    else:
+        from ..io.musicxml import ScorePipeline as Pipeline
+    pipeline = Pipeline(infile)
+    if cache is not None:
+        from ..io.cache import decoder_family, file_digest, table_digest
+        hits_before, misses_before = dict(cache.hits), dict(cache.misses)
+        digest = file_digest(infile)
+        cached = cache.get_events(digest, backend)
+        if cached is None or not pipeline.restore(*cached):
+            pipeline.extract()
+            cache.put_events(digest, backend, *pipeline.cache_payload())
+    else:
+        pipeline.extract()
+    events = pipeline.events
+
+    hands = [(s, label) for s, label in ((1, "RH"), (2, "LH")) if staff in (label, "both")]
+    for hand_staff, _ in hands:
+        profiling.count(f"events_staff{hand_staff}", len(events.for_staff(hand_staff, include_chords=True)))
+
+    t0 = time.perf_counter()
+    fing_all = {}
+    fing_by_staff = {}
+    digests = {}
+    if cache is not None:
+        for hand_staff, _ in hands:
+            digests[hand_staff] = table_digest(hand_sequence(events, hand_staff, include_chords=engine == "chord"))
+            cached = cache.get_fingering(digests[hand_staff], hand_staff, profile, cfg, decoder_family(engine))
+            if cached is not None:
+                fing_by_staff[hand_staff] = cached
+                fing_all.update(cached)
+    pool = None
+    if engine == "segmented" and (engine_options.get("workers") or 0) > 1 and len(fing_by_staff) < len(hands):
+        # One pool shared by both hands instead of one per decode call.
+        from concurrent.futures import ProcessPoolExecutor
+        pool = ProcessPoolExecutor(max_workers=engine_options.pop("workers"))
+        engine_options["executor"] = pool
+    try:
+        with profiling.stage("decode"):
+            for hand_staff, _ in hands:
+                if hand_staff in fing_by_staff:
+                    continue
+                fing_by_staff[hand_staff] = decode_monophonic_second_order(
+                    events, profile, cfg, hand_staff=hand_staff, engine=engine, **engine_options)
+                fing_all.update(fing_by_staff[hand_staff])
+                if cache is not None:
+                    cache.put_fingering(digests[hand_staff], hand_staff, profile, cfg, fing_by_staff[hand_staff],
+                                        decoder_family(engine))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    if alternatives > 1:
+        from ..decoding.kbest import with_alternatives
+        with profiling.stage("alternatives"):
+            for hand_staff, _ in hands:
+                fing_all.update(with_alternatives(fing_by_staff[hand_staff], events, profile, cfg, hand_staff,
+                                                  alternatives))
+    t1 = time.perf_counter()
+
+    notes = []
+    with profiling.stage("margin_notes"):
+        for hand_staff, label in hands:
+            notes += [(t, text, hand_staff) for t, text in collect_margin_notes(events, fing_by_staff[hand_staff], cfg, label)]
+    profiling.count("margin_notes", len(notes))
+    t2 = time.perf_counter()
+
+    pipeline.annotate(fing_all, notes)
+    pipeline.write(outfile)
+
+    timings = dict(pipeline.timings)
+    timings["decode"] = t1 - t0
+    timings["margin_notes"] = t2 - t1
+    result = {"events": len(events), "timings": timings}
+    if cache is not None:
+        result["cache"] = {
+            "hits": {k: v - hits_before.get(k, 0) for k, v in cache.hits.items() if v > hits_before.get(k, 0)},
+            "misses": {k: v - misses_before.get(k, 0) for k, v in cache.misses.items() if v > misses_before.get(k, 0)},
+        }
+    return result
+
+def app(argv: Optional[List[str]] = None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] in SUBCOMMANDS:
+        module = importlib.import_module(f".{SUBCOMMANDS[argv[0]]}", __package__)
+        return module.main(argv[1:])
+
+    parser = argparse.ArgumentParser(
+        description="Piano Fingering auto-annotator (monophonic, rollover-aware).",
+        epilog=f"Subcommands: {', '.join(SUBCOMMANDS)} (run '<subcommand> --help').",
+    )
+    parser.add_argument("--infile", help="Input MusicXML file")
+    parser.add_argument(
+        "--outfile",
+        help="Output MusicXML or PDF file",
+    )
+    add_model_arguments(parser)
+    parser.add_argument("--profile", metavar="PATH",
+                        help="Record per-stage time, peak memory and counters and write them to PATH")
+    parser.add_argument("--profile-format", default="json", choices=["json", "cprofile"],
+                        help="PATH contents: JSON report, or a cProfile (pstats) dump")
+    args = parser.parse_args(argv)
+    if not (args.infile and args.outfile):
+        if args.clear_cache and not (args.infile or args.outfile):
+            cache_from_args(argparse.Namespace(**{**vars(args), "no_cache": True}))
+            return
+        parser.error("--infile and --outfile are required (or pass only --clear-cache)")
+
+    try:
+        profile, cfg = profile_from_args(args), config_from_args(args)
+    except (OSError, ValueError) as exc:
+        parser.error(f"cannot load --config {args.config}: {exc}")
+    try:
+        check_alternatives(args.engine, args.alternatives)
+    except ValueError as exc:
+        parser.error(str(exc))
+    cache = cache_from_args(args)
+
+    def run():
+        return annotate_file(
+            args.infile, args.outfile, profile, cfg,
+            staff=args.staff, engine=args.engine, backend=args.backend,
+            engine_options=engine_options_from_args(args), cache=cache, alternatives=args.alternatives,
+        )
 
-    write_fingerings_and_notes(args.infile, args.outfile, fing_all, notes)
+    try:
+        if not args.profile:
+            result = run()
+        else:
+            cprofile = args.profile_format == "cprofile"
+            # cProfile already distorts timings; don't stack tracemalloc on top of it.
+            with profiling.Profiler(memory=not cprofile, cprofile=cprofile) as prof:
+                result = run()
+            if cprofile:
+                prof.dump_stats(args.profile)
+            else:
+                prof.to_json(args.profile)
+    finally:
+        if cache is not None:
+            cache.close()
+    if "cache" in result:
+        print(format_cache_report(result["cache"]), file=sys.stderr)
 
 if __name__ == "__main__":
     app()
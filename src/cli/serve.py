@@ -0,0 +1,42 @@
+"""
+``piano-fingering serve``: run the long-lived fingering server (see
+:mod:`..server.app`) for editor integrations and other repeat callers.
+"""
+import argparse
+import asyncio
+from typing import List, Optional
+
+from ..server.app import DEFAULT_MAX_BODY, DEFAULT_PORT, DEFAULT_QUEUE_LIMIT, FingeringServer
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="piano-fingering serve",
+        description="Serve fingerings over HTTP (TCP or Unix socket) with warm worker processes.",
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="TCP port (default: %(default)s)")
+    parser.add_argument("--unix", metavar="PATH", help="Listen on this Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, help="Decoder worker processes (default: CPU count)")
+    parser.add_argument("--queue-limit", type=int, default=DEFAULT_QUEUE_LIMIT,
+                        help="Requests allowed to wait for a worker before answering 503 (default: %(default)s)")
+    parser.add_argument("--max-body-mb", type=float, default=DEFAULT_MAX_BODY / (1 << 20),
+                        help="Largest accepted request body (default: %(default)s MB)")
+    args = parser.parse_args(argv)
+
+    server = FingeringServer(args.host, args.port, args.unix, workers=args.workers, queue_limit=args.queue_limit,
+                             max_body=int(args.max_body_mb * (1 << 20)))
+
+    async def run():
+        await server.start()
+        where = args.unix or f"http://{server.host}:{server.port}"
+        print(f"serving on {where} with {server.workers} worker(s)", flush=True)
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    return 0
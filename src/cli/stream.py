@@ -0,0 +1,75 @@
+"""
+``piano-fingering stream``: replay a MusicXML or MIDI file through the
+fixed-lag online decoder, printing each finger as it is committed, or
+tabulate how well each lag agrees with the offline optimum.
+"""
+import argparse
+import csv
+import json
+import sys
+from typing import List, Optional
+
+from ..pfai.config import DEFAULT_CONFIG, load_config
+from .main import _profile_from_name
+
+def _parse_lags(spec: str) -> List[int]:
+    lags = [int(v) for v in spec.split(",") if v.strip()]
+    if not lags or min(lags) < 0:
+        raise ValueError(f"--lags needs non-negative integers, not {spec!r}")
+    return lags
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="piano-fingering stream",
+        description="Replay a score as a live note stream and finger it with a fixed-lag online decoder.",
+    )
+    parser.add_argument("--infile", required=True, help="MusicXML file, or a MIDI file (.mid/.midi; one staff per track)")
+    parser.add_argument("--lag", type=int, default=8, help="Notes to wait before committing a finger")
+    parser.add_argument("--interval", type=float, default=0.0, help="Seconds between replayed notes")
+    parser.add_argument("--lags", metavar="L1,L2,...",
+                        help="Instead of streaming, report agreement with the offline optimum for each lag")
+    parser.add_argument("--hand-profile", default="M", choices=["S","M","L","XL"], help="Hand size profile")
+    parser.add_argument("--staff", default="both", choices=["RH","LH","both"], help="Which staff to process")
+    parser.add_argument("--config", metavar="PATH", help="Weights file, e.g. written by 'piano-fingering train'")
+    args = parser.parse_args(argv)
+    if args.lag < 0:
+        parser.error("--lag must be >= 0")
+
+    from ..decoding.streaming import FixedLagDecoder, lag_agreement
+    from ..io.replay import read_replay_events, replay
+
+    profile, cfg = _profile_from_name(args.hand_profile), DEFAULT_CONFIG
+    if args.config:
+        try:
+            profile, cfg = load_config(args.config, profile)
+        except (OSError, ValueError) as exc:
+            parser.error(f"cannot load --config {args.config}: {exc}")
+    staves = [s for s, label in ((1, "RH"), (2, "LH")) if args.staff in (label, "both")]
+
+    if args.lags:
+        try:
+            lags = _parse_lags(args.lags)
+        except ValueError as exc:
+            parser.error(str(exc))
+        events = read_replay_events(args.infile)
+        writer = csv.writer(sys.stdout)
+        writer.writerow(["staff", "lag", "agreement", "cost_gap"])
+        for staff in staves:
+            for lag, result in lag_agreement(events, profile, cfg, lags, staff).items():
+                writer.writerow([staff, lag, f"{result.agreement:.4f}", f"{result.cost_gap:.4f}"])
+        return 0
+
+    # One decoder per hand; commits are printed as JSON lines the moment they happen.
+    decoders = {staff: FixedLagDecoder(profile, cfg, args.lag) for staff in staves}
+
+    def emit(staff, committed):
+        for idx, finger in committed:
+            print(json.dumps({"idx": idx, "staff": staff, "finger": finger}), flush=True)
+
+    for event in replay(args.infile, args.interval):
+        decoder = decoders.get(event.staff)
+        if decoder is not None and not event.is_chord:
+            emit(event.staff, decoder.push(event))
+    for staff, decoder in decoders.items():
+        emit(staff, decoder.flush())
+    return 0
@@ -0,0 +1,49 @@
+"""
+``piano-fingering train``: fit the cost weights to human-fingered MusicXML
+scores and write them as a config file that ``--config`` loads.
+"""
+import argparse
+import sys
+from typing import List, Optional
+
+from ..pfai.config import DEFAULT_CONFIG, save_config
+from .main import _profile_from_name
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="piano-fingering train",
+        description="Fit the cost weights to the fingerings already written in a corpus of MusicXML scores.",
+    )
+    parser.add_argument("corpus", nargs="+",
+                        help="Fingered MusicXML files or directories (searched recursively for .musicxml/.xml)")
+    parser.add_argument("--out", required=True, help="Write the fitted config file here")
+    parser.add_argument("--epochs", type=int, help="Training passes over the corpus (default: 20)")
+    parser.add_argument("--lr", type=float, help="Learning rate (default: 0.5)")
+    parser.add_argument("--workers", type=int, help="Worker processes decoding the corpus (default: in-process)")
+    parser.add_argument("--hand-profile", default="M", choices=["S","M","L","XL"],
+                        help="Hand size profile, and the starting weights")
+    parser.add_argument("--staff", default="both", choices=["RH","LH","both"], help="Which staves to learn from")
+    args = parser.parse_args(argv)
+
+    from ..rules.learning import DEFAULT_EPOCHS, DEFAULT_LEARNING_RATE, corpus_files, load_corpus, train
+
+    staves = [s for s, label in ((1, "RH"), (2, "LH")) if args.staff in (label, "both")]
+    try:
+        examples = load_corpus(corpus_files(args.corpus), staves)
+    except (OSError, ValueError, SyntaxError) as exc:  # ET.ParseError is a SyntaxError
+        parser.error(f"cannot read the corpus: {exc}")
+    if not examples:
+        parser.error("no fingered notes found in the corpus")
+
+    epochs = args.epochs if args.epochs is not None else DEFAULT_EPOCHS
+    result = train(examples, _profile_from_name(args.hand_profile), DEFAULT_CONFIG, epochs=epochs,
+                   lr=args.lr if args.lr is not None else DEFAULT_LEARNING_RATE, workers=args.workers)
+    for stats in result.history:
+        print(f"epoch {stats.epoch}: {stats.mistakes}/{stats.notes} mistakes, cost gap {stats.cost_gap:.3f}",
+              file=sys.stderr)
+    final = result.final
+    save_config(args.out, result.profile, result.cfg, examples=len(examples), notes=final.notes,
+                mistakes=final.mistakes, averaged=result.averaged)
+    agreement = 1 - final.mistakes / final.notes
+    print(f"{len(examples)} staves, {final.notes} fingered notes; agreement {agreement:.3f}; config: {args.out}")
+    return 0
@@ -0,0 +1,110 @@
+"""
+Batched multi-configuration decoding for weight and hand-profile sweeps.
+
+One event sequence is decoded under P (HandProfile, ModelConfig) pairs in a
+single DP whose tensors carry an extra leading parameter axis. Every cost term
+is accumulated in the same order as the single-configuration decoder, so each
+configuration's fingering is identical to what
+:func:`~.second_order_dp.decode_monophonic_second_order` returns for it.
+"""
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Sequence, Tuple, Union
+
+import numpy as np
+
+from ..pfai.config import HandProfile, ModelConfig
+from ..pfai import profiling
+from ..pfai.constants import FINGERS
+from ..pfai.types import Event, EventTable
+from ..features.geometry import BLACK_KEY_MASK
+from ..rules.costs import (
+    rollover_adjustment_tensor,
+    rollover_window_mask,
+    stack_parameters,
+    transition_cost_matrices,
+)
+from .second_order_dp import hand_sequence, sequence_arrays
+
+N_F = len(FINGERS)
+DEFAULT_CHUNK = 256
+
+@dataclass
+class SweepResult:
+    """Decode of one configuration in a sweep."""
+    profile: HandProfile
+    cfg: ModelConfig
+    cost: float
+    fingering: Dict[int, List[int]]
+
+def decode_batched(
+    events: Union[EventTable, Iterable[Event]],
+    configs: Sequence[Tuple[HandProfile, ModelConfig]],
+    hand_staff: int,
+    chunk: int = DEFAULT_CHUNK,
+) -> List[SweepResult]:
+    """
+    Decodes the ``hand_staff`` sequence under every ``(profile, cfg)`` pair at
+    once. Cost matrices are built ``chunk`` steps at a time for all
+    configurations, so memory is O(P * chunk) for costs plus O(P * N) int8
+    backpointers.
+    """
+    configs = list(configs)
+    seq = hand_sequence(events, hand_staff)
+    if not configs:
+        return []
+    if not len(seq):
+        return [SweepResult(p, c, 0.0, {}) for p, c in configs]
+
+    P, N = len(configs), len(seq)
+    profiles = stack_parameters([p for p, _ in configs])
+    cfgs = stack_parameters([c for _, c in configs])
+    pitch, slur, stacc = sequence_arrays(seq)
+    under_slur = np.concatenate([[False], slur[1:] | slur[:-1]])
+
+    start = np.where((np.asarray(FINGERS) == 1) & BLACK_KEY_MASK[pitch[0]],
+                     cfgs.start_thumb_on_black_penalty[:, 0, 0], 0.0)  # (P, 5)
+    if N == 1:
+        best = np.argmin(start, axis=1)
+        return [SweepResult(p, c, float(start[k, best[k]]), {int(seq.idx[0]): [int(best[k]) + 1]})
+                for k, (p, c) in enumerate(configs)]
+
+    profiling.count("dp_cells", P * (25 + 125 * (N - 2)))
+    roll = rollover_adjustment_tensor(profiles)  # (P, 5, 5, 5)
+    window = np.stack([
+        rollover_window_mask(pitch[:-2], pitch[1:-1], pitch[2:], c) for _, c in configs
+    ]) if N > 2 else np.zeros((P, 0), dtype=bool)  # (P, N-2)
+
+    back = np.zeros((N, P, N_F, N_F), dtype=np.int8)
+    dp = None
+    for lo in range(1, N, chunk):
+        hi = min(N, lo + chunk)
+        trans = transition_cost_matrices(pitch[lo-1:hi-1], pitch[lo:hi], under_slur[lo:hi], stacc[lo:hi],
+                                         profiles, cfgs)  # (P, hi-lo, 5, 5)
+        for i in range(lo, hi):
+            C = trans[:, i - lo]
+            if i == 1:
+                dp = start[:, :, None] + C
+                continue
+            local = C[:, None, :, :] + np.where(window[:, i-2, None, None, None], roll, 0.0)
+            cand = dp[:, :, :, None] + local  # [p, f2, f1, f0]
+            best = np.argmin(cand, axis=1)
+            back[i] = best
+            dp = np.take_along_axis(cand, best[:, None], axis=1)[:, 0]
+
+    flat = dp.reshape(P, -1)
+    tail = np.argmin(flat, axis=1)
+    costs = flat[np.arange(P), tail]
+    a, b = np.divmod(tail, N_F)
+    path = np.empty((N, P), dtype=np.int64)
+    path[N-1] = b
+    rows = np.arange(P)
+    for i in range(N-1, 1, -1):
+        a, b = back[i, rows, a, b].astype(np.int64), a
+        path[i-1] = b
+    path[0] = a
+
+    keys = seq.idx.tolist()
+    return [
+        SweepResult(p, c, float(costs[k]), dict(zip(keys, ([f] for f in (path[:, k] + 1).tolist()))))
+        for k, (p, c) in enumerate(configs)
+    ]
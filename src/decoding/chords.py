@@ -0,0 +1,261 @@
+"""
+Chord-aware second-order decoding.
+
+A hand's notes are grouped into *slices*: a single note, or all members of
+one chord (rows from a :data:`~..pfai.types.CHORD_START` row up to the next
+start). A slice's lattice states are its feasible finger assignments. For a
+chord these are the order-preserving assignments (the right hand's fingers
+rise with pitch, the left hand's fall) whose every finger pair can reach its
+interval; :func:`chord_shape` enumerates them per chord shape (intervals
+above the lowest member), prices each by how far it stretches beyond the
+easy span and caches the result, so a score's repeated voicings cost one
+lookup each.
+
+A transition between slices is priced by the first-order model on the two
+outer voices, averaged, plus the new slice's shape cost. All outer-voice
+matrices of a hand come from one batched
+:meth:`~..rules.costs.CostTables.first_order_stack` call, and each slice
+pair's transition block is gathered from them by fancy indexing. Rollover
+terms apply where three consecutive slices are single notes. On a hand with
+no chords every slice has the five single-finger states and the arithmetic is
+exactly the ``"numpy"`` engine's, fingerings included.
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import combinations
+from typing import Dict, Iterable, List, Tuple, Union
+
+import numpy as np
+
+from ..pfai import profiling
+from ..pfai.config import HandProfile, ModelConfig
+from ..pfai.types import Event, EventTable
+from ..rules.costs import get_cost_tables, rollover_window_mask
+from .second_order_dp import hand_sequence
+from .segmented import N_F
+
+# Fraction of the hand's span that each finger pair (1-based) can cover.
+REACH = {
+    (1, 2): 0.75, (1, 3): 0.85, (1, 4): 0.95, (1, 5): 1.0,
+    (2, 3): 0.40, (2, 4): 0.60, (2, 5): 0.75,
+    (3, 4): 0.40, (3, 5): 0.60,
+    (4, 5): 0.45,
+}
+
+_SINGLE = (np.arange(N_F, dtype=np.int8)[:, None], np.zeros(N_F))
+
+@lru_cache(maxsize=4096)
+def chord_shape(
+    offsets: Tuple[int, ...],
+    left_hand: bool,
+    easy_span: int,
+    max_span: int,
+    stretch_penalty: float,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Feasible assignments of a chord with ``offsets`` semitones above its
+    lowest member (ascending). Returns ``(fingers, cost)``: finger indices
+    0..4 per assignment and member, shape (n, k), and each assignment's
+    stretch cost, shape (n,). ``n`` is 0 if no assignment reaches.
+    """
+    k = len(offsets)
+    rows, costs = [], []
+    for combo in combinations(range(N_F), k):
+        fingers = combo[::-1] if left_hand else combo
+        feasible = True
+        for i, j in combinations(range(k), 2):
+            pair = tuple(sorted((fingers[i] + 1, fingers[j] + 1)))
+            if offsets[j] - offsets[i] > max_span * REACH[pair]:
+                feasible = False
+                break
+        if not feasible:
+            continue
+        stretch = 0.0
+        for i in range(k - 1):
+            pair = tuple(sorted((fingers[i] + 1, fingers[i + 1] + 1)))
+            stretch += max(0.0, offsets[i + 1] - offsets[i] - easy_span * REACH[pair])
+        rows.append(fingers)
+        costs.append(stretch_penalty * stretch)
+    fingers = np.array(rows, dtype=np.int8).reshape(len(rows), k)
+    fingers.setflags(write=False)
+    cost = np.array(costs, dtype=float)
+    cost.setflags(write=False)
+    return fingers, cost
+
+@dataclass
+class Slice:
+    """One single note or chord of a hand: its table rows (by ascending pitch) and lattice states."""
+    rows: np.ndarray      # (k,) rows of the hand table
+    pitch: np.ndarray     # (k,) ascending
+    slur: bool
+    staccato: bool
+    fingers: np.ndarray   # (n, k) finger indices per state
+    cost: np.ndarray      # (n,) shape cost per state
+
+    @property
+    def single(self) -> bool:
+        return len(self.rows) == 1
+
+def chord_slices(
+    seq: EventTable, profile: HandProfile, cfg: ModelConfig, left_hand: bool
+) -> Tuple[List[Slice], int]:
+    """
+    Groups the hand table ``seq`` (chord rows included) into slices. Chords
+    with no feasible assignment are dropped; returns ``(slices, skipped)``.
+    """
+    chord = seq.is_chord
+    starts = np.flatnonzero(~chord | seq.chord_start)
+    bounds = np.append(starts, len(seq))
+    pitch = seq.pitch.astype(np.int64)
+    slur, stacc = seq.slur, seq.staccato
+    slices: List[Slice] = []
+    skipped = 0
+    for a, b in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+        if b - a == 1:
+            slices.append(Slice(np.array([a]), pitch[a:b], bool(slur[a]), bool(stacc[a]), *_SINGLE))
+            continue
+        order = np.argsort(pitch[a:b], kind="stable")
+        members = pitch[a:b][order]
+        fingers, cost = (np.empty((0, b - a), dtype=np.int8), None) if b - a > N_F else chord_shape(
+            tuple((members - members[0]).tolist()), left_hand,
+            profile.easy_span_semitones, profile.max_span_semitones, cfg.chord_stretch_penalty)
+        if not len(fingers):
+            skipped += 1
+            continue
+        slices.append(Slice(a + order, members, bool(slur[a:b].any()), bool(stacc[a:b].any()), fingers, cost))
+    return slices, skipped
+
+@dataclass
+class ChordLattice:
+    """
+    Local costs of the slice lattice, in the layout of
+    :class:`~.second_order_dp.StepCosts`: ``start`` prices slice 0's states,
+    ``trans[k-1]`` is the (n_{k-1}, n_k) block from slice k-1 to k, and the
+    rollover tensor applies at step k >= 2 where ``window[k-2]``.
+    """
+    start: np.ndarray
+    trans: List[np.ndarray]
+    window: np.ndarray
+    roll: np.ndarray
+
+    def local(self, k: int) -> np.ndarray:
+        """Cost of step ``k >= 2`` broadcastable to [a2, a1, a0]."""
+        return self.trans[k-1] + self.roll if self.window[k-2] else self.trans[k-1][None, :, :]
+
+def build_lattice(slices: List[Slice], profile: HandProfile, cfg: ModelConfig) -> ChordLattice:
+    tables = get_cost_tables(profile, cfg)
+    first = slices[0]
+    if first.single:
+        start = tables.start_costs(first.pitch[0])
+    else:
+        start = sum(tables.start_costs(m)[first.fingers[:, j]] for j, m in enumerate(first.pitch.tolist()))
+        start = start + first.cost
+    K = len(slices)
+    low = np.array([s.pitch[0] for s in slices], dtype=np.int64)
+    high = np.array([s.pitch[-1] for s in slices], dtype=np.int64)
+    single = np.array([s.single for s in slices], dtype=bool)
+    slur = np.array([s.slur for s in slices], dtype=bool)
+    stacc = np.array([s.staccato for s in slices], dtype=bool)
+    under_slur = slur[1:] | slur[:-1]
+
+    # One batched lookup for every outer-voice pair; single -> single steps need only the low one.
+    both = ~(single[1:] & single[:-1])
+    L = tables.first_order_stack(low[:-1], low[1:], under_slur, stacc[1:])
+    H = tables.first_order_stack(high[:-1][both], high[1:][both], under_slur[both], stacc[1:][both])
+    h = np.cumsum(both) - 1
+    trans = []
+    for k in range(1, K):
+        if not both[k-1]:
+            trans.append(L[k-1])
+            continue
+        prev, cur = slices[k-1].fingers, slices[k].fingers
+        lo = L[k-1][prev[:, 0][:, None], cur[:, 0][None, :]]
+        hi = H[h[k-1]][prev[:, -1][:, None], cur[:, -1][None, :]]
+        trans.append(0.5 * (lo + hi) + slices[k].cost[None, :])
+
+    window = rollover_window_mask(low[:-2], low[1:-1], low[2:], cfg) & single[:-2] & single[1:-1] & single[2:]
+    return ChordLattice(start=start, trans=trans, window=window, roll=tables.rollover)
+
+def decode_chords(
+    events: Union[EventTable, Iterable[Event]],
+    profile: HandProfile,
+    cfg: ModelConfig,
+    hand_staff: int,
+) -> Dict[int, List[int]]:
+    """
+    Fingers every single note and feasible chord of ``hand_staff``; returns
+    ``{idx: [finger]}`` (one finger per chord member).
+    """
+    seq = hand_sequence(events, hand_staff, include_chords=True)
+    if not len(seq):
+        return {}
+    slices, skipped = chord_slices(seq, profile, cfg, left_hand=hand_staff != 1)
+    profiling.count("chords_skipped", skipped)
+    if not slices:
+        return {}
+    states = _decode_slices(slices, profile, cfg)
+    assign: Dict[int, List[int]] = {}
+    for s, state in zip(slices, states):
+        for row, f in zip(s.rows.tolist(), s.fingers[state].tolist()):
+            assign[int(seq.idx[row])] = [f + 1]
+    profiling.count("decoded_notes", len(assign))
+    return assign
+
+def _decode_slices(slices: List[Slice], profile: HandProfile, cfg: ModelConfig) -> List[int]:
+    """Second-order Viterbi over the slice lattice; returns one state index per slice."""
+    lat = build_lattice(slices, profile, cfg)
+    K = len(slices)
+    if K == 1:
+        return [int(np.argmin(lat.start))]
+    dp = lat.start[:, None] + lat.trans[0]
+    sizes = [len(s.fingers) for s in slices]
+    profiling.count("dp_cells", sizes[0] * sizes[1] + sum(sizes[k-2] * sizes[k-1] * sizes[k] for k in range(2, K)))
+    back = [None, None]
+    for k in range(2, K):
+        cand = dp[:, :, None] + lat.local(k)  # [a2, a1, a0]
+        best = np.argmin(cand, axis=0)
+        back.append(best)
+        dp = np.take_along_axis(cand, best[None], axis=0)[0]
+
+    a, b = divmod(int(np.argmin(dp)), dp.shape[1])
+    path = [b]
+    for k in range(K - 1, 1, -1):
+        a, b = int(back[k][a, b]), a
+        path.append(b)
+    path.append(a)
+    path.reverse()
+    return path
+
+def chord_fingering_cost(
+    events: Union[EventTable, Iterable[Event]],
+    fingering: Dict[int, List[int]],
+    profile: HandProfile,
+    cfg: ModelConfig,
+    hand_staff: int,
+) -> float:
+    """
+    Lattice cost of ``fingering`` on ``hand_staff``; every note of a fed
+    slice must be fingered with one of the slice's feasible assignments.
+    """
+    seq = hand_sequence(events, hand_staff, include_chords=True)
+    slices, _ = chord_slices(seq, profile, cfg, left_hand=hand_staff != 1)
+    if not slices:
+        return 0.0
+    states = []
+    for s in slices:
+        fingers = np.array([fingering[int(seq.idx[r])][0] - 1 for r in s.rows.tolist()])
+        match = np.flatnonzero((s.fingers == fingers).all(axis=1))
+        if not len(match):
+            raise ValueError(f"fingering {(fingers + 1).tolist()} is not feasible for pitches {s.pitch.tolist()}")
+        states.append(int(match[0]))
+    return lattice_path_cost(build_lattice(slices, profile, cfg), states)
+
+def lattice_path_cost(lat: ChordLattice, states: List[int]) -> float:
+    """Total cost of one state per slice, accumulated in the same order as the DP."""
+    total = lat.start[states[0]]
+    if len(states) > 1:
+        total = total + lat.trans[0][states[0], states[1]]
+    for k in range(2, len(states)):
+        local = lat.local(k)
+        total = total + local[0 if local.shape[0] == 1 else states[k-2], states[k-1], states[k]]
+    return float(total)
@@ -0,0 +1,279 @@
+"""
+Incremental second-order decoding for interactive editing.
+
+:class:`IncrementalDecoder` keeps one hand's steps 2..N-1 cut into leaf
+blocks, each summarised by its 25x25 min-plus transfer matrix (see
+:mod:`.segmented`), and a balanced tree of min-plus products over the
+leaves; every internal node also keeps the argmin of its product, i.e. the
+best state between its two children for each pair of boundary states.
+
+Pinning a finger or editing a note only invalidates the leaves whose steps
+read that note, so an update recomputes O(1) leaves and the O(log N) nodes
+above them. :meth:`IncrementalDecoder.solve` then walks down from the root
+and only descends into subtrees whose matrices changed or whose boundary
+states moved, re-tracing just those leaves. Every node is a deterministic
+function of its children, so the result is identical to building a fresh
+decoder from the edited events and pins. Like the segmented engine, it is
+globally optimal but may break ties between equal-cost optima differently
+from the serial engines.
+"""
+from typing import Dict, Iterable, List, Mapping, Optional, Union
+
+import numpy as np
+
+from ..pfai import profiling
+from ..pfai.config import HandProfile, ModelConfig
+from ..pfai.types import Event, EventTable, as_event_table
+from .second_order_dp import build_step_costs, get_cost_tables, hand_sequence
+from .segmented import N_F, N_STATES
+
+DEFAULT_BLOCK = 128
+
+_IDENTITY = np.full((N_STATES, N_STATES), np.inf)
+_IDENTITY[np.arange(N_STATES), np.arange(N_STATES)] = 0.0
+
+def _product(A: np.ndarray, B: np.ndarray):
+    """Min-plus product of two transfer matrices and the argmin middle state of each entry."""
+    cand = A[:, :, None] + B[None, :, :]
+    mid = np.argmin(cand, axis=1)
+    return np.take_along_axis(cand, mid[:, None, :], axis=1)[:, 0, :], mid.astype(np.int8)
+
+class IncrementalDecoder:
+    """
+    Second-order decoder for one staff that accepts pinned fingers and edited
+    notes and re-solves only what they can change.
+
+    ``pin``, ``unpin`` and ``edit`` mark the affected leaves; ``solve``
+    brings the tree and the fingering up to date and returns the notes whose
+    finger changed. Edits may change a note's pitch, slur or staccato, but
+    not which notes the hand plays; build a new decoder for that.
+    """
+    def __init__(
+        self,
+        events: Union[EventTable, Iterable[Event]],
+        profile: HandProfile,
+        cfg: ModelConfig,
+        hand_staff: int,
+        block: int = DEFAULT_BLOCK,
+    ):
+        self.profile = profile
+        self.cfg = cfg
+        self.hand_staff = hand_staff
+        self.block = max(1, int(block))
+        self._seq = hand_sequence(events, hand_staff)
+        N = len(self._seq)
+        self._pitch = self._seq.pitch.astype(np.int64)
+        self._slur = self._seq.slur.copy()
+        self._stacc = self._seq.staccato.copy()
+        self._pin = np.full(N, -1, dtype=np.int8)
+        self._fingers = np.zeros(N, dtype=np.int8)  # finger indices 0..4
+
+        n_leaves = -(-(N - 2) // self.block) if N > 2 else 0
+        self._size = 1
+        while self._size < n_leaves:
+            self._size *= 2
+        self._n_leaves = n_leaves
+        self._T = np.broadcast_to(_IDENTITY, (2 * self._size, N_STATES, N_STATES)).copy()
+        self._mid = np.zeros((2 * self._size, N_STATES, N_STATES), dtype=np.int8)
+        self._assigned = np.full((2 * self._size, 2), -1, dtype=np.int16)
+        self._dirty_leaves = set(range(n_leaves))
+        self._dirty_nodes: set = set()
+        self._state0 = -1
+        self._cost = float("nan")
+        self._solved = False
+
+    def __len__(self) -> int:
+        return len(self._seq)
+
+    def _rows(self, idxs: Iterable[int]) -> np.ndarray:
+        idxs = list(idxs)
+        rows = self._seq.positions(idxs)
+        missing = [k for k, r in zip(idxs, rows.tolist()) if r < 0]
+        if missing:
+            raise ValueError(f"event(s) {missing} are not decoded notes of staff {self.hand_staff}")
+        return rows
+
+    def _touch(self, rows: Iterable[int], reach: int) -> None:
+        """Marks the leaves holding steps ``row..row+reach`` of each changed note."""
+        for row in rows:
+            for step in range(max(2, row), min(len(self), row + reach + 1)):
+                self._dirty_leaves.add((step - 2) // self.block)
+
+    def pin(self, fingers: Mapping[int, int]) -> None:
+        """Forces ``fingers[idx]`` (1..5) on event ``idx``; replaces earlier pins of the same notes."""
+        for f in fingers.values():
+            if not 1 <= f <= N_F:
+                raise ValueError(f"finger {f} is outside 1..{N_F}")
+        rows = self._rows(fingers)
+        self._pin[rows] = np.array([f - 1 for f in fingers.values()], dtype=np.int8)
+        self._touch(rows.tolist(), 0)
+
+    def unpin(self, idxs: Iterable[int]) -> None:
+        rows = self._rows(idxs)
+        self._pin[rows] = -1
+        self._touch(rows.tolist(), 0)
+
+    def pins(self) -> Dict[int, int]:
+        rows = np.flatnonzero(self._pin >= 0)
+        return {int(k): int(f) + 1 for k, f in zip(self._seq.idx[rows], self._pin[rows])}
+
+    def edit(self, events: Union[EventTable, Iterable[Event]]) -> None:
+        """Replaces the pitch, slur and staccato of already decoded notes, matched by ``idx``."""
+        table = as_event_table(events)
+        if np.any(table.staff != self.hand_staff) or np.any(table.is_chord):
+            raise ValueError("an edit cannot move notes between staves or into chords; build a new decoder")
+        rows = self._rows(table.idx.tolist())
+        self._pitch[rows] = table.pitch
+        self._slur[rows] = table.slur
+        self._stacc[rows] = table.staccato
+        # Step i reads notes i-2, i-1 and i.
+        self._touch(rows.tolist(), 2)
+
+    def _start_vector(self) -> np.ndarray:
+        """Costs of the states (f_0, f_1), or of f_0 alone for a single note, with pins applied."""
+        tables = get_cost_tables(self.profile, self.cfg)
+        start = tables.start_costs(self._pitch[0]) + self._pin_penalty(0)
+        if len(self) == 1:
+            return start
+        first = tables.first_order(self._pitch[0], self._pitch[1], bool(self._slur[0] or self._slur[1]),
+                                   bool(self._stacc[1]))
+        return (start[:, None] + first + self._pin_penalty(1)[None, :]).reshape(N_STATES)
+
+    def _pin_penalty(self, row: int) -> np.ndarray:
+        penalty = np.zeros(N_F)
+        if self._pin[row] >= 0:
+            penalty[:] = np.inf
+            penalty[self._pin[row]] = 0.0
+        return penalty
+
+    def _leaf_span(self, leaf: int):
+        start = 2 + leaf * self.block
+        return start, min(len(self), start + self.block)
+
+    def _leaf_locals(self, leaf: int):
+        """Yields the [f2, f1, f0] cost of each step of ``leaf``, pins included."""
+        start, end = self._leaf_span(leaf)
+        lo = start - 2
+        steps = build_step_costs(self._pitch[lo:end], self._slur[lo:end], self._stacc[lo:end], self.profile, self.cfg)
+        for j in range(2, end - lo):
+            local = steps.local(j)
+            if self._pin[lo + j] >= 0:
+                local = local + self._pin_penalty(lo + j)[None, None, :]
+            yield local
+
+    def _leaf_transfer(self, leaf: int) -> np.ndarray:
+        D = _IDENTITY.reshape(N_STATES, N_F, N_F)
+        for local in self._leaf_locals(leaf):
+            D = np.min(D[:, :, :, None] + local[None], axis=1)
+        return D.reshape(N_STATES, N_STATES)
+
+    def _leaf_path(self, leaf: int, s_in: int, s_out: int) -> np.ndarray:
+        """Finger indices for the leaf's notes on its cheapest path from ``s_in`` to ``s_out``."""
+        start, end = self._leaf_span(leaf)
+        dp = np.full((N_F, N_F), np.inf)
+        dp[divmod(s_in, N_F)] = 0.0
+        back = np.zeros((end - start, N_F, N_F), dtype=np.intp)
+        for j, local in enumerate(self._leaf_locals(leaf)):
+            cand = dp[:, :, None] + local
+            back[j] = np.argmin(cand, axis=0)
+            dp = np.take_along_axis(cand, back[j][None], axis=0)[0]
+        a, b = divmod(s_out, N_F)
+        path = [b]
+        for j in range(end - start - 1, 0, -1):
+            a, b = int(back[j, a, b]), a
+            path.append(b)
+        path.reverse()
+        return np.array(path, dtype=np.int8)
+
+    def _refresh_tree(self) -> None:
+        if not self._dirty_leaves:
+            return
+        profiling.count("dp_cells", sum(N_STATES * 125 * (end - start)
+                                        for start, end in map(self._leaf_span, self._dirty_leaves)))
+        parents = set()
+        for leaf in self._dirty_leaves:
+            node = self._size + leaf
+            self._T[node] = self._leaf_transfer(leaf)
+            self._dirty_nodes.add(node)
+            parents.add(node // 2)
+        self._dirty_leaves.clear()
+        while parents and 0 not in parents:
+            above = set()
+            for node in sorted(parents):
+                self._T[node], self._mid[node] = _product(self._T[2 * node], self._T[2 * node + 1])
+                self._dirty_nodes.add(node)
+                above.add(node // 2)
+            parents = above
+
+    def _descend(self, node: int, s_in: int, s_out: int, touched: List[int]) -> None:
+        if node not in self._dirty_nodes and self._assigned[node, 0] == s_in and self._assigned[node, 1] == s_out:
+            return
+        self._dirty_nodes.discard(node)
+        self._assigned[node] = (s_in, s_out)
+        if node >= self._size:
+            leaf = node - self._size
+            if leaf < self._n_leaves:
+                start, end = self._leaf_span(leaf)
+                profiling.count("dp_cells", 125 * (end - start))
+                self._fingers[start:end] = self._leaf_path(leaf, s_in, s_out)
+                touched.append(leaf)
+            return
+        mid = int(self._mid[node, s_in, s_out])
+        self._descend(2 * node, s_in, mid, touched)
+        self._descend(2 * node + 1, mid, s_out, touched)
+
+    def solve(self) -> Dict[int, List[int]]:
+        """
+        Brings the decode up to date and returns ``{idx: [finger]}`` for every
+        note whose finger changed since the previous call (all notes the
+        first time).
+        """
+        N = len(self)
+        if not N:
+            return {}
+        before = self._fingers.copy() if self._solved else None
+        v = self._start_vector()
+        touched: List[int] = []
+        if N == 1:
+            self._fingers[0] = int(np.argmin(v))
+            self._cost = float(v[self._fingers[0]])
+        elif N == 2:
+            self._fingers[:] = divmod(int(np.argmin(v)), N_F)
+            self._cost = float(v.min())
+        else:
+            self._refresh_tree()
+            total = v[:, None] + self._T[1]
+            s0, s_out = divmod(int(np.argmin(total)), N_STATES)
+            self._cost = float(total[s0, s_out])
+            self._fingers[:2] = divmod(s0, N_F)
+            self._descend(1, s0, s_out, touched)
+        self._solved = True
+        if before is None:
+            rows = np.arange(N)
+        else:
+            rows = np.flatnonzero(before != self._fingers)
+        return {int(k): [int(f) + 1] for k, f in zip(self._seq.idx[rows], self._fingers[rows])}
+
+    def fingering(self) -> Dict[int, List[int]]:
+        """The current optimal fingering of every note, ``{idx: [finger]}``."""
+        self.solve()
+        return {int(k): [int(f) + 1] for k, f in zip(self._seq.idx, self._fingers)}
+
+    def cost(self) -> float:
+        """Model cost of the current optimum (pins included)."""
+        self.solve()
+        return self._cost
+
+def decode_incremental(
+    events: Union[EventTable, Iterable[Event]],
+    profile: HandProfile,
+    cfg: ModelConfig,
+    hand_staff: int,
+    pins: Optional[Mapping[int, int]] = None,
+    block: int = DEFAULT_BLOCK,
+) -> Dict[int, List[int]]:
+    """One-shot decode with optional pinned fingers, through a fresh :class:`IncrementalDecoder`."""
+    decoder = IncrementalDecoder(events, profile, cfg, hand_staff, block)
+    if pins:
+        decoder.pin(pins)
+    return decoder.fingering()
@@ -0,0 +1,217 @@
+"""
+K-best second-order decoding.
+
+The forward pass is the ``"numpy"`` engine's: ``dp[i, a, b]`` is the best
+cost of notes 0..i ending with fingers (a, b) on notes i-1 and i. The
+trellis node ``(i, a, b)`` has five incoming edges, one per finger ``c`` on
+note i-2, weighted by that step's local cost; a virtual sink after the last
+note takes an edge from each of its 25 states.
+
+Paths are then extracted lazily, as in Huang & Chiang's "Algorithm 3"
+(*Better k-best parsing*, 2005): every node keeps the derivations found so
+far, ``(cost, c, j)`` meaning "the j-th best derivation of the predecessor
+via ``c``", and a heap of candidate next derivations. The next derivation of
+a node is popped from its heap, and only then is the successor ``(c, j+1)``
+of the previous one pushed, which in turn asks the predecessor for its
+(j+1)-th best. A node's lists never exceed K entries plus five candidates,
+and only nodes that some of the K paths deviate through are touched, so
+memory is O(N*K) rather than growing with the number of paths.
+
+The best path is always the ``"numpy"`` engine's fingering; paths of equal
+cost keep the order of the lowest finger first.
+"""
+import heapq
+from typing import Dict, Iterable, List, NamedTuple, Tuple, Union
+
+import numpy as np
+
+from ..pfai import profiling
+from ..pfai.config import HandProfile, ModelConfig
+from ..pfai.types import Event, EventTable
+from .second_order_dp import StepCosts, build_step_costs, dp_cells, get_cost_tables, hand_sequence, sequence_arrays
+from .segmented import N_F, N_STATES
+
+DEFAULT_K = 3
+
+class ScoredFingering(NamedTuple):
+    cost: float
+    fingering: Dict[int, List[int]]
+
+# A derivation: (cost, predecessor choice, rank in the predecessor's list).
+_Deriv = Tuple[float, int, int]
+
+class _LazyKBest:
+    """Lazy k-best extraction over a forward-filled trellis of ``N >= 2`` notes."""
+    def __init__(self, steps: StepCosts, dp: np.ndarray):
+        self.steps = steps
+        self.dp = dp
+        self.N = len(dp)
+        self.sink = self.N * N_STATES
+        self.derivs: Dict[int, List[_Deriv]] = {}
+        self.cand: Dict[int, List[_Deriv]] = {}
+        # Predecessor choice and rank of each node's last derivation, whose successor is not yet queued.
+        self.pending: Dict[int, Tuple[int, int]] = {}
+
+    def _pred(self, v: int, c: int) -> int:
+        """Node reached from ``v`` backwards through choice ``c``."""
+        if v == self.sink:
+            return (self.N - 1) * N_STATES + c
+        i, s = divmod(v, N_STATES)
+        return (i - 1) * N_STATES + c * N_F + s // N_F
+
+    def _weight(self, v: int, c: int) -> float:
+        if v == self.sink:
+            return 0.0
+        i, s = divmod(v, N_STATES)
+        a, b = divmod(s, N_F)
+        w = self.steps.trans[i-1][a, b]
+        if self.steps.window[i-2]:
+            w = w + self.steps.roll[c, a, b]
+        return w
+
+    def _list(self, v: int) -> List[_Deriv]:
+        D = self.derivs.get(v)
+        if D is not None:
+            return D
+        i, s = divmod(v, N_STATES)
+        if i == 1:
+            D = self.derivs[v] = [(float(self.dp[1].reshape(N_STATES)[s]), -1, -1)]
+            self.cand[v] = []
+            return D
+        heap = []
+        for c in range(N_STATES if v == self.sink else N_F):
+            u = self._pred(v, c)
+            cost = self.dp[u // N_STATES].reshape(N_STATES)[u % N_STATES] + self._weight(v, c)
+            if np.isfinite(cost):
+                heap.append((float(cost), c, 0))
+        heapq.heapify(heap)
+        self.cand[v] = heap
+        D = self.derivs[v] = []
+        return D
+
+    def _exhausted(self, v: int) -> bool:
+        return v not in self.pending and not self.cand[v]
+
+    def kth(self, v: int, k: int) -> bool:
+        """Makes sure node ``v`` has its ``k`` best derivations; False if it has fewer."""
+        stack = [(v, k)]
+        while stack:
+            v, k = stack[-1]
+            D = self._list(v)
+            if len(D) >= k:
+                stack.pop()
+                continue
+            if v in self.pending:
+                c, j = self.pending[v]
+                u = self._pred(v, c)
+                Du = self._list(u)
+                if len(Du) < j + 2 and not self._exhausted(u):
+                    stack.append((u, j + 2))
+                    continue
+                del self.pending[v]
+                if len(Du) >= j + 2:
+                    heapq.heappush(self.cand[v], (float(Du[j+1][0] + self._weight(v, c)), c, j + 1))
+            if not self.cand[v]:
+                stack.pop()
+                continue
+            d = heapq.heappop(self.cand[v])
+            D.append(d)
+            self.pending[v] = (d[1], d[2])
+        return len(self.derivs[v]) >= k
+
+    def path(self, rank: int) -> Tuple[float, List[int]]:
+        """Cost and finger indices of the sink's ``rank``-th (0-based) derivation."""
+        cost, c, j = self.derivs[self.sink][rank]
+        v = self._pred(self.sink, c)
+        path = [v % N_F]
+        while v // N_STATES > 1:
+            # Candidates name a predecessor's best derivation before it is materialized.
+            self.kth(v, j + 1)
+            _, c, j = self.derivs[v][j]
+            v = self._pred(v, c)
+            path.append(v % N_F)
+        path.append(v % N_STATES // N_F)
+        path.reverse()
+        return cost, path
+
+def decode_kbest(
+    events: Union[EventTable, Iterable[Event]],
+    profile: HandProfile,
+    cfg: ModelConfig,
+    hand_staff: int,
+    k: int = DEFAULT_K,
+) -> List[ScoredFingering]:
+    """
+    Up to ``k`` cheapest distinct fingerings of ``hand_staff``, cheapest
+    first, each with its model cost (as :func:`~.second_order_dp.fingering_cost`).
+    """
+    seq = hand_sequence(events, hand_staff)
+    N = len(seq)
+    if not N or k < 1:
+        return []
+    idx = seq.idx.tolist()
+    pitch, slur, stacc = sequence_arrays(seq)
+    if N == 1:
+        start = get_cost_tables(profile, cfg).start_costs(pitch[0])
+        order = np.argsort(start, kind="stable")[:k]
+        return [ScoredFingering(float(start[f]), {idx[0]: [int(f) + 1]}) for f in order.tolist()]
+
+    steps = build_step_costs(pitch, slur, stacc, profile, cfg)
+    profiling.count("dp_cells", dp_cells(N))
+    dp = np.empty((N, N_F, N_F))
+    dp[0] = np.inf
+    dp[1] = steps.start[:, None] + steps.trans[0]
+    for i in range(2, N):
+        dp[i] = np.min(dp[i-1][:, :, None] + steps.local(i), axis=0)
+
+    lazy = _LazyKBest(steps, dp)
+    lazy.kth(lazy.sink, k)
+    profiling.count("kbest_nodes", len(lazy.derivs))
+    out = []
+    for rank in range(len(lazy.derivs[lazy.sink])):
+        cost, path = lazy.path(rank)
+        out.append(ScoredFingering(cost, {i: [f + 1] for i, f in zip(idx, path)}))
+    return out
+
+def note_alternatives(paths: List[ScoredFingering]) -> Dict[int, List[int]]:
+    """
+    Per-note fingers across ``paths`` (cheapest first): ``{idx: [best, alt, ...]}``
+    with each distinct finger once, in the rank of the first path using it.
+    """
+    alternatives: Dict[int, List[int]] = {}
+    for path in paths:
+        for k, (f,) in path.fingering.items():
+            fingers = alternatives.setdefault(k, [])
+            if f not in fingers:
+                fingers.append(f)
+    return alternatives
+
+def with_alternatives(
+    fingering: Dict[int, List[int]],
+    events: Union[EventTable, Iterable[Event]],
+    profile: HandProfile,
+    cfg: ModelConfig,
+    hand_staff: int,
+    k: int = DEFAULT_K,
+) -> Dict[int, List[int]]:
+    """
+    ``fingering`` with each of ``hand_staff``'s notes extended by the other
+    fingers it gets among the ``k`` best fingerings; notes of other staves
+    and chord members are left as they are.
+
+    ``fingering`` must come from an exact single-note engine: it takes the
+    place of the best path, so an engine breaking a tie differently from
+    ``"numpy"`` does not get the other optimum listed as alternatives.
+    """
+    out = {key: list(fingers) for key, fingers in fingering.items()}
+    paths = decode_kbest(events, profile, cfg, hand_staff, k)
+    if paths:
+        primary = {key: out.get(key, [f])[:1] for key, (f,) in paths[0].fingering.items()}
+        others = [path for path in paths if path.fingering != primary]
+        if len(others) == len(paths):
+            others = others[1:]
+        paths = [ScoredFingering(paths[0].cost, primary)] + others[:k - 1]
+    for key, fingers in note_alternatives(paths).items():
+        if key in out:
+            out[key] += [f for f in fingers if f not in out[key]]
+    return out
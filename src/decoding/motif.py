@@ -0,0 +1,262 @@
+"""
+Motif-memoized second-order decoding for repetitive music.
+
+A step's local costs (see :class:`~.second_order_dp.StepCosts`) depend on
+its notes only through the signed interval, the white-key distance, whether
+the new note is black, the slur and staccato flags and whether the rollover
+window is open. :func:`step_signatures` packs exactly those into one integer
+per step, so two runs of steps with equal signatures have bit-identical
+costs wherever they sit on the keyboard: transposed repeats of an arpeggio
+figure match whenever their black/white geometry does.
+
+The steps are cut into content-defined windows (a cut follows every step
+whose rolling hash is divisible by ``window``), so repeats are cut at the
+same phase. Windows seen before, or more than once in this sequence, are
+crossed with their cached 25x25 min-plus transfer matrix (see
+:mod:`.segmented`); all others are stepped through exactly as the
+``"numpy"`` engine does. Each window's inner path is cached per pair of
+boundary states. The result is globally optimal and, with no repeated
+windows, identical to ``"numpy"``; among equal-cost optima it may break ties
+differently.
+"""
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..features.geometry import BLACK_KEY_MASK, WHITE_KEY_ORDINALS
+from ..pfai import profiling
+from ..pfai.config import HandProfile, ModelConfig
+from ..pfai.types import EventTable
+from ..rules.costs import config_fingerprint, rollover_window_mask
+from .second_order_dp import StepCosts, build_step_costs, get_cost_tables, sequence_arrays
+from .segmented import N_F, N_STATES, minplus
+
+DEFAULT_WINDOW = 8
+MOTIF_CACHE_SIZE = 4096
+# Motif caches kept for distinct (HandProfile, ModelConfig) pairs.
+MOTIF_CACHES_SIZE = 8
+
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+_MIX2 = np.uint64(0x9E3779B97F4A7C15 ** 2 % (1 << 64))
+
+class MotifCache:
+    """
+    Transfer matrices and inner paths of windows, keyed by their step
+    signatures, for one (HandProfile, ModelConfig) pair. Holds at most
+    ``max_entries`` windows; the least recently used are evicted with their paths.
+    """
+    def __init__(self, max_entries: int = MOTIF_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._transfers: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._paths: Dict[bytes, Dict[Tuple[int, int], np.ndarray]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._transfers)
+
+    def __contains__(self, key: bytes) -> bool:
+        return key in self._transfers
+
+    def transfer(self, key: bytes, build) -> np.ndarray:
+        T = self._transfers.get(key)
+        if T is not None:
+            self.hits += 1
+            profiling.count("motif_hits")
+            self._transfers.move_to_end(key)
+            return T
+        self.misses += 1
+        profiling.count("motif_misses")
+        T = self._transfers[key] = build()
+        self._paths[key] = {}
+        while len(self._transfers) > self.max_entries:
+            old, _ = self._transfers.popitem(last=False)
+            del self._paths[old]
+        return T
+
+    def path(self, key: bytes, s_in: int, s_out: int, build) -> np.ndarray:
+        """
+        The window's inner path between two boundary states. A window evicted
+        since its transfer was fetched (one decode can use more windows than
+        the cache holds) has its path rebuilt and not stored.
+        """
+        paths = self._paths.get(key)
+        path = None if paths is None else paths.get((s_in, s_out))
+        if path is None:
+            path = np.asarray(build(), dtype=np.int8)
+            if paths is not None:
+                paths[(s_in, s_out)] = path
+        return path
+
+_MOTIF_CACHES: "OrderedDict[str, MotifCache]" = OrderedDict()
+
+def get_motif_cache(profile: HandProfile, cfg: ModelConfig) -> MotifCache:
+    """The shared :class:`MotifCache` for ``(profile, cfg)``, created on first use."""
+    key = config_fingerprint(profile, cfg)
+    cache = _MOTIF_CACHES.get(key)
+    if cache is None:
+        cache = _MOTIF_CACHES[key] = MotifCache()
+        while len(_MOTIF_CACHES) > MOTIF_CACHES_SIZE:
+            _MOTIF_CACHES.popitem(last=False)
+    else:
+        _MOTIF_CACHES.move_to_end(key)
+    return cache
+
+def clear_motif_caches() -> None:
+    _MOTIF_CACHES.clear()
+
+def step_signatures(pitch: np.ndarray, slur: np.ndarray, stacc: np.ndarray, cfg: ModelConfig) -> np.ndarray:
+    """
+    One int64 per step 2..N-1 that determines the step's local costs
+    (``trans[i-1]`` and, through the window bit, the rollover term).
+    """
+    pitch = np.asarray(pitch, dtype=np.int64)
+    prev, cur = pitch[1:-1], pitch[2:]
+    delta = cur - prev + 128
+    wdist = np.abs(WHITE_KEY_ORDINALS[cur] - WHITE_KEY_ORDINALS[prev])
+    under_slur = slur[2:] | slur[1:-1]
+    window = rollover_window_mask(pitch[:-2], prev, cur, cfg)
+    sig = (delta * 128 + wdist) * 2 + BLACK_KEY_MASK[cur]
+    return ((sig * 2 + under_slur) * 2 + stacc[2:]) * 2 + window
+
+def motif_windows(sig: np.ndarray, window: int = DEFAULT_WINDOW) -> List[Tuple[int, int]]:
+    """
+    Content-defined ``(start, end)`` step ranges covering steps 2..N-1, where
+    ``sig[k]`` belongs to step ``k + 2``. A cut follows each step whose hash
+    over its last three signatures is divisible by ``window``, once the
+    window is at least ``window // 2`` long; none grows beyond ``4 * window``.
+    """
+    n = len(sig)
+    if not n:
+        return []
+    s = sig.astype(np.uint64)
+    h = s.copy()
+    h[1:] = h[1:] ^ (s[:-1] * _MIX)
+    h[2:] = h[2:] ^ (s[:-2] * _MIX2)
+    h = (h * _MIX) >> np.uint64(17)
+    candidates = np.flatnonzero(h % np.uint64(max(1, window)) == 0).tolist()
+    bounds = [0]
+    lo, hi = max(1, window // 2), 4 * max(1, window)
+    for k in candidates:
+        while k + 1 - bounds[-1] > hi:
+            bounds.append(bounds[-1] + hi)
+        if k + 1 - bounds[-1] >= lo:
+            bounds.append(k + 1)
+    while n - bounds[-1] > hi:
+        bounds.append(bounds[-1] + hi)
+    if bounds[-1] != n:
+        bounds.append(n)
+    return [(a + 2, b + 2) for a, b in zip(bounds[:-1], bounds[1:])]
+
+def _window_transfer(steps: StepCosts, a: int, b: int) -> np.ndarray:
+    """25x25 transfer matrix of steps ``a..b-1``, as :func:`~.segmented.segment_transfer`."""
+    D = np.full((N_STATES, N_F, N_F), np.inf)
+    D.reshape(N_STATES, N_STATES)[np.arange(N_STATES), np.arange(N_STATES)] = 0.0
+    for i in range(a, b):
+        D = np.min(D[:, :, :, None] + steps.local(i)[None], axis=1)
+    return D.reshape(N_STATES, N_STATES)
+
+def _window_path(steps: StepCosts, a: int, b: int, s_in: int, s_out: int) -> List[int]:
+    """Finger indices of notes ``a..b-1`` on the cheapest path from ``s_in`` to ``s_out``."""
+    dp = np.full((N_F, N_F), np.inf)
+    dp[divmod(s_in, N_F)] = 0.0
+    back = np.zeros((b - a, N_F, N_F), dtype=np.intp)
+    for i in range(a, b):
+        cand = dp[:, :, None] + steps.local(i)
+        back[i - a] = np.argmin(cand, axis=0)
+        dp = np.take_along_axis(cand, back[i - a][None], axis=0)[0]
+    x, y = divmod(s_out, N_F)
+    path = [y]
+    for j in range(b - a - 1, 0, -1):
+        x, y = int(back[j, x, y]), x
+        path.append(y)
+    path.reverse()
+    return path
+
+def decode_motif(
+    seq: EventTable,
+    profile: HandProfile,
+    cfg: ModelConfig,
+    window: int = DEFAULT_WINDOW,
+    cache: Optional[MotifCache] = None,
+) -> List[int]:
+    """
+    Decodes one hand's sequence, crossing repeated windows through ``cache``
+    (the shared cache for the parameters by default); returns fingers 1..5.
+    """
+    N = len(seq)
+    pitch, slur, stacc = sequence_arrays(seq)
+    tables = get_cost_tables(profile, cfg)
+    start = tables.start_costs(pitch[0])
+    if N == 1:
+        return [int(np.argmin(start)) + 1]
+    dp = start[:, None] + tables.first_order(pitch[0], pitch[1], bool(slur[0] or slur[1]), bool(stacc[1]))
+    if N == 2:
+        a, b = divmod(int(np.argmin(dp)), N_F)
+        return [a + 1, b + 1]
+    if cache is None:
+        cache = get_motif_cache(profile, cfg)
+
+    sig = step_signatures(pitch, slur, stacc, cfg)
+    windows = motif_windows(sig, window)
+    keys = [sig[a - 2:b - 2].tobytes() for a, b in windows]
+    counts: Dict[bytes, int] = {}
+    for key in keys:
+        counts[key] = counts.get(key, 0) + 1
+
+    memo = [key in cache or counts[key] > 1 for key in keys]
+    steps = build_step_costs(pitch, slur, stacc, profile, cfg)
+
+    # Forward: ("T", entering vector, transfer) per memoized window, ("step", backpointers) per run of others.
+    plan = []
+    runs = []
+    cells = 0
+    k = 0
+    while k < len(windows):
+        a, b = windows[k]
+        if memo[k]:
+            key = keys[k]
+            if key not in cache:
+                cells += N_STATES * 125 * (b - a)
+            T = cache.transfer(key, lambda: _window_transfer(steps, a, b))
+            v = dp.reshape(N_STATES)
+            plan.append(("T", v, T))
+            runs.append((a, b, key))
+            dp = minplus(v, T).reshape(N_F, N_F)
+            k += 1
+            continue
+        while k + 1 < len(windows) and not memo[k + 1]:
+            k += 1
+        b = windows[k][1]
+        cells += 125 * (b - a)
+        back = np.zeros((b - a, N_F, N_F), dtype=np.intp)
+        for i in range(a, b):
+            cand = dp[:, :, None] + steps.local(i)
+            back[i - a] = np.argmin(cand, axis=0)
+            dp = np.take_along_axis(cand, back[i - a][None], axis=0)[0]
+        plan.append(("step", back))
+        runs.append((a, b, None))
+        k += 1
+    profiling.count("dp_cells", 25 + cells)
+
+    state = int(np.argmin(dp))
+    path: List[int] = []
+    for (a, b, key), entry in zip(reversed(runs), reversed(plan)):
+        if entry[0] == "T":
+            _, v, T = entry
+            s_in = int(np.argmin(v + T[:, state]))
+            inner = cache.path(key, s_in, state, lambda: _window_path(steps, a, b, s_in, state))
+            path.extend(inner[::-1].tolist())
+            state = s_in
+        else:
+            back = entry[1]
+            x, y = divmod(state, N_F)
+            for j in range(b - a - 1, -1, -1):
+                path.append(y)
+                x, y = int(back[j, x, y]), x
+            state = x * N_F + y
+    f0, f1 = divmod(state, N_F)
+    path.extend([f1, f0])
+    path.reverse()
+    return [f + 1 for f in path]
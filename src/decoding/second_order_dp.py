@@ -1,29 +1,276 @@
+import math
 import numpy as np
-from typing import Dict, List
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Tuple, Union
+from ..pfai import profiling
 from ..pfai.constants import INF_COST, FINGERS
-from ..pfai.types import Event
+from ..pfai.types import Event, EventTable, as_event_table
 from ..pfai.config import HandProfile, ModelConfig
 from ..rules.costs import (
     start_cost,
     transition_cost_first_order,
     apply_rollover_adjustments,
+    rollover_window_mask,
+    get_cost_tables,
 )
 
+ENGINES = ("numpy", "python", "segmented", "compact", "motif", "chord")
+
+# Steps per cost-table chunk in the compact engine.
+COMPACT_CHUNK = 4096
+
 def decode_monophonic_second_order(
-    events: List[Event],
+    events: Union[EventTable, Iterable[Event]],
     profile: HandProfile,
     cfg: ModelConfig,
-    hand_staff: int
+    hand_staff: int,
+    engine: str = "numpy",
+    **engine_options
 ) -> Dict[int, List[int]]:
     """
     Second-order DP (state carries last two fingers) with rollover support.
     Returns a mapping from event.idx to [finger].
+
+    ``engine`` selects the implementation: ``"numpy"`` evaluates each step as a
+    broadcast 5x5x5 tensor, ``"python"`` is the original scalar reference loop,
+    ``"compact"`` is the low-memory variant of ``"numpy"`` (all three return
+    identical fingerings), ``"segmented"`` decodes segments in parallel and
+    stitches them exactly (see :mod:`.segmented`), ``"motif"`` reuses
+    cached solutions of repeated, possibly transposed windows (see :mod:`.motif`),
+    and ``"chord"`` also fingers chord members (see :mod:`.chords`); the other
+    engines skip them. ``engine_options`` are passed to the selected engine.
     """
-    seq = [e for e in events if e.staff == hand_staff and not e.is_chord]
-    if not seq:
+    if engine not in ENGINES:
+        raise ValueError(f"unknown decoder engine {engine!r}; expected one of {ENGINES}")
+    if engine == "chord":
+        from .chords import decode_chords
+        return decode_chords(events, profile, cfg, hand_staff, **engine_options)
+    seq = hand_sequence(events, hand_staff)
+    if not len(seq):
         return {}
 
+    profiling.count("decoded_notes", len(seq))
+    if engine == "numpy":
+        fingers = _decode_numpy(seq, profile, cfg, **engine_options)
+    elif engine == "compact":
+        fingers = _decode_compact(seq, profile, cfg, **engine_options)
+    elif engine == "segmented":
+        from .segmented import decode_segmented
+        fingers = decode_segmented(seq, profile, cfg, **engine_options)
+    elif engine == "motif":
+        from .motif import decode_motif
+        fingers = decode_motif(seq, profile, cfg, **engine_options)
+    else:
+        fingers = _decode_python(seq, profile, cfg, **engine_options)
+
+    assign: Dict[int, List[int]] = {}
+    for k, f in zip(seq.idx.tolist(), fingers):
+        assign[k] = [int(f)]
+    return assign
+
+def hand_sequence(events: Union[EventTable, Iterable[Event]], hand_staff: int,
+                  include_chords: bool = False) -> EventTable:
+    """The events the decoder sees for ``hand_staff``, in order (single notes only unless ``include_chords``)."""
+    return as_event_table(events).for_staff(hand_staff, include_chords=include_chords)
+
+def sequence_arrays(seq: Union[EventTable, Iterable[Event]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(pitch, slur, staccato) columns of ``seq`` as NumPy arrays."""
+    seq = as_event_table(seq)
+    return seq.pitch.astype(np.int64), seq.slur, seq.staccato
+
+@dataclass
+class StepCosts:
+    """
+    Local costs of the second-order DP over one note sequence (finger axes 0..4).
+
+    ``start[f]`` prices the first note; step i >= 1 (note i-1 -> note i) uses
+    ``trans[i-1]`` and, for i >= 2, the rollover tensor where ``window[i-2]``.
+    """
+    start: np.ndarray   # (5,)
+    trans: np.ndarray   # (N-1, 5, 5) [f_prev, f_cur]
+    window: np.ndarray  # (N-2,) bool
+    roll: np.ndarray    # (5, 5, 5) [f2, f1, f0]
+
+    def local(self, i: int) -> np.ndarray:
+        """Cost of step ``i >= 2`` broadcastable to [f2, f1, f0]."""
+        return self.trans[i-1] + self.roll if self.window[i-2] else self.trans[i-1][None, :, :]
+
+def build_step_costs(
+    pitch: np.ndarray, slur: np.ndarray, staccato: np.ndarray,
+    profile: HandProfile, cfg: ModelConfig
+) -> StepCosts:
+    """Builds :class:`StepCosts` from sequence columns using the shared cost tables."""
+    tables = get_cost_tables(profile, cfg)
+    return StepCosts(
+        start=tables.start_costs(pitch[0]),
+        trans=tables.first_order_stack(pitch[:-1], pitch[1:], slur[1:] | slur[:-1], staccato[1:]),
+        window=rollover_window_mask(pitch[:-2], pitch[1:-1], pitch[2:], cfg),
+        roll=tables.rollover,
+    )
+
+def path_cost(steps: StepCosts, fingers: List[int]) -> float:
+    """
+    Total cost of a finger path (fingers 1..5), accumulated in the same order
+    as the DP so the optimum reproduces ``min(dp[N-1])`` exactly.
+    """
+    f = [x - 1 for x in fingers]
+    total = steps.start[f[0]]
+    if len(f) > 1:
+        total = total + steps.trans[0][f[0], f[1]]
+    for i in range(2, len(f)):
+        total = total + np.broadcast_to(steps.local(i), (5, 5, 5))[f[i-2], f[i-1], f[i]]
+    return float(total)
+
+def fingering_cost(
+    events: Union[EventTable, Iterable[Event]],
+    fingering: Dict[int, List[int]],
+    profile: HandProfile,
+    cfg: ModelConfig,
+    hand_staff: int
+) -> float:
+    """Model cost of ``fingering`` on the ``hand_staff`` sequence (all notes must be fingered)."""
+    seq = hand_sequence(events, hand_staff)
+    if not len(seq):
+        return 0.0
+    steps = build_step_costs(*sequence_arrays(seq), profile, cfg)
+    return path_cost(steps, [fingering[k][0] for k in seq.idx.tolist()])
+
+def _decode_numpy(seq: EventTable, profile: HandProfile, cfg: ModelConfig) -> List[int]:
+    """
+    Vectorized engine. ``dp[i, a, b]`` is the best cost ending with fingers
+    (a+1, b+1) on notes i-1 and i; ``back[i, a, b]`` stores the finger index on note i-2.
+    Ties resolve to the lowest finger, as in the scalar loop.
+    """
+    N = len(seq)
+    pitch, slur, stacc = sequence_arrays(seq)
+    if N == 1:
+        return [int(np.argmin(get_cost_tables(profile, cfg).start_costs(pitch[0]))) + 1]
+    steps = build_step_costs(pitch, slur, stacc, profile, cfg)
+    profiling.count("dp_cells", dp_cells(N))
+
+    dp = np.empty((N, len(FINGERS), len(FINGERS)))
+    back = np.zeros((N, len(FINGERS), len(FINGERS)), dtype=np.int8)
+    dp[0] = INF_COST
+    dp[1] = steps.start[:, None] + steps.trans[0]
+    for i in range(2, N):
+        cand = dp[i-1][:, :, None] + steps.local(i)  # [f2, f1, f0]
+        best = np.argmin(cand, axis=0)
+        back[i] = best
+        dp[i] = np.take_along_axis(cand, best[None], axis=0)[0]
+
+    a, b = divmod(int(np.argmin(dp[N-1])), len(FINGERS))
+    path = [b]
+    for i in range(N-1, 1, -1):
+        a, b = int(back[i, a, b]), a
+        path.append(b)
+    path.append(a)
+    path.reverse()
+    return [f + 1 for f in path]
+
+def _step_chunks(pitch, slur, stacc, profile, cfg, lo: int, hi: int, chunk: int):
+    """
+    Yields ``(i0, i1, steps)`` covering DP steps ``lo..hi-1`` (lo >= 2) in
+    chunks; step ``i`` is ``steps.local(i - i0 + 2)``.
+    """
+    for i0 in range(lo, hi, chunk):
+        i1 = min(hi, i0 + chunk)
+        yield i0, i1, build_step_costs(pitch[i0-2:i1], slur[i0-2:i1], stacc[i0-2:i1], profile, cfg)
+
+def _decode_compact(
+    seq: EventTable, profile: HandProfile, cfg: ModelConfig,
+    checkpoint: bool = False, chunk: int = COMPACT_CHUNK
+) -> List[int]:
+    """
+    Low-memory engine with the same arithmetic (and fingerings) as ``"numpy"``.
+
+    Keeps one rolling 5x5 cost row instead of ``dp`` and builds step costs
+    ``chunk`` steps at a time. Backpointers are int8, N x 25 bytes; with
+    ``checkpoint=True`` only the cost row at every sqrt(N)-th step is kept and
+    each block's backpointers are recomputed from it while backtracking.
+    See :func:`decoder_memory_bytes` for the resulting bound.
+    """
+    N = len(seq)
+    tables = get_cost_tables(profile, cfg)
+    pitch, slur, stacc = sequence_arrays(seq)
+    start = tables.start_costs(pitch[0])
+    if N == 1:
+        return [int(np.argmin(start)) + 1]
+    dp = start[:, None] + tables.first_order(pitch[0], pitch[1], bool(slur[0] or slur[1]), bool(stacc[1]))
+    # Checkpointing runs the forward pass twice for steps 2..N-1.
+    profiling.count("dp_cells", dp_cells(N) + (dp_cells(N) - dp_cells(2) if checkpoint else 0))
+
+    def forward(dp, i0, i1, steps, back=None, offset=0):
+        for i in range(i0, i1):
+            cand = dp[:, :, None] + steps.local(i - i0 + 2)
+            best = np.argmin(cand, axis=0)
+            if back is not None:
+                back[i - offset] = best
+            dp = np.take_along_axis(cand, best[None], axis=0)[0]
+        return dp
+
+    if not checkpoint:
+        back = np.zeros((N, len(FINGERS), len(FINGERS)), dtype=np.int8)
+        for i0, i1, steps in _step_chunks(pitch, slur, stacc, profile, cfg, 2, N, chunk):
+            dp = forward(dp, i0, i1, steps, back)
+        a, b = divmod(int(np.argmin(dp)), len(FINGERS))
+        path = [b]
+        for i in range(N-1, 1, -1):
+            a, b = int(back[i, a, b]), a
+            path.append(b)
+    else:
+        block = max(1, math.isqrt(N))
+        bounds = [(b0, min(N, b0 + block)) for b0 in range(2, N, block)]
+        saved = []
+        for b0, b1 in bounds:
+            saved.append(dp)
+            for i0, i1, steps in _step_chunks(pitch, slur, stacc, profile, cfg, b0, b1, chunk):
+                dp = forward(dp, i0, i1, steps)
+        a, b = divmod(int(np.argmin(dp)), len(FINGERS))
+        path = [b]
+        # Recompute each block's backpointers from its checkpoint, last block first.
+        for (b0, b1), row in zip(reversed(bounds), reversed(saved)):
+            back = np.zeros((b1 - b0, len(FINGERS), len(FINGERS)), dtype=np.int8)
+            for i0, i1, steps in _step_chunks(pitch, slur, stacc, profile, cfg, b0, b1, chunk):
+                row = forward(row, i0, i1, steps, back, offset=b0)
+            for i in range(b1 - 1, b0 - 1, -1):
+                a, b = int(back[i - b0, a, b]), a
+                path.append(b)
+    path.append(a)
+    path.reverse()
+    return [f + 1 for f in path]
+
+def dp_cells(n: int) -> int:
+    """(f2, f1, f0) candidates one forward pass evaluates over ``n`` notes."""
+    return 0 if n < 2 else 25 + 125 * (n - 2)
+
+def decoder_memory_bytes(n: int, engine: str = "numpy", checkpoint: bool = False, chunk: int = COMPACT_CHUNK) -> int:
+    """
+    Upper bound on the decoder's working memory for ``n`` notes, excluding the
+    input events, the returned mapping and the shared cost-table cache.
+
+    Sequence columns and the path list take ~26 B/note. ``"numpy"`` adds
+    float64 ``dp`` and step costs plus int8 backpointers (< 600 B/note with
+    temporaries). ``"compact"`` adds int8 backpointers (25 B/note) and one
+    chunk of step costs; with ``checkpoint`` that becomes sqrt(n) cost rows
+    plus the step costs and backpointers of one sqrt(n)-step block.
+    """
+    columns = 26 * n
+    if engine != "compact":
+        return columns + 600 * n + (1 << 16)
+    if checkpoint:
+        block = min(chunk, max(1, math.isqrt(n)))
+        return columns + 200 * (math.isqrt(n) + 2) + 625 * block + (1 << 16)
+    return columns + 25 * n + 600 * min(chunk, n) + (1 << 16)
+
+def _decode_python(seq: EventTable, profile: HandProfile, cfg: ModelConfig) -> List[int]:
+    """
+    Scalar reference engine looping over (f2, f1, f0) for every note.
+    """
+    seq = list(seq)
     N = len(seq)
+    profiling.count("dp_cells", dp_cells(N))
+    # start_cost per finger, then one first-order call per cell and one rollover call per second-order cell.
+    profiling.count("cost_function_calls", len(FINGERS) + (dp_cells(N) + dp_cells(N) - 25 if N > 1 else 0))
     dp = np.full((N, 6, 6), INF_COST)  # dp[i][f_{i-1}][f_i]
     back: List[List[List[tuple[int, int] | None]]] = [[[None for _ in range(6)] for _ in range(6)] for _ in range(N)]
 
@@ -36,7 +283,7 @@ def decode_monophonic_second_order(
     if N == 1:
         # choose best f0 from seed row
         best_f0 = int(np.argmin(dp[0, 0, 1:])) + 1
-        return {seq[0].idx: [best_f0]}
+        return [best_f0]
 
     m1 = seq[1].pitch
     for f0 in FINGERS:
@@ -76,8 +323,4 @@ def decode_monophonic_second_order(
         f_prev, f_cur = back_entry
         fingers.append(f_cur)
     fingers.reverse()
-
-    assign: Dict[int, List[int]] = {}
-    for e, f in zip(seq, fingers):
-        assign[e.idx] = [int(f)]
-    return assign
+    return fingers
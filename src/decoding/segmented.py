@@ -0,0 +1,158 @@
+"""
+Segment-parallel second-order decoding with exact stitching.
+
+The DP state after note i is the finger pair (f_{i-1}, f_i), 25 states. A run
+of steps therefore acts as a 25x25 min-plus transfer matrix from the state
+before the run to the state after it. Segments' matrices are independent, so
+they are computed in parallel workers; folding them left to right gives the
+exact global optimum, the boundary states fall out of a backward pass over
+the fold, and each segment's inner path is then recovered (again in
+parallel) with its two boundary states fixed. The result is globally
+optimal; among equal-cost optima it may break ties differently from the
+serial decoder.
+"""
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from ..pfai.config import HandProfile, ModelConfig
+from ..pfai import profiling
+from ..pfai.constants import FINGERS
+from ..pfai.types import EventTable
+from .second_order_dp import StepCosts, build_step_costs, get_cost_tables, sequence_arrays
+
+N_F = len(FINGERS)
+N_STATES = N_F * N_F
+DEFAULT_SEGMENT_LENGTH = 1024
+
+def minplus(v: np.ndarray, T: np.ndarray) -> np.ndarray:
+    """Min-plus product of a state vector (or matrix rows) with a transfer matrix."""
+    return np.min(v[..., :, None] + T, axis=-2)
+
+def split_segments(pitch: np.ndarray, cfg: ModelConfig, target: int, slack: float = 0.25) -> List[Tuple[int, int]]:
+    """
+    Cuts steps 2..N-1 into half-open ``(start, end)`` step ranges of about
+    ``target`` steps. Each cut is moved to the nearest large leap
+    (``|Δpitch| > cfg.large_leap_semitones``) within ``slack * target`` of
+    the nominal boundary, where the hand repositions anyway; otherwise the
+    fixed length is used. Cut placement never affects optimality.
+    """
+    N = len(pitch)
+    if N <= 2:
+        return []
+    target = max(1, int(target))
+    leaps = np.flatnonzero(np.abs(np.diff(pitch)) > cfg.large_leap_semitones) + 1  # step index of each leap
+    bounds = [2]
+    window = int(slack * target)
+    while N - bounds[-1] > target:
+        nominal = bounds[-1] + target
+        cut = nominal
+        if window and len(leaps):
+            near = leaps[(leaps > bounds[-1]) & (np.abs(leaps - nominal) <= window)]
+            if len(near):
+                cut = int(near[np.argmin(np.abs(near - nominal))])
+        bounds.append(cut)
+    bounds.append(N)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def _segment_steps(pitch, slur, stacc, start: int, end: int, profile, cfg) -> StepCosts:
+    """Step costs for global steps ``start..end-1``; local step j maps to global ``start - 2 + j``."""
+    lo = start - 2
+    return build_step_costs(pitch[lo:end], slur[lo:end], stacc[lo:end], profile, cfg)
+
+def segment_transfer(pitch, slur, stacc, start: int, end: int, profile: HandProfile, cfg: ModelConfig) -> np.ndarray:
+    """
+    25x25 transfer matrix of steps ``start..end-1``: entry [s, t] is the
+    cheapest way from state s (fingers on notes start-2, start-1) to state t
+    (notes end-2, end-1), ``inf`` if unreachable.
+    """
+    steps = _segment_steps(pitch, slur, stacc, start, end, profile, cfg)
+    D = np.full((N_STATES, N_F, N_F), np.inf)
+    D.reshape(N_STATES, N_STATES)[np.arange(N_STATES), np.arange(N_STATES)] = 0.0
+    for j in range(2, end - start + 2):
+        D = np.min(D[:, :, :, None] + steps.local(j)[None], axis=1)
+    return D.reshape(N_STATES, N_STATES)
+
+def segment_path(pitch, slur, stacc, start: int, end: int, s_in: int, s_out: int,
+                 profile: HandProfile, cfg: ModelConfig) -> List[int]:
+    """
+    Finger indices (0..4) for notes ``start..end-1`` on the cheapest path from
+    state ``s_in`` to state ``s_out``.
+    """
+    steps = _segment_steps(pitch, slur, stacc, start, end, profile, cfg)
+    L = end - start
+    dp = np.full((N_F, N_F), np.inf)
+    dp[divmod(s_in, N_F)] = 0.0
+    back = np.zeros((L, N_F, N_F), dtype=np.int8)
+    for j in range(L):
+        cand = dp[:, :, None] + steps.local(j + 2)
+        back[j] = np.argmin(cand, axis=0)
+        dp = np.take_along_axis(cand, back[j][None].astype(np.intp), axis=0)[0]
+    a, b = divmod(s_out, N_F)
+    path = [b]
+    for j in range(L - 1, 0, -1):
+        a, b = int(back[j, a, b]), a
+        path.append(b)
+    path.reverse()
+    return path
+
+def _map(executor: Optional[Executor], fn, *iterables):
+    return list(executor.map(fn, *iterables)) if executor is not None else list(map(fn, *iterables))
+
+def decode_segmented(
+    seq: EventTable,
+    profile: HandProfile,
+    cfg: ModelConfig,
+    segment_length: int = DEFAULT_SEGMENT_LENGTH,
+    workers: Optional[int] = None,
+    executor: Optional[Executor] = None,
+) -> List[int]:
+    """
+    Exact segment-parallel decode of one hand's monophonic sequence; returns
+    fingers 1..5. ``workers`` > 1 starts a process pool for the call, or pass
+    a long-lived ``executor``; with neither, segments run in-process.
+    """
+    N = len(seq)
+    pitch, slur, stacc = sequence_arrays(seq)
+    start = get_cost_tables(profile, cfg).start_costs(pitch[0])
+    if N == 1:
+        return [int(np.argmin(start)) + 1]
+    first = get_cost_tables(profile, cfg).first_order_stack(pitch[:1], pitch[1:2], slur[1:2] | slur[:1], stacc[1:2])[0]
+    v = (start[:, None] + first).reshape(N_STATES)
+    segments = split_segments(pitch, cfg, segment_length)
+    # Each segment step costs 25 transfer rows plus one path step; counted here since workers have no profiler.
+    profiling.count("dp_cells", 25 + 125 * (N - 2) * (N_STATES + 1))
+    if not segments:
+        a, b = divmod(int(np.argmin(v)), N_F)
+        return [a + 1, b + 1]
+
+    own_pool = None
+    if executor is None and workers is not None and workers > 1 and len(segments) > 1:
+        own_pool = executor = ProcessPoolExecutor(max_workers=min(workers, len(segments)))
+    try:
+        starts = [s for s, _ in segments]
+        ends = [e for _, e in segments]
+        n = len(segments)
+        transfers = _map(executor, segment_transfer, [pitch] * n, [slur] * n, [stacc] * n,
+                         starts, ends, [profile] * n, [cfg] * n)
+
+        boundary = [v]
+        for T in transfers:
+            boundary.append(minplus(boundary[-1], T))
+        states = [int(np.argmin(boundary[-1]))]
+        for k in range(n - 1, -1, -1):
+            states.append(int(np.argmin(boundary[k] + transfers[k][:, states[-1]])))
+        states.reverse()  # states[k] is the state entering segment k; states[n] the final state
+
+        inner = _map(executor, segment_path, [pitch] * n, [slur] * n, [stacc] * n,
+                     starts, ends, states[:-1], states[1:], [profile] * n, [cfg] * n)
+    finally:
+        if own_pool is not None:
+            own_pool.shutdown()
+
+    f0, f1 = divmod(states[0], N_F)
+    path = [f0, f1]
+    for segment in inner:
+        path.extend(segment)
+    return [f + 1 for f in path]
@@ -0,0 +1,176 @@
+"""
+Fixed-lag online decoding.
+
+:class:`FixedLagDecoder` takes one hand's notes one at a time. It keeps only
+the second-order DP frontier (the 5x5 costs of the last finger pair) and
+the backpointers of the last ``lag`` steps, so the work and memory per note
+do not depend on how long the piece is.
+
+Once note ``t`` arrives, note ``t - lag`` is committed to the finger it has
+on the currently cheapest path. Every frontier state whose path gives that
+note a different finger is then dropped, so the committed fingers always
+form one path of the model, and later commits never contradict earlier
+ones. :meth:`FixedLagDecoder.flush` commits the remaining notes along the
+final optimum. With ``lag >= N - 1`` nothing is committed before the end,
+and the result is the ``"numpy"`` engine's fingering. Smaller lags trade
+agreement with that offline optimum for latency (see :func:`lag_agreement`).
+
+:func:`decode_stream` and :func:`decode_stream_async` wrap the decoder
+around a plain or async iterator of events for one staff.
+"""
+from collections import deque
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from ..pfai import profiling
+from ..pfai.config import HandProfile, ModelConfig
+from ..pfai.types import Event, EventTable, as_event_table
+from ..rules.costs import get_cost_tables, rollover_window_mask
+from .second_order_dp import decode_monophonic_second_order, fingering_cost, hand_sequence
+from .segmented import N_F, N_STATES
+
+DEFAULT_LAG = 8
+
+_A = np.arange(N_STATES) // N_F
+_B = np.arange(N_STATES) % N_F
+
+class FixedLagDecoder:
+    """
+    Online second-order decoder for one hand that commits each note's finger
+    ``lag`` notes after it arrives. :meth:`push` returns the ``(idx, finger)``
+    pairs committed by that note, oldest first.
+    """
+    def __init__(self, profile: HandProfile, cfg: ModelConfig, lag: int = DEFAULT_LAG):
+        if lag < 0:
+            raise ValueError(f"lag must be >= 0, not {lag}")
+        self.profile = profile
+        self.cfg = cfg
+        self.lag = int(lag)
+        self._tables = get_cost_tables(profile, cfg)
+        self._dp: Optional[np.ndarray] = None  # (5,) after the first note, then (5, 5) [f_prev, f_cur]
+        self._back: deque = deque(maxlen=max(1, self.lag))  # int8 (5, 5) [f_prev, f_cur] -> f_prev2
+        self._recent: deque = deque(maxlen=3)  # (pitch, slur) of the last notes
+        self._pending: deque = deque()  # idx of arrived, uncommitted notes, oldest first
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def push(self, event: Event) -> List[Tuple[int, int]]:
+        """Adds the next note of the hand; returns the notes this commits."""
+        pitch = int(event.pitch)
+        slur, stacc = bool(event.slur), bool(event.staccato)
+        if self._dp is None:
+            self._dp = self._tables.start_costs(pitch).copy()
+        else:
+            p1, s1 = self._recent[-1]
+            trans = self._tables.first_order(p1, pitch, slur or s1, stacc)
+            if self._dp.ndim == 1:
+                self._dp = self._dp[:, None] + trans
+                profiling.count("dp_cells", 25)
+            else:
+                p2 = self._recent[-2][0]
+                window = rollover_window_mask(np.array([p2]), np.array([p1]), np.array([pitch]), self.cfg)[0]
+                local = trans + self._tables.rollover if window else trans[None, :, :]
+                cand = self._dp[:, :, None] + local  # [f2, f1, f0]
+                best = np.argmin(cand, axis=0)
+                self._dp = np.take_along_axis(cand, best[None], axis=0)[0]
+                self._back.append(best.astype(np.int8))
+                profiling.count("dp_cells", 125)
+        self._recent.append((pitch, slur))
+        self._pending.append(int(event.idx))
+        self.count += 1
+        if len(self._pending) > self.lag:
+            return [self._commit(len(self._pending) - 1)]
+        return []
+
+    def _fingers_back(self, m: int) -> np.ndarray:
+        """Finger of the note ``m`` notes before the newest, for every frontier state (25,) or finger (5,)."""
+        if self._dp.ndim == 1:
+            return np.arange(N_F)
+        a, b = _A, _B
+        if m == 0:
+            return b
+        for back in list(self._back)[len(self._back) - (m - 1):][::-1] if m > 1 else ():
+            a, b = back[a, b].astype(np.intp), a
+        return a
+
+    def _commit(self, m: int) -> Tuple[int, int]:
+        """Commits the oldest pending note, ``m`` notes before the newest, and prunes the frontier."""
+        fingers = self._fingers_back(m)
+        flat = self._dp.reshape(-1)
+        f = int(fingers[int(np.argmin(flat))])
+        flat[fingers != f] = np.inf
+        return self._pending.popleft(), f + 1
+
+    def flush(self) -> List[Tuple[int, int]]:
+        """Commits every pending note along the current optimum (the end of the piece)."""
+        out = []
+        while self._pending:
+            out.append(self._commit(len(self._pending) - 1))
+        return out
+
+def decode_stream(
+    events: Iterable[Event],
+    profile: HandProfile,
+    cfg: ModelConfig,
+    hand_staff: int,
+    lag: int = DEFAULT_LAG,
+) -> Iterator[Tuple[int, int]]:
+    """
+    Yields ``(idx, finger)`` for the single notes of ``hand_staff`` as they
+    are committed, ``lag`` notes after they arrive; the rest when
+    ``events`` ends. Other staves and chord members are ignored.
+    """
+    decoder = FixedLagDecoder(profile, cfg, lag)
+    for event in events:
+        if event.staff == hand_staff and not event.is_chord:
+            yield from decoder.push(event)
+    yield from decoder.flush()
+
+async def decode_stream_async(
+    events: AsyncIterator[Event],
+    profile: HandProfile,
+    cfg: ModelConfig,
+    hand_staff: int,
+    lag: int = DEFAULT_LAG,
+) -> AsyncIterator[Tuple[int, int]]:
+    """:func:`decode_stream` over an async iterator, e.g. a live MIDI input."""
+    decoder = FixedLagDecoder(profile, cfg, lag)
+    async for event in events:
+        if event.staff == hand_staff and not event.is_chord:
+            for committed in decoder.push(event):
+                yield committed
+    for committed in decoder.flush():
+        yield committed
+
+class LagResult(NamedTuple):
+    agreement: float  # fraction of notes fingered as in the offline optimum
+    cost_gap: float   # streamed cost minus the offline optimum's
+
+def lag_agreement(
+    events: Union[EventTable, Iterable[Event]],
+    profile: HandProfile,
+    cfg: ModelConfig,
+    lags: Sequence[int],
+    hand_staff: int,
+) -> Dict[int, LagResult]:
+    """
+    Streams ``hand_staff`` at each lag and compares it with the offline
+    optimum. The model often has several optima of equal cost, so the cost
+    gap is the fairer measure; the agreement also counts ties broken the
+    other way.
+    """
+    table = as_event_table(events)
+    offline = decode_monophonic_second_order(table, profile, cfg, hand_staff)
+    if not offline:
+        return {int(lag): LagResult(1.0, 0.0) for lag in lags}
+    best = fingering_cost(table, offline, profile, cfg, hand_staff)
+    seq = list(hand_sequence(table, hand_staff))
+    out = {}
+    for lag in lags:
+        streamed = {k: [f] for k, f in decode_stream(seq, profile, cfg, hand_staff, lag)}
+        agreement = sum(streamed[k] == f for k, f in offline.items()) / len(offline)
+        out[int(lag)] = LagResult(agreement, fingering_cost(table, streamed, profile, cfg, hand_staff) - best)
+    return out
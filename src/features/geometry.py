@@ -1,5 +1,12 @@
+import numpy as np
+
 from ..pfai.constants import BLACK_CHROMA, WHITE_CHROMA, MIDI_MIN
 
+# Pitch-indexed lookup tables over the full MIDI range 0..127.
+# WHITE_KEY_ORDINALS[m] counts white keys from A0 up to and including m (0 below A0).
+BLACK_KEY_MASK = np.array([(m % 12) in BLACK_CHROMA for m in range(128)], dtype=bool)
+WHITE_KEY_ORDINALS = np.cumsum([m >= MIDI_MIN and (m % 12) in WHITE_CHROMA for m in range(128)])
+
 def is_black(midi: int) -> bool:
     """True if MIDI pitch is a black key."""
     return (midi % 12) in BLACK_CHROMA
@@ -9,10 +16,4 @@ def white_key_distance(m1: int, m2: int) -> int:
     Approximate white-key steps between two MIDI notes.
     Counts white keys from A0 up to the note and takes the absolute difference.
     """
-    def whites_up_to(m: int) -> int:
-        count = 0
-        for x in range(MIDI_MIN, m + 1):
-            if (x % 12) in WHITE_CHROMA:
-                count += 1
-        return count
-    return abs(whites_up_to(m1) - whites_up_to(m2))
+    return abs(int(WHITE_KEY_ORDINALS[m1]) - int(WHITE_KEY_ORDINALS[m2]))
@@ -0,0 +1,184 @@
+"""
+Persistent, content-addressed cache of extracted events and decoded fingerings.
+
+Entries live in one SQLite file under the cache directory
+(``$PIANO_FINGERING_CACHE_DIR``, else ``$XDG_CACHE_HOME/piano-fingering``,
+else ``~/.cache/piano-fingering``):
+
+* event tables, keyed by the SHA-256 of the input file and the reader backend;
+* fingering maps, keyed by a digest of the hand's event columns, the staff,
+  :func:`~..rules.costs.config_fingerprint` of the HandProfile and
+  ModelConfig, and the decoder's tie-breaking family.
+
+Values are ``.npz`` blobs (no pickle). The file is bounded by ``max_bytes``;
+the least recently used entries are evicted first. SQLite's locking makes one
+cache safe to share between batch worker processes.
+"""
+import hashlib
+import io
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..pfai import profiling
+from ..pfai.config import HandProfile, ModelConfig
+from ..pfai.types import EventTable
+from ..rules.costs import config_fingerprint
+
+CACHE_FILENAME = "cache.sqlite3"
+DEFAULT_CACHE_BYTES = 256 << 20
+# Bump when the stored layout or the meaning of a key changes.
+_SCHEMA = "v3"
+_COLUMNS = ("idx", "pitch", "time", "staff", "flags")
+
+def default_cache_dir() -> Path:
+    env = os.environ.get("PIANO_FINGERING_CACHE_DIR")
+    if env:
+        return Path(env)
+    xdg = os.environ.get("XDG_CACHE_HOME")
+    return (Path(xdg) if xdg else Path.home() / ".cache") / "piano-fingering"
+
+def file_digest(path: str) -> str:
+    """SHA-256 of a file's bytes."""
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        while chunk := fh.read(1 << 20):
+            h.update(chunk)
+    return h.hexdigest()
+
+def table_digest(events: EventTable) -> str:
+    """SHA-256 over an event table's columns."""
+    h = hashlib.sha256()
+    for name in _COLUMNS:
+        h.update(np.ascontiguousarray(getattr(events, name)).tobytes())
+    return h.hexdigest()
+
+def decoder_family(engine: str) -> str:
+    """Engines that always return identical fingerings share cache entries."""
+    return engine if engine in ("segmented", "motif", "chord") else "serial"
+
+def _pack(**arrays) -> bytes:
+    buf = io.BytesIO()
+    np.savez(buf, **arrays)
+    return buf.getvalue()
+
+def _unpack(blob: bytes) -> Dict[str, np.ndarray]:
+    with np.load(io.BytesIO(blob), allow_pickle=False) as data:
+        return {name: data[name] for name in data.files}
+
+class ResultCache:
+    """
+    SQLite-backed cache; see the module docstring for keys and eviction.
+    Hits and misses are counted per kind (``"events"``, ``"fingering"``) and
+    reported to the active profiler as ``cache_<kind>_hits`` / ``_misses``.
+    """
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.directory = Path(directory) if directory else default_cache_dir()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path = self.directory / CACHE_FILENAME
+        self.max_bytes = max_bytes
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+        self._db = sqlite3.connect(str(self.path), timeout=30)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, kind TEXT NOT NULL, value BLOB NOT NULL, "
+            "size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def __enter__(self) -> "ResultCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._db.close()
+
+    def _get(self, kind: str, key: str) -> Optional[bytes]:
+        row = self._db.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+        counts = self.hits if row is not None else self.misses
+        counts[kind] = counts.get(kind, 0) + 1
+        profiling.count(f"cache_{kind}_{'hits' if row is not None else 'misses'}")
+        if row is None:
+            return None
+        with self._db:
+            self._db.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+        return row[0]
+
+    def _put(self, kind: str, key: str, value: bytes) -> None:
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, kind, value, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, kind, value, len(value), time.time()),
+            )
+            self._evict()
+
+    def _evict(self) -> None:
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        doomed = []
+        for key, size in self._db.execute("SELECT key, size FROM entries ORDER BY last_used"):
+            if total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            total -= size
+        self._db.executemany("DELETE FROM entries WHERE key = ?", doomed)
+
+    @staticmethod
+    def _events_key(digest: str, backend: str) -> str:
+        return f"{_SCHEMA}/events/{backend}/{digest}"
+
+    def get_events(self, digest: str, backend: str) -> Optional[Tuple[EventTable, Optional[List[int]]]]:
+        """``(events, ordinals)`` stored for a file digest, or None. ``ordinals`` is None unless stored."""
+        blob = self._get("events", self._events_key(digest, backend))
+        if blob is None:
+            return None
+        data = _unpack(blob)
+        ordinals = data["ordinals"].tolist() if "ordinals" in data else None
+        return EventTable(*(data[name] for name in _COLUMNS)), ordinals
+
+    def put_events(self, digest: str, backend: str, events: EventTable,
+                   ordinals: Optional[List[int]] = None) -> None:
+        arrays = {name: getattr(events, name) for name in _COLUMNS}
+        if ordinals is not None:
+            arrays["ordinals"] = np.asarray(ordinals, dtype=np.int64)
+        self._put("events", self._events_key(digest, backend), _pack(**arrays))
+
+    @staticmethod
+    def _fingering_key(digest: str, staff: int, profile: HandProfile, cfg: ModelConfig, family: str) -> str:
+        return f"{_SCHEMA}/fingering/{digest}/{staff}/{config_fingerprint(profile, cfg)}/{family}"
+
+    def get_fingering(self, digest: str, staff: int, profile: HandProfile, cfg: ModelConfig,
+                      family: str = "serial") -> Optional[Dict[int, List[int]]]:
+        """Fingering map stored for one hand's events, or None."""
+        blob = self._get("fingering", self._fingering_key(digest, staff, profile, cfg, family))
+        if blob is None:
+            return None
+        data = _unpack(blob)
+        return {k: [f] for k, f in zip(data["idx"].tolist(), data["finger"].tolist())}
+
+    def put_fingering(self, digest: str, staff: int, profile: HandProfile, cfg: ModelConfig,
+                      fingering: Dict[int, List[int]], family: str = "serial") -> None:
+        idx = np.fromiter(fingering, dtype=np.int64, count=len(fingering))
+        finger = np.array([fingering[k][0] for k in idx.tolist()], dtype=np.int8)
+        self._put("fingering", self._fingering_key(digest, staff, profile, cfg, family), _pack(idx=idx, finger=finger))
+
+    def clear(self) -> None:
+        with self._db:
+            self._db.execute("DELETE FROM entries")
+        self._db.execute("VACUUM")
+
+    def size_bytes(self) -> int:
+        return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def stats(self) -> dict:
+        """Hit/miss counts of this handle plus the cache's current entry count and size."""
+        entries = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return {"hits": dict(self.hits), "misses": dict(self.misses), "entries": entries, "bytes": self.size_bytes()}
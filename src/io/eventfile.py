@@ -0,0 +1,112 @@
+"""
+JSON and NPZ interchange formats for event tables.
+
+A document is columnar, one list per :class:`~..pfai.types.EventTable`
+column, with the boolean fields packed into ``flags`` (see
+:data:`~..pfai.types.TIED` and friends)::
+
+    {"format": "piano-fingering-events", "version": 1,
+     "idx": [0, 1], "pitch": [60, 62], "time": [0.0, 1.0], "staff": [1, 1], "flags": [0, 2]}
+
+:func:`table_from_json` also accepts ``{"events": [{...}, ...]}`` with one
+object per event using the :class:`~..pfai.types.Event` field names, which is
+easier to write by hand; missing booleans default to false, a missing
+``idx`` to the position and a missing ``staff`` to 1. Without explicit
+``chord_start`` booleans, chords are grouped as in
+:meth:`~..pfai.types.EventTable.from_events`.
+
+Event files (:func:`write_event_file` / :func:`read_event_file`) hold the
+columnar document as ``.json``, or the same columns as arrays in a ``.npz``
+archive; either may also carry the source note ordinals that the streaming
+writer needs. Reading them needs only NumPy, never music21.
+"""
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..pfai.types import Event, EventTable
+
+FORMAT = "piano-fingering-events"
+VERSION = 1
+_COLUMNS = ("idx", "pitch", "time", "staff", "flags")
+
+def table_to_json(events: EventTable) -> Dict[str, Any]:
+    doc: Dict[str, Any] = {"format": FORMAT, "version": VERSION}
+    for name in _COLUMNS:
+        doc[name] = getattr(events, name).tolist()
+    return doc
+
+def table_from_json(doc: Dict[str, Any]) -> EventTable:
+    """Parses either document shape; raises ValueError on anything else."""
+    if not isinstance(doc, dict):
+        raise ValueError("event document must be a JSON object")
+    if "events" in doc:
+        records = doc["events"]
+        if not isinstance(records, list):
+            raise ValueError("'events' must be a list of event objects")
+        try:
+            events = [
+                Event(r.get("idx", k), r["pitch"], r.get("time", 0.0), bool(r.get("tied")), bool(r.get("slur")),
+                      bool(r.get("staccato")), r.get("staff", 1), bool(r.get("is_chord")))
+                for k, r in enumerate(records)
+            ]
+            starts = None
+            if any("chord_start" in r for r in records):
+                starts = [bool(r.get("chord_start")) for r in records]
+            return EventTable.from_events(events, starts)
+        except (KeyError, TypeError, AttributeError) as exc:
+            raise ValueError(f"malformed event object: {exc!r}") from exc
+    if doc.get("format", FORMAT) != FORMAT:
+        raise ValueError(f"not a {FORMAT} document: {doc.get('format')!r}")
+    if doc.get("version", VERSION) > VERSION:
+        raise ValueError(f"unsupported event document version {doc['version']}")
+    missing = [name for name in ("pitch",) if name not in doc]
+    if missing:
+        raise ValueError(f"event document lacks column(s): {', '.join(missing)}")
+    n = len(doc["pitch"])
+    columns = {
+        "idx": doc.get("idx", list(range(n))),
+        "pitch": doc["pitch"],
+        "time": doc.get("time", [0.0] * n),
+        "staff": doc.get("staff", [1] * n),
+        "flags": doc.get("flags", [0] * n),
+    }
+    if any(len(col) != n for col in columns.values()):
+        raise ValueError("event document columns differ in length")
+    return EventTable(**columns)
+
+def write_event_file(path: str, events: EventTable, ordinals: Optional[List[int]] = None) -> None:
+    """Writes ``events`` (and optionally the source note ordinals) as ``.npz`` or, otherwise, JSON."""
+    if Path(path).suffix.lower() == ".npz":
+        arrays = {name: getattr(events, name) for name in _COLUMNS}
+        if ordinals is not None:
+            arrays["ordinals"] = np.asarray(ordinals, dtype=np.int64)
+        with open(path, "wb") as fh:
+            np.savez_compressed(fh, format=np.array(FORMAT), version=np.array(VERSION), **arrays)
+        return
+    doc = table_to_json(events)
+    if ordinals is not None:
+        doc["ordinals"] = list(ordinals)
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(doc, fh, separators=(",", ":"))
+
+def read_event_file_with_ordinals(path: str) -> Tuple[EventTable, Optional[List[int]]]:
+    """Reads a file written by :func:`write_event_file` (or hand-written JSON)."""
+    if Path(path).suffix.lower() == ".npz":
+        with np.load(path, allow_pickle=False) as data:
+            if "format" in data.files and str(data["format"]) != FORMAT:
+                raise ValueError(f"{path} is not a {FORMAT} archive")
+            if "version" in data.files and int(data["version"]) > VERSION:
+                raise ValueError(f"unsupported event file version {int(data['version'])}")
+            events = EventTable(*(data[name] for name in _COLUMNS))
+            ordinals = data["ordinals"].tolist() if "ordinals" in data.files else None
+        return events, ordinals
+    with open(path, encoding="utf-8") as fh:
+        doc = json.load(fh)
+    ordinals = doc.get("ordinals") if isinstance(doc, dict) else None
+    return table_from_json(doc), ordinals
+
+def read_event_file(path: str) -> EventTable:
+    return read_event_file_with_ordinals(path)[0]
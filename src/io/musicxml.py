@@ -1,9 +1,14 @@
-from typing import List
+import re
+import time
+from bisect import bisect_right
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 from pathlib import Path
 
 from music21 import converter, note, chord, expressions, articulations, stream, spanner
 
-from ..pfai.types import Event
+from ..pfai import profiling
+from ..pfai.types import Event, EventTable
 
 def load_score(path: str):
     """
@@ -11,80 +16,141 @@ def load_score(path: str):
     """
     return converter.parse(path)
 
-def extract_monophonic_events(score) -> List[Event]:
+_PART_STAFF_ID = re.compile(r"-Staff(\d+)$")
+
+def _staff_number(part) -> int:
+    """
+    Staff number of a music21 part: multi-staff MusicXML parts are split into
+    ``PartStaff`` objects whose ids end in ``-Staff<n>``; plain parts are staff 1.
     """
-    Flatten notes and transform into :class:`Event` objects.
+    match = _PART_STAFF_ID.search(str(part.id)) if isinstance(part, stream.PartStaff) else None
+    return int(match.group(1)) if match else 1
 
-    Chords are skipped explicitly while rests are inherently excluded by
-    ``score.recurse().notes``.
+def _iter_events(score) -> Iterator[Tuple[Event, Union[note.Note, chord.Chord], bool]]:
+    """
+    Yields each extracted :class:`Event` together with the music21 note or
+    chord it came from and whether it starts a chord. A chord yields one
+    event per member, in the chord's note order; slur and staccato are
+    chord-level in music21, so every member carries them. Event times are
+    offsets from the start of the part, so they also locate the measure.
     """
-    evts: List[Event] = []
     idx = 0
-    for n in score.recurse().notes:
-        staff = getattr(n, 'staffNumber', 1)
-        if isinstance(n, chord.Chord):
-            # per user request, skip chords for now
-            continue
-        if isinstance(n, note.Note):
-            tied = n.tie is not None
-            # music21 encodes slurs as Spanner objects; editions vary, so we also accept Tenuto as legato-ish
-            has_slur = any(isinstance(x, spanner.Slur) for x in n.getSpannerSites())
-            is_stacc = any(isinstance(a, articulations.Staccato) for a in n.articulations)
-            evts.append(Event(
-                idx=idx,
-                pitch=n.pitch.midi,
-                time=float(n.offset),
-                tied=tied,
-                slur=has_slur,
-                staccato=is_stacc,
-                staff=staff,
-                is_chord=False
-            ))
-            idx += 1
-    return evts
+    parts = list(score.parts) if isinstance(score, stream.Score) and score.parts else [score]
+    for part in parts:
+        staff = _staff_number(part)
+        notes = part.recurse().notes
+        for n in notes:
+            time = float(notes.currentHierarchyOffset())
+            if isinstance(n, chord.Chord):
+                has_slur = any(isinstance(x, spanner.Slur) for x in n.getSpannerSites())
+                is_stacc = any(isinstance(a, articulations.Staccato) for a in n.articulations)
+                for k, member in enumerate(n.notes):
+                    yield Event(
+                        idx=idx,
+                        pitch=member.pitch.midi,
+                        time=time,
+                        tied=member.tie is not None,
+                        slur=has_slur,
+                        staccato=is_stacc,
+                        staff=staff,
+                        is_chord=True
+                    ), n, k == 0
+                    idx += 1
+            elif isinstance(n, note.Note):
+                tied = n.tie is not None
+                # music21 encodes slurs as Spanner objects; editions vary, so we also accept Tenuto as legato-ish
+                has_slur = any(isinstance(x, spanner.Slur) for x in n.getSpannerSites())
+                is_stacc = any(isinstance(a, articulations.Staccato) for a in n.articulations)
+                yield Event(
+                    idx=idx,
+                    pitch=n.pitch.midi,
+                    time=time,
+                    tied=tied,
+                    slur=has_slur,
+                    staccato=is_stacc,
+                    staff=staff,
+                    is_chord=False
+                ), n, False
+                idx += 1
 
-def write_fingerings_and_notes(src_path: str,
-                               out_path: str,
-                               fingering_map: dict[int, list[int]],
-                               margin_notes: list[tuple[float, str]]) -> None:
+def _table(items) -> EventTable:
+    events, starts = [], []
+    for e, _, start in items:
+        events.append(e)
+        starts.append(start)
+    return EventTable.from_events(events, starts)
+
+def extract_monophonic_events(score) -> EventTable:
     """
-    Write finger numbers and margin notes to a score and export it.
+    Flatten notes and transform them into an :class:`EventTable`.
 
-    ``out_path`` may point to either a MusicXML file (default) or a PDF. The
-    latter will be rendered via :mod:`music21`'s PDF backend.
+    Chord members are kept as events flagged ``is_chord`` (which the
+    monophonic decoder skips) while rests are inherently excluded by
+    ``score.recurse().notes``.
     """
-    s = converter.parse(src_path)
+    return _table(_iter_events(score))
 
-    # Attach fingerings in appearance order.
-    k = 0
-    for n in s.recurse().notes:
+def _attach_fingerings(note_refs: Dict[int, Union[note.Note, chord.Chord]],
+                       fingering_map: dict[int, list[int]]) -> None:
+    chords: Dict[int, Tuple[chord.Chord, List[Tuple[int, int]]]] = {}
+    for k, fingers in fingering_map.items():
+        n = note_refs.get(k)
         if isinstance(n, chord.Chord):
-            continue
-        if k in fingering_map:
-            n.articulations.append(articulations.Fingering(fingering_map[k][0]))
-        k += 1
-
-    parts = None
-    # Write margin notes as text expressions near their time.
-    for t, text in margin_notes:
-        try:
-            meas_num = max(1, int(t) + 1)
-            te = expressions.TextExpression(text)
-            if isinstance(s, stream.Score):
-                parts = list(s.parts)
-                if parts:
-                    target = parts[0]
-                else:
-                    target = s
-            else:
-                target = s
-            measure = target.measure(meas_num)
-            if measure is not None:
-                measure.insert(t, te)
-        except Exception:
-            # layout can fail on some imported editions; ignore rather than crash
-            pass
-        
+            chords.setdefault(id(n), (n, []))[1].append((k, fingers[0]))
+        elif n is not None:
+            # music21 exports one fingering per note, so alternatives (fingers[1:]) are not written.
+            n.articulations.append(articulations.Fingering(fingers[0]))
+    # music21 hands a chord's fingerings to its notes in order, so append them in member order.
+    for c, members in chords.values():
+        for _, finger in sorted(members):
+            c.articulations.append(articulations.Fingering(finger))
+
+class MeasureIndex:
+    """
+    Offset-to-measure lookup for one part, built once: the measures' start
+    offsets in order, searched by bisection.
+    """
+    def __init__(self, part):
+        self.measures = list(part.getElementsByClass(stream.Measure))
+        self.starts = [float(m.offset) for m in self.measures]
+
+    def locate(self, t: float) -> Optional[Tuple[stream.Measure, float]]:
+        """The measure containing part offset ``t`` and ``t``'s offset within it."""
+        if not self.measures:
+            return None
+        k = max(0, bisect_right(self.starts, t) - 1)
+        return self.measures[k], t - self.starts[k]
+
+def _attach_margin_notes(s, margin_notes: list) -> set:
+    """
+    Inserts margin notes, ``(time, text)`` or ``(time, text, staff)`` with
+    ``time`` an event time (offset in the part), as text expressions in the
+    measure holding that time, on the staff's part (the first part if no part
+    has that staff). Returns the ids of the measures touched.
+    """
+    parts = list(s.parts) if isinstance(s, stream.Score) and s.parts else [s]
+    part_of_staff: Dict[int, stream.Stream] = {}
+    for part in parts:
+        part_of_staff.setdefault(_staff_number(part), part)
+    indexes: Dict[int, MeasureIndex] = {}  # by id(part), built on first use
+    by_measure: Dict[int, Tuple[stream.Measure, list]] = {}
+    for t, text, *rest in margin_notes:
+        part = part_of_staff.get(rest[0] if rest else 1, parts[0])
+        index = indexes.get(id(part))
+        if index is None:
+            index = indexes[id(part)] = MeasureIndex(part)
+        found = index.locate(float(t))
+        if found is not None:
+            measure, offset = found
+            by_measure.setdefault(id(measure), (measure, []))[1].append((offset, text))
+    # One re-sort per measure instead of one per note.
+    for measure, items in by_measure.values():
+        for offset, text in items:
+            measure.coreInsert(offset, expressions.TextExpression(text))
+        measure.coreElementsChanged()
+    return set(by_measure)
+
+def _export(s, out_path: str) -> None:
     for n in s.recurse().notesAndRests:
         if hasattr(n, 'duration') and hasattr(n.duration, 'type'):
             if n.duration.type == "2048th":
@@ -96,4 +162,99 @@ def write_fingerings_and_notes(src_path: str,
         s.write("musicxml.pdf", str(out))
     else:
         s.write("musicxml", str(out))
-    
+
+class ScorePipeline:
+    """
+    Parses a score once and keeps it in memory from extraction through export.
+
+    Every extracted :class:`Event` keeps a direct reference to its music21 note
+    or chord (``note_refs[event.idx]``), so fingerings and margin notes are written onto
+    the same stream that was parsed. ``parse_count`` and per-stage wall times
+    in ``timings`` (seconds) are recorded for diagnostics.
+    """
+    def __init__(self, src_path: str):
+        self.src_path = src_path
+        self.score = None
+        self.events = EventTable.from_events([])
+        self.note_refs: Dict[int, Union[note.Note, chord.Chord]] = {}
+        self.parse_count = 0
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def _stage(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            with profiling.stage(name):
+                yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - t0
+
+    def load(self):
+        """Parses the input (only on first call) and returns the score."""
+        if self.score is None:
+            with self._stage("parse"):
+                self.score = load_score(self.src_path)
+                self.parse_count += 1
+        return self.score
+
+    def extract(self) -> EventTable:
+        """Extracts events and records the note (or chord) behind each one."""
+        score = self.load()
+        with self._stage("extract"):
+            items = list(_iter_events(score))
+            self.note_refs = {e.idx: n for e, n, _ in items}
+            self.events = _table(items)
+        return self.events
+
+    def restore(self, events: EventTable, ordinals: Optional[List[int]] = None) -> bool:
+        """
+        Adopts previously extracted events (e.g. from the result cache) so the
+        score is only parsed if :meth:`annotate` needs it.
+        """
+        self.events = events
+        return True
+
+    def cache_payload(self) -> Tuple[EventTable, Optional[List[int]]]:
+        """What :meth:`restore` needs to skip extraction for this input."""
+        return self.events, None
+
+    def annotate(self, fingering_map: dict[int, list[int]], margin_notes: list) -> None:
+        """Attaches fingerings and margin notes to the in-memory score."""
+        if not self.note_refs:
+            self.extract()
+        with self._stage("annotate"):
+            _attach_fingerings(self.note_refs, fingering_map)
+            touched = _attach_margin_notes(self.score, margin_notes)
+            if profiling.active_profiler() is not None:
+                # Measure lookups are not free in music21, so only pay for them when profiling.
+                for k in fingering_map:
+                    n = self.note_refs.get(k)
+                    measure = n.getContextByClass(stream.Measure) if n is not None else None
+                    if measure is not None:
+                        touched.add(id(measure))
+                profiling.count("measures_touched", len(touched))
+
+    def write(self, out_path: str) -> None:
+        """Exports the annotated score to MusicXML or PDF."""
+        with self._stage("export"):
+            _export(self.load(), out_path)
+
+def write_fingerings_and_notes(src_path: str,
+                               out_path: str,
+                               fingering_map: dict[int, list[int]],
+                               margin_notes: list,
+                               pipeline: Optional[ScorePipeline] = None) -> None:
+    """
+    Write finger numbers and margin notes to a score and export it.
+    Margin notes are ``(time, text)`` or ``(time, text, staff)``; see
+    :func:`_attach_margin_notes`.
+
+    ``out_path`` may point to either a MusicXML file (default) or a PDF. The
+    latter will be rendered via :mod:`music21`'s PDF backend. Pass the
+    :class:`ScorePipeline` the events came from to reuse its parsed score;
+    otherwise ``src_path`` is parsed here.
+    """
+    if pipeline is None:
+        pipeline = ScorePipeline(src_path)
+    pipeline.annotate(fingering_map, margin_notes)
+    pipeline.write(out_path)
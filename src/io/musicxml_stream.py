@@ -0,0 +1,451 @@
+"""
+Streaming MusicXML backend.
+
+Reads ``<note>`` elements with :func:`xml.etree.ElementTree.iterparse` and
+produces the same :class:`EventTable` as :mod:`.musicxml` without building a
+music21 object tree. Fingerings are written back by splicing
+``<notations><technical><fingering>`` into the original bytes, so the rest of
+the document (DOCTYPE, layout, comments) is preserved verbatim. Memory stays
+proportional to the event list, not to the document.
+"""
+import time
+import xml.etree.ElementTree as ET
+from bisect import bisect_right
+from contextlib import contextmanager
+from dataclasses import dataclass
+from fractions import Fraction
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+from xml.parsers import expat
+
+from ..pfai import profiling
+from ..pfai.types import CHORD, CHORD_START, SLUR, STACCATO, TIED, EventTable
+
+_STEP_SEMITONES = {"C": 0, "D": 2, "E": 4, "F": 5, "G": 7, "A": 9, "B": 11}
+# Children that must follow <notations> inside <note>.
+_AFTER_NOTATIONS = {"lyric", "play", "listen"}
+_CHUNK = 1 << 16
+
+@dataclass
+class _NoteRecord:
+    ordinal: int        # position among all <note> elements in the document
+    pitch: Optional[int]
+    offset: Fraction    # quarterLength offset from the start of the part
+    grace: bool
+    chord: bool
+    group: int          # ordinal of the first note of its chord (its own for single notes)
+    staff: int
+    voice: str
+    tied: bool
+    slur: bool
+    staccato: bool
+    fingering: Optional[int] = None  # first non-alternate <fingering> already in the score
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+def _text(elem, path: str, default: str = "") -> str:
+    found = elem.find(path)
+    return found.text.strip() if found is not None and found.text else default
+
+def _midi(pitch_elem) -> int:
+    step = _text(pitch_elem, "step")
+    octave = int(_text(pitch_elem, "octave", "4"))
+    alter = float(_text(pitch_elem, "alter", "0"))
+    return (octave + 1) * 12 + _STEP_SEMITONES[step] + int(round(alter))
+
+class _MeasureClock:
+    """
+    Tracks the position in a part the way music21 lays measures out: each
+    measure lasts as far as its content reaches (its highest time), except
+    that an empty measure lasts a full bar of the current time signature, and
+    so does one overfilled by an odd sliver (not a multiple of a 64th or a
+    triplet 32nd, up to half a beat), which music21 takes for rounding in
+    the file. Durations are in quarterLengths.
+    """
+    def __init__(self):
+        self.divisions = 1
+        self.bar = Fraction(4)
+        self.start = Fraction(0)     # offset of the current measure in the part
+        self.position = Fraction(0)  # position within the current measure
+        self.high = Fraction(0)
+
+    def begin_measure(self) -> None:
+        self.position = self.high = Fraction(0)
+
+    def move(self, divisions: float) -> None:
+        """Advances (or, negative, backs up) by a ``<duration>`` in divisions."""
+        self.position += Fraction(int(divisions), self.divisions)
+        self.high = max(self.high, self.position)
+
+    def set_time(self, beats: str, beat_type: str) -> None:
+        try:
+            self.bar = Fraction(int(beats), int(beat_type)) * 4
+        except ValueError:  # compound signatures such as "3+2"
+            pass
+
+    def end_measure(self) -> Fraction:
+        """Closes the measure and returns its length."""
+        length = self.high or self.bar
+        extra = self.high - self.bar
+        if 0 < extra <= Fraction(1, 2) and (extra * 16).denominator != 1 and (extra * 12).denominator != 1:
+            length = self.bar
+        self.start += length
+        return length
+
+    @property
+    def offset(self) -> Fraction:
+        return self.start + self.position
+
+def _reference_finger(notations) -> Optional[int]:
+    """Leading finger of the first non-alternate ``<fingering>`` (``"3"``, ``"3-1"``, ...), if 1..5."""
+    for n in notations:
+        for fing in n.findall("technical/fingering"):
+            if fing.get("alternate") == "yes" or not fing.text:
+                continue
+            head = fing.text.strip()[:1]
+            return int(head) if head and head in "12345" else None
+    return None
+
+def _order_measure(records: List[_NoteRecord]) -> List[_NoteRecord]:
+    """
+    Orders one staff's notes in a measure the way music21 recurses them:
+    voice by voice (sorted by voice id), then by offset with grace notes first.
+    """
+    by_voice: Dict[str, List[_NoteRecord]] = {}
+    for r in records:
+        by_voice.setdefault(r.voice, []).append(r)
+    ordered: List[_NoteRecord] = []
+    for voice in sorted(by_voice):
+        ordered.extend(sorted(by_voice[voice], key=lambda r: (r.offset, not r.grace)))
+    return ordered
+
+def _iter_parts(path: str) -> Iterator[Dict[int, List[_NoteRecord]]]:
+    """
+    Streams the document and yields, for each ``<part>``, its note records
+    grouped by staff number and ordered as music21 would traverse them.
+    """
+    clock = _MeasureClock()
+    ordinal = 0
+    staves: Dict[int, List[_NoteRecord]] = {}
+    measure: Dict[int, List[_NoteRecord]] = {}
+    last: Optional[_NoteRecord] = None
+    root = None
+
+    for event, elem in ET.iterparse(path, events=("start", "end")):
+        tag = _local(elem.tag)
+        if event == "start":
+            if root is None:
+                root = elem
+            elif tag == "part":
+                staves, clock = {}, _MeasureClock()
+            elif tag == "measure":
+                clock.begin_measure()
+                measure, last = {}, None
+            continue
+
+        if tag == "divisions":
+            clock.divisions = int(float(elem.text))
+        elif tag == "time":
+            clock.set_time(_text(elem, "beats"), _text(elem, "beat-type"))
+        elif tag in ("backup", "forward"):
+            step = float(_text(elem, "duration", "0"))
+            clock.move(step if tag == "forward" else -step)
+        elif tag == "note":
+            is_chord = elem.find("chord") is not None
+            grace = elem.find("grace") is not None
+            offset = last.offset if (is_chord and last is not None) else clock.offset
+            pitch_elem = elem.find("pitch")
+            notations = elem.findall("notations")
+            record = _NoteRecord(
+                ordinal=ordinal,
+                pitch=_midi(pitch_elem) if pitch_elem is not None else None,
+                offset=offset,
+                grace=grace,
+                chord=is_chord,
+                group=last.group if (is_chord and last is not None) else ordinal,
+                staff=int(_text(elem, "staff", "1")),
+                voice=_text(elem, "voice", "1"),
+                tied=elem.find("tie") is not None,
+                slur=any(n.find("slur") is not None for n in notations),
+                staccato=any(
+                    n.find("articulations/staccato") is not None or n.find("articulations/staccatissimo") is not None
+                    for n in notations
+                ),
+                fingering=_reference_finger(notations),
+            )
+            ordinal += 1
+            if is_chord and last is not None:
+                last.chord = True
+            elif not grace:
+                clock.move(float(_text(elem, "duration", "0")))
+            measure.setdefault(record.staff, []).append(record)
+            last = record
+            elem.clear()
+        elif tag == "measure":
+            for staff, records in measure.items():
+                staves.setdefault(staff, []).extend(_order_measure(records))
+            clock.end_measure()
+            elem.clear()
+        elif tag == "part":
+            yield staves
+            if root is not None:
+                root.clear()
+
+def _read_records(path: str) -> Tuple[EventTable, List[_NoteRecord]]:
+    """The :class:`EventTable` of ``path`` and the note record behind each event."""
+    pitch: List[int] = []
+    times: List[float] = []
+    staff_col: List[int] = []
+    flags: List[int] = []
+    kept: List[_NoteRecord] = []
+    for staves in _iter_parts(path):
+        for staff in sorted(staves):
+            records = [r for r in staves[staff] if r.pitch is not None]
+            chord_flags: Dict[int, int] = {}
+            for r in records:
+                if r.chord:
+                    chord_flags[r.group] = chord_flags.get(r.group, 0) | SLUR * r.slur | STACCATO * r.staccato
+            group = None
+            for r in records:
+                if r.chord:
+                    bits = CHORD | chord_flags[r.group] | CHORD_START * (r.group != group)
+                else:
+                    bits = SLUR * r.slur | STACCATO * r.staccato
+                group = r.group
+                pitch.append(r.pitch)
+                times.append(float(r.offset))
+                staff_col.append(staff)
+                flags.append(TIED * r.tied | bits)
+                kept.append(r)
+    return EventTable(range(len(pitch)), pitch, times, staff_col, flags), kept
+
+def read_events_with_ordinals(path: str) -> Tuple[EventTable, List[int]]:
+    """
+    Streams ``path`` into an :class:`EventTable` of events (same order and
+    indices as :func:`.musicxml.extract_monophonic_events`) and returns, for
+    each event, the document ordinal of its ``<note>`` element. Chord members
+    share the chord's slur and staccato, as music21 keeps them per chord.
+    """
+    events, records = _read_records(path)
+    return events, [r.ordinal for r in records]
+
+def read_annotated_events(path: str) -> Tuple[EventTable, Dict[int, List[int]]]:
+    """
+    :func:`read_events` plus the fingerings already written in the score,
+    ``{idx: [finger]}`` for every event that has one (alternates and
+    fingers outside 1..5 are ignored). These are the reference fingerings
+    for training and evaluation.
+    """
+    events, records = _read_records(path)
+    return events, {k: [r.fingering] for k, r in enumerate(records) if r.fingering is not None}
+
+def read_events(path: str) -> EventTable:
+    """
+    Streaming counterpart of ``extract_monophonic_events(load_score(path))``.
+    """
+    return read_events_with_ordinals(path)[0]
+
+def _fingering_xml(fingers: List[int]) -> bytes:
+    """The first finger, then the others as alternates."""
+    inner = "".join(f"<fingering>{f}</fingering>" if not k else f'<fingering alternate="yes">{f}</fingering>'
+                    for k, f in enumerate(fingers))
+    return f"<notations><technical>{inner}</technical></notations>".encode("utf-8")
+
+def _direction_xml(text: str, offset_divisions: int, staff: int = 1) -> bytes:
+    words = text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    offset = f"<offset>{offset_divisions}</offset>" if offset_divisions else ""
+    return (
+        f'<direction placement="above"><direction-type><words>{words}</words></direction-type>'
+        f"{offset}<staff>{staff}</staff></direction>"
+    ).encode("utf-8")
+
+def _insertion_points(
+    path: str,
+    fingers_by_ordinal: Dict[int, List[int]],
+    margin_notes: List[Tuple[float, str, int]],
+) -> List[Tuple[int, bytes]]:
+    """
+    Finds byte offsets where fingerings and margin-note directions go.
+
+    Directions go into the first part (a piano part holds both staves), on
+    the note's staff. While scanning, each of its measures records its start
+    offset and where its content begins; after the scan every margin note is
+    placed in the measure holding its time by bisecting those starts.
+    """
+    inserts: List[Tuple[int, bytes]] = []
+    parser = expat.ParserCreate()
+    stack: List[str] = []
+    state = {"ordinal": -1, "note_insert": None, "part": 0, "text": "", "measures": 0,
+             "duration": 0.0, "chord": False, "grace": False, "beats": "", "beat_type": ""}
+    clock = _MeasureClock()
+    # First-part measures: [start offset, byte offset of their content, divisions there, running number]
+    measures: List[list] = []
+    touched = set()  # running numbers (across parts) of measures that receive an insert
+
+    def start(name, attrs):
+        tag = _local(name)
+        pos = parser.CurrentByteIndex
+        parent = stack[-1] if stack else None
+        if parent == "note" and tag in _AFTER_NOTATIONS and state["note_insert"] is None:
+            state["note_insert"] = pos
+        if parent == "note" and tag in ("chord", "grace"):
+            state[tag] = True
+        in_first = state["part"] == 1
+        if in_first and parent == "measure" and tag in ("note", "backup", "forward") and measures[-1][1] is None:
+            measures[-1][1:3] = [pos, clock.divisions]
+        if tag == "note":
+            state["ordinal"] += 1
+            state["note_insert"] = None
+            state["chord"] = state["grace"] = False
+        elif tag == "part":
+            state["part"] += 1
+        elif tag == "measure":
+            state["measures"] += 1
+            if in_first:
+                clock.begin_measure()
+                measures.append([clock.start, None, clock.divisions, state["measures"]])
+        state["text"] = ""
+        stack.append(tag)
+
+    def end(name):
+        tag = stack.pop()
+        text = state["text"].strip()
+        if tag == "note":
+            fingers = fingers_by_ordinal.get(state["ordinal"])
+            if fingers:
+                at = state["note_insert"] if state["note_insert"] is not None else parser.CurrentByteIndex
+                inserts.append((at, _fingering_xml(fingers)))
+                touched.add(state["measures"])
+        if state["part"] != 1:
+            return
+        if tag == "divisions":
+            clock.divisions = int(float(text))
+        elif tag == "duration":
+            state["duration"] = float(text or 0)
+        elif tag in ("beats", "beat-type"):
+            state[tag.replace("-", "_")] = text
+        elif tag == "time":
+            clock.set_time(state["beats"], state["beat_type"])
+        elif tag in ("backup", "forward"):
+            clock.move(state["duration"] if tag == "forward" else -state["duration"])
+        elif tag == "note" and not (state["chord"] or state["grace"]):
+            clock.move(state["duration"])
+        elif tag == "measure":
+            if measures[-1][1] is None:
+                measures[-1][1:3] = [parser.CurrentByteIndex, clock.divisions]
+            clock.end_measure()
+
+    def chars(data):
+        state["text"] += data
+
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    parser.CharacterDataHandler = chars
+    with open(path, "rb") as fh:
+        while chunk := fh.read(_CHUNK):
+            parser.Parse(chunk, False)
+        parser.Parse(b"", True)
+
+    starts = [float(m[0]) for m in measures]
+    for t, text, staff in sorted(margin_notes, key=lambda note: note[0]) if measures else ():
+        begin, at, divisions, running = measures[max(0, bisect_right(starts, t) - 1)]
+        inserts.append((at, _direction_xml(text, int(round((t - float(begin)) * divisions)), staff)))
+        touched.add(running)
+    inserts.sort(key=lambda x: x[0])
+    profiling.count("measures_touched", len(touched))
+    return inserts
+
+def write_fingerings_xml(src_path: str,
+                         out_path: str,
+                         fingering_map: dict[int, list[int]],
+                         margin_notes: list,
+                         ordinals: Optional[List[int]] = None) -> None:
+    """
+    Writes fingerings and margin notes straight into a copy of ``src_path``.
+
+    ``ordinals`` maps event indices to document note ordinals (as returned by
+    :func:`read_events_with_ordinals`); it is recomputed when omitted. Margin
+    notes are ``(time, text)`` or ``(time, text, staff)`` with ``time`` an
+    event time; like the music21 writer, each goes into the measure holding
+    that time, on its staff (staff 1 if not given).
+    """
+    if ordinals is None:
+        ordinals = read_events_with_ordinals(src_path)[1]
+    fingers_by_ordinal = {ordinals[k]: v for k, v in fingering_map.items() if 0 <= k < len(ordinals)}
+    notes = [(float(t), text, rest[0] if rest else 1) for t, text, *rest in margin_notes]
+
+    inserts = _insertion_points(src_path, fingers_by_ordinal, notes)
+    with open(src_path, "rb") as src, open(out_path, "wb") as dst:
+        pos = 0
+        for at, payload in inserts:
+            while pos < at:
+                chunk = src.read(min(_CHUNK, at - pos))
+                if not chunk:
+                    break
+                dst.write(chunk)
+                pos += len(chunk)
+            dst.write(payload)
+        while chunk := src.read(_CHUNK):
+            dst.write(chunk)
+
+class XMLStreamPipeline:
+    """
+    Streaming counterpart of :class:`.musicxml.ScorePipeline` with the same
+    ``extract`` / ``annotate`` / ``write`` stages. Only MusicXML output is supported.
+    """
+    def __init__(self, src_path: str):
+        self.src_path = src_path
+        self.events = EventTable.from_events([])
+        self.ordinals: List[int] = []
+        self.parse_count = 0
+        self.timings: Dict[str, float] = {}
+        self._loaded = False
+        self._fingering_map: dict[int, list[int]] = {}
+        self._margin_notes: list = []
+
+    @contextmanager
+    def _stage(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            with profiling.stage(name):
+                yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - t0
+
+    def extract(self) -> EventTable:
+        """Streams the input once and returns its events."""
+        with self._stage("extract"):
+            self.events, self.ordinals = read_events_with_ordinals(self.src_path)
+            self.parse_count += 1
+        self._loaded = True
+        return self.events
+
+    def restore(self, events: EventTable, ordinals: Optional[List[int]]) -> bool:
+        """
+        Adopts previously extracted events (e.g. from the result cache) instead
+        of reading the input. Returns False, leaving the pipeline unchanged,
+        when ``ordinals`` are missing since :meth:`write` needs them.
+        """
+        if ordinals is None:
+            return False
+        self.events, self.ordinals, self._loaded = events, list(ordinals), True
+        return True
+
+    def cache_payload(self) -> Tuple[EventTable, Optional[List[int]]]:
+        """What :meth:`restore` needs to skip reading this input again."""
+        return self.events, self.ordinals
+
+    def annotate(self, fingering_map: dict[int, list[int]], margin_notes: list) -> None:
+        """Queues fingerings and margin notes for :meth:`write`."""
+        if not self._loaded:
+            self.extract()
+        self._fingering_map.update(fingering_map)
+        self._margin_notes.extend(margin_notes)
+
+    def write(self, out_path: str) -> None:
+        """Writes the annotated copy of the input."""
+        if Path(out_path).suffix.lower() == ".pdf":
+            raise ValueError("the xml backend writes MusicXML only; use the music21 backend for PDF output")
+        with self._stage("export"):
+            write_fingerings_xml(self.src_path, out_path, self._fingering_map, self._margin_notes, self.ordinals)
@@ -0,0 +1,52 @@
+"""
+Replays a score file as a live note source, for testing the streaming
+decoder (:mod:`~..decoding.streaming`) without a MIDI keyboard.
+
+MusicXML is read with the streaming reader, so replaying it never loads
+music21. Standard MIDI files (``.mid``/``.midi``) are parsed with music21;
+MIDI has no staves, so each track becomes a staff in order (the first
+track is the right hand).
+"""
+import asyncio
+import time
+from pathlib import Path
+from typing import AsyncIterator, Iterator
+
+from ..pfai.types import Event, EventTable
+
+MIDI_SUFFIXES = (".mid", ".midi")
+
+def read_midi_events(path: str) -> EventTable:
+    """Events of a MIDI file, one staff per track."""
+    from music21 import converter, stream
+    from .musicxml import _iter_events
+
+    score = converter.parse(path)
+    parts = list(score.parts) if isinstance(score, stream.Score) and score.parts else [score]
+    events, starts = [], []
+    for staff, part in enumerate(parts, start=1):
+        for e, _, start in _iter_events(part):
+            e.idx, e.staff = len(events), staff
+            events.append(e)
+            starts.append(start)
+    return EventTable.from_events(events, starts)
+
+def read_replay_events(path: str) -> EventTable:
+    if Path(path).suffix.lower() in MIDI_SUFFIXES:
+        return read_midi_events(path)
+    from .musicxml_stream import read_events
+    return read_events(path)
+
+def replay(path: str, interval: float = 0.0) -> Iterator[Event]:
+    """Yields the events of ``path`` in order, waiting ``interval`` seconds before each after the first."""
+    for k, event in enumerate(read_replay_events(path)):
+        if k and interval > 0:
+            time.sleep(interval)
+        yield event
+
+async def replay_async(path: str, interval: float = 0.0) -> AsyncIterator[Event]:
+    """:func:`replay` as an async iterator; waits with ``asyncio.sleep``."""
+    for k, event in enumerate(read_replay_events(path)):
+        if k and interval > 0:
+            await asyncio.sleep(interval)
+        yield event
@@ -1,10 +1,12 @@
-from dataclasses import dataclass
+import json
+from dataclasses import asdict, dataclass, fields, replace
+from typing import Optional, Tuple
 
 @dataclass
 class HandProfile:
     """
-    Hand span/technique preferences. Used both for feasibility (later when chords are added)
-    and to bias movement costs now.
+    Hand span/technique preferences. Used both for chord feasibility (see
+    :mod:`~..decoding.chords`) and to bias movement costs.
     """
     name: str
     easy_span_semitones: int
@@ -44,6 +46,8 @@ class ModelConfig:
     repeat_near_max_interval: int = 2    # A–A–near
     # Large leap detection threshold (in semitones)
     large_leap_semitones: int = 12       # leaps larger than an octave trigger guidance
+    # Chords: cost per semitone a finger pair stretches beyond its share of the easy span
+    chord_stretch_penalty: float = 0.10
 
 # Predefined hand sizes
 PROFILE_S  = HandProfile('S',  9, 10)
@@ -52,3 +56,58 @@ PROFILE_L  = HandProfile('L', 12, 13)
 PROFILE_XL = HandProfile('XL',13, 14)
 
 DEFAULT_CONFIG = ModelConfig()
+
+# Config files: JSON with the fields to override, by dataclass.
+CONFIG_FORMAT = "piano-fingering-config"
+CONFIG_VERSION = 1
+# Hand size stays with the chosen profile; a config file only carries weights.
+_PROFILE_SIZE_FIELDS = ("name", "easy_span_semitones", "max_span_semitones")
+
+def save_config(path: str, profile: HandProfile, cfg: ModelConfig, **meta) -> None:
+    """
+    Writes the weights of ``profile`` (not its name or spans) and every
+    ``cfg`` field to ``path``; ``meta`` is stored alongside for reference.
+    """
+    doc = {
+        "format": CONFIG_FORMAT,
+        "version": CONFIG_VERSION,
+        "hand_profile": {k: v for k, v in asdict(profile).items() if k not in _PROFILE_SIZE_FIELDS},
+        "model_config": asdict(cfg),
+    }
+    if meta:
+        doc["meta"] = meta
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(doc, fh, indent=2)
+
+def load_config(path: str, profile: HandProfile, cfg: Optional[ModelConfig] = None) -> Tuple[HandProfile, ModelConfig]:
+    """
+    Applies a config file to ``profile`` and ``cfg`` (default
+    :data:`DEFAULT_CONFIG`); missing fields keep their values. Raises
+    ValueError for anything that is not a config file of this format.
+    """
+    with open(path, encoding="utf-8") as fh:
+        doc = json.load(fh)
+    if not isinstance(doc, dict) or doc.get("format") != CONFIG_FORMAT:
+        raise ValueError(f"{path} is not a {CONFIG_FORMAT} file")
+    if doc.get("version", CONFIG_VERSION) > CONFIG_VERSION:
+        raise ValueError(f"unsupported config version {doc['version']}")
+    out = []
+    for section, base, allowed in (
+        ("hand_profile", profile, {f.name for f in fields(HandProfile)} - set(_PROFILE_SIZE_FIELDS)),
+        ("model_config", cfg if cfg is not None else DEFAULT_CONFIG, {f.name for f in fields(ModelConfig)}),
+    ):
+        values = doc.get(section, {})
+        unknown = sorted(set(values) - allowed)
+        if unknown:
+            raise ValueError(f"unknown {section} field(s) in {path}: {', '.join(unknown)}")
+        out.append(replace(base, **{k: _field_value(path, section, k, getattr(base, k), v)
+                                    for k, v in values.items()}))
+    return out[0], out[1]
+
+def _field_value(path: str, section: str, name: str, default, value):
+    """``value`` as the type of the field's ``default``; integer fields (interval thresholds) only take whole numbers."""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"{section} field {name} in {path} must be a number, not {value!r}")
+    if isinstance(default, int) and not float(value).is_integer():
+        raise ValueError(f"{section} field {name} in {path} must be a whole number, not {value!r}")
+    return type(default)(value)
@@ -0,0 +1,148 @@
+"""
+Per-stage profiling hooks.
+
+Pipeline stages wrap themselves in :func:`stage` and hot paths report
+aggregate counts through :func:`count`. Both are no-ops unless a
+:class:`Profiler` is active in the current context::
+
+    with Profiler() as prof:
+        annotate_file("in.musicxml", "out.musicxml", PROFILE_M, DEFAULT_CONFIG)
+    print(prof.to_json())
+
+Counters are incremented once per call with a precomputed total (never once
+per DP cell), so instrumentation costs nothing measurable when profiling is
+off. Peak memory uses :mod:`tracemalloc`, which slows allocation-heavy code
+while it is on; pass ``memory=False`` for timings closer to production.
+"""
+import cProfile
+import json
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+_ACTIVE: ContextVar[Optional["Profiler"]] = ContextVar("piano_fingering_profiler", default=None)
+
+class _Frame:
+    __slots__ = ("name", "t0", "base", "peak")
+
+    def __init__(self, name: str, t0: float, base: int):
+        self.name = name
+        self.t0 = t0
+        self.base = base
+        self.peak = base
+
+class Profiler:
+    """
+    Records wall time, peak traced memory and call count per stage, plus
+    named counters. Stages may nest; a stage entered repeatedly accumulates
+    time and calls and keeps the largest peak. ``peak_bytes`` is the peak
+    above the memory in use when the stage started.
+
+    With ``cprofile=True`` a :class:`cProfile.Profile` runs for the whole
+    block; see :meth:`dump_stats`.
+    """
+    def __init__(self, memory: bool = True, cprofile: bool = False):
+        self.memory = memory
+        self.stages: Dict[str, dict] = {}
+        self.counters: Dict[str, int] = {}
+        self.seconds = 0.0
+        self.peak_bytes = 0
+        self._stack: List[_Frame] = []
+        self._cprofile = cProfile.Profile() if cprofile else None
+        self._token = None
+        self._own_tracemalloc = False
+        self._t0 = 0.0
+
+    def __enter__(self) -> "Profiler":
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._own_tracemalloc = True
+        self._token = _ACTIVE.set(self)
+        self._t0 = time.perf_counter()
+        self._stack.append(_Frame("", self._t0, self._traced()))
+        if self._cprofile is not None:
+            self._cprofile.enable()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        root = self._stack.pop()
+        self.seconds = time.perf_counter() - self._t0
+        self.peak_bytes = max(root.peak, self._traced_peak()) - root.base if self.memory else 0
+        _ACTIVE.reset(self._token)
+        if self._own_tracemalloc:
+            tracemalloc.stop()
+            self._own_tracemalloc = False
+
+    def _traced(self) -> int:
+        return tracemalloc.get_traced_memory()[0] if self.memory else 0
+
+    def _traced_peak(self) -> int:
+        return tracemalloc.get_traced_memory()[1] if self.memory else 0
+
+    @contextmanager
+    def stage(self, name: str):
+        if self.memory:
+            # Fold the peak so far into the enclosing stages before resetting it for this one.
+            peak = self._traced_peak()
+            for frame in self._stack:
+                frame.peak = max(frame.peak, peak)
+            tracemalloc.reset_peak()
+        frame = _Frame(name, time.perf_counter(), self._traced())
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            elapsed = time.perf_counter() - frame.t0
+            peak = max(frame.peak, self._traced_peak())
+            for outer in self._stack:
+                outer.peak = max(outer.peak, peak)
+            entry = self.stages.setdefault(name, {"seconds": 0.0, "peak_bytes": 0, "calls": 0})
+            entry["seconds"] += elapsed
+            entry["peak_bytes"] = max(entry["peak_bytes"], peak - frame.base if self.memory else 0)
+            entry["calls"] += 1
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + int(n)
+
+    def report(self) -> dict:
+        """JSON-serializable summary of the profiled block."""
+        return {
+            "seconds": self.seconds,
+            "peak_bytes": self.peak_bytes,
+            "memory_traced": self.memory,
+            "stages": {name: dict(entry) for name, entry in self.stages.items()},
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+    def to_json(self, path: Optional[str] = None) -> str:
+        text = json.dumps(self.report(), indent=2)
+        if path is not None:
+            with open(path, "w", encoding="utf-8") as fh:
+                fh.write(text)
+        return text
+
+    def dump_stats(self, path: str) -> None:
+        """Writes the cProfile data (``pstats`` format); requires ``cprofile=True``."""
+        if self._cprofile is None:
+            raise ValueError("Profiler was created without cprofile=True")
+        pstats.Stats(self._cprofile).dump_stats(path)
+
+def active_profiler() -> Optional[Profiler]:
+    return _ACTIVE.get()
+
+def stage(name: str):
+    """Context manager timing ``name`` on the active profiler (no-op without one)."""
+    prof = _ACTIVE.get()
+    return prof.stage(name) if prof is not None else nullcontext()
+
+def count(name: str, n: int = 1) -> None:
+    """Adds ``n`` to counter ``name`` on the active profiler (no-op without one)."""
+    prof = _ACTIVE.get()
+    if prof is not None:
+        prof.count(name, n)
@@ -1,16 +1,181 @@
 from dataclasses import dataclass
-from typing import List
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
 
 @dataclass
 class Event:
     """
-    A single monophonic note event for one hand.
+    A single note event for one hand; chord members are one event per note.
     """
+    __slots__ = ("idx", "pitch", "time", "tied", "slur", "staccato", "staff", "is_chord")
     idx: int            # running index across parsed events
     pitch: int          # MIDI number
-    time: float         # quarterLength offset in score
+    time: float         # quarterLength offset from the start of the part
     tied: bool
     slur: bool
     staccato: bool
     staff: int          # 1 = treble (RH), 2 = bass (LH)
-    is_chord: bool      # kept for completeness; decoder skips if True
\ No newline at end of file
+    is_chord: bool      # chord member; monophonic decoders skip these
+
+# Bits of EventTable.flags
+TIED = 1
+SLUR = 2
+STACCATO = 4
+CHORD = 8
+# First member of a chord; the following CHORD rows up to the next start belong to it.
+CHORD_START = 16
+
+class EventTable:
+    """
+    Columnar store of parsed events: one NumPy array per field, with the
+    boolean fields packed into a ``flags`` bitfield (:data:`TIED`,
+    :data:`SLUR`, :data:`STACCATO`, :data:`CHORD`, :data:`CHORD_START`).
+
+    Rows keep parse order. :meth:`position` maps an event ``idx`` to its row
+    in O(1), :meth:`for_staff` returns (cached) per-staff sub-tables, and
+    iterating or indexing a row still yields :class:`Event` objects for code
+    that wants them.
+    """
+    __slots__ = ("idx", "pitch", "time", "staff", "flags", "_pos", "_views")
+
+    def __init__(self, idx, pitch, time, staff, flags):
+        self.idx = np.asarray(idx, dtype=np.int64)
+        self.pitch = np.asarray(pitch, dtype=np.int16)
+        self.time = np.asarray(time, dtype=np.float64)
+        self.staff = np.asarray(staff, dtype=np.int8)
+        self.flags = np.asarray(flags, dtype=np.uint8)
+        self._pos = None
+        self._views: Dict[tuple, "EventTable"] = {}
+
+    @classmethod
+    def from_events(cls, events: Iterable[Event], chord_starts: Optional[Iterable[bool]] = None) -> "EventTable":
+        """
+        Table of ``events``. :class:`Event` has no chord-start field, so unless
+        ``chord_starts`` is given a chord starts at every chord member that
+        does not follow a lower member of the same staff and time (members
+        are written bottom to top).
+        """
+        events = list(events)
+        flags = [TIED * e.tied | SLUR * e.slur | STACCATO * e.staccato | CHORD * e.is_chord for e in events]
+        if chord_starts is None:
+            chord_starts = [
+                e.is_chord and not (k and events[k-1].is_chord and events[k-1].staff == e.staff
+                                    and events[k-1].time == e.time and events[k-1].pitch < e.pitch)
+                for k, e in enumerate(events)
+            ]
+        flags = [f | CHORD_START * bool(start) for f, start in zip(flags, chord_starts)]
+        return cls(
+            [e.idx for e in events],
+            [e.pitch for e in events],
+            [e.time for e in events],
+            [e.staff for e in events],
+            flags,
+        )
+
+    def __len__(self) -> int:
+        return len(self.idx)
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            return self._event(int(key))
+        return self.take(np.arange(len(self))[key])
+
+    def __iter__(self) -> Iterator[Event]:
+        for row in range(len(self)):
+            yield self._event(row)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, EventTable):
+            return len(self) == len(other) and all(
+                np.array_equal(getattr(self, name), getattr(other, name))
+                for name in ("idx", "pitch", "time", "staff", "flags"))
+        if isinstance(other, list):
+            return self.to_events() == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"EventTable({len(self)} events, staves={sorted(set(self.staff.tolist()))})"
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in ("idx", "pitch", "time", "staff", "flags")}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    @property
+    def tied(self) -> np.ndarray:
+        return (self.flags & TIED).astype(bool)
+
+    @property
+    def slur(self) -> np.ndarray:
+        return (self.flags & SLUR).astype(bool)
+
+    @property
+    def staccato(self) -> np.ndarray:
+        return (self.flags & STACCATO).astype(bool)
+
+    @property
+    def is_chord(self) -> np.ndarray:
+        return (self.flags & CHORD).astype(bool)
+
+    @property
+    def chord_start(self) -> np.ndarray:
+        return (self.flags & CHORD_START).astype(bool)
+
+    def _event(self, row: int) -> Event:
+        flags = int(self.flags[row])
+        return Event(
+            idx=int(self.idx[row]),
+            pitch=int(self.pitch[row]),
+            time=float(self.time[row]),
+            tied=bool(flags & TIED),
+            slur=bool(flags & SLUR),
+            staccato=bool(flags & STACCATO),
+            staff=int(self.staff[row]),
+            is_chord=bool(flags & CHORD),
+        )
+
+    def to_events(self) -> List[Event]:
+        return list(self)
+
+    def take(self, rows: Sequence[int]) -> "EventTable":
+        """Sub-table of the given row positions, in that order."""
+        rows = np.asarray(rows, dtype=np.intp)
+        return EventTable(self.idx[rows], self.pitch[rows], self.time[rows], self.staff[rows], self.flags[rows])
+
+    def positions(self, idxs) -> np.ndarray:
+        """Row of each event index in ``idxs``; -1 where the index is not in the table."""
+        if self._pos is None:
+            size = int(self.idx.max()) + 1 if len(self) else 0
+            self._pos = np.full(size, -1, dtype=np.intp)
+            self._pos[self.idx] = np.arange(len(self))
+        idxs = np.asarray(idxs, dtype=np.int64)
+        inside = (idxs >= 0) & (idxs < len(self._pos))
+        return np.where(inside, self._pos[np.where(inside, idxs, 0)], -1)
+
+    def position(self, idx: int) -> int:
+        """Row of event ``idx`` (O(1)); raises KeyError if it is not in the table."""
+        row = int(self.positions([idx])[0])
+        if row < 0:
+            raise KeyError(idx)
+        return row
+
+    def event(self, idx: int) -> Event:
+        """The :class:`Event` with index ``idx``."""
+        return self._event(self.position(idx))
+
+    def for_staff(self, staff: int, include_chords: bool = False) -> "EventTable":
+        """Events of one staff in parse order (chord members dropped unless ``include_chords``)."""
+        key = (staff, include_chords)
+        view = self._views.get(key)
+        if view is None:
+            mask = self.staff == staff
+            if not include_chords:
+                mask &= (self.flags & CHORD) == 0
+            view = self._views[key] = self.take(np.flatnonzero(mask))
+        return view
+
+def as_event_table(events: Union[EventTable, Iterable[Event]]) -> EventTable:
+    """Returns ``events`` unchanged if it is already an :class:`EventTable`, else a table of it."""
+    return events if isinstance(events, EventTable) else EventTable.from_events(events)
@@ -1,5 +1,14 @@
+import hashlib
+import json
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, fields as dataclass_fields, replace
+from types import SimpleNamespace
+from typing import Dict, NamedTuple, Sequence, Tuple
+
+import numpy as np
+from ..pfai import profiling
 from ..pfai.constants import FINGERS
-from ..features.geometry import white_key_distance, is_black
+from ..features.geometry import white_key_distance, is_black, WHITE_KEY_ORDINALS, BLACK_KEY_MASK
 from ..features.patterns import (
     is_neighbor_turn,
     is_repeat_reartic,
@@ -78,3 +87,318 @@ def apply_rollover_adjustments(
             adjusted += profile.walkthrough_penalty
 
     return adjusted
+
+# Vectorized builders. They add the same terms in the same order as the scalar
+# functions above, so results are bit-identical. Finger axes 0..4 = fingers 1..5.
+
+_F = np.asarray(FINGERS)
+_F_PREV = _F[:, None]
+_F_CUR = _F[None, :]
+
+def start_cost_vector(m: int, cfg: ModelConfig) -> np.ndarray:
+    """
+    :func:`start_cost` for every finger at once, shape (5,).
+    """
+    return np.where((_F == 1) & is_black(int(m)), cfg.start_thumb_on_black_penalty, 0.0)
+
+def transition_cost_matrices(
+    m_prev: np.ndarray, m_cur: np.ndarray,
+    under_slur: np.ndarray, staccato: np.ndarray,
+    profile: HandProfile, cfg: ModelConfig
+) -> np.ndarray:
+    """
+    :func:`transition_cost_first_order` for K note pairs at once.
+    Returns an array of shape (K, 5, 5) indexed [k, f_prev, f_cur].
+
+    Weights may also be arrays of shape (P, 1, 1, 1) (see
+    :func:`stack_parameters`) to price P parameter sets at once, giving (P, K, 5, 5).
+    """
+    m_prev = np.asarray(m_prev, dtype=np.int64)
+    m_cur = np.asarray(m_cur, dtype=np.int64)
+    slur = np.asarray(under_slur, dtype=bool)[:, None, None]
+    stacc = np.asarray(staccato, dtype=bool)[:, None, None]
+
+    semi = np.abs(m_cur - m_prev)[:, None, None]
+    wdist = np.abs(WHITE_KEY_ORDINALS[m_cur] - WHITE_KEY_ORDINALS[m_prev])[:, None, None]
+    black_cur = BLACK_KEY_MASK[m_cur][:, None, None]
+    ascending = (m_cur > m_prev)[:, None, None]
+    delta = np.abs(_F_CUR - _F_PREV)
+
+    cost = cfg.weight_white_key_distance * wdist
+    cost = cost + cfg.weight_semitone_distance * semi
+    cost = cost + cfg.weight_finger_delta * delta
+    cost = cost + np.where((_F_PREV == 1) & (_F_CUR == 4), profile.jump_bonus_1_to_4, 0.0)
+    cost = cost + np.where((_F_PREV == 4) & (_F_CUR == 1), profile.jump_bonus_4_to_1, 0.0)
+    cost = cost + np.where((delta == 1) & ~slur, cfg.consecutive_step_penalty, 0.0)
+    cost = cost + np.where(_F_PREV == _F_CUR,
+                           np.where(stacc, cfg.repeat_penalty_staccato, cfg.repeat_penalty_non_staccato), 0.0)
+    cost = cost + np.where((_F_CUR == 1) & black_cur, profile.thumb_on_black_penalty, 0.0)
+    cost = cost + np.where(slur & ascending & (_F_CUR <= _F_PREV), profile.thumb_under_prep_bonus, 0.0)
+    return np.broadcast_to(cost, np.broadcast_shapes(cost.shape, (len(m_cur), len(FINGERS), len(FINGERS)))).copy()
+
+def rollover_window_mask(
+    m_prev2: np.ndarray, m_prev1: np.ndarray, m_cur: np.ndarray, cfg: ModelConfig
+) -> np.ndarray:
+    """
+    Boolean mask of the triples where :func:`apply_rollover_adjustments` is active
+    (neighbor turn or repeated rearticulation).
+    """
+    m_prev2 = np.asarray(m_prev2, dtype=np.int64)
+    m_prev1 = np.asarray(m_prev1, dtype=np.int64)
+    m_cur = np.asarray(m_cur, dtype=np.int64)
+    neighbor = (m_prev2 == m_cur) & (np.abs(m_prev1 - m_cur) <= cfg.neighbor_turn_max_interval)
+    repeat = ((m_prev2 == m_prev1) & (m_prev1 == m_cur)) | (
+        (m_prev2 == m_prev1) & (np.abs(m_cur - m_prev1) <= cfg.repeat_near_max_interval)
+    )
+    return neighbor | repeat
+
+def rollover_adjustment_tensor(profile: HandProfile) -> np.ndarray:
+    """
+    Finger-only part of :func:`apply_rollover_adjustments`, shape (5, 5, 5)
+    indexed [f2, f1, f0].  Add it to the local cost wherever
+    :func:`rollover_window_mask` is true.
+    """
+    f2 = _F[:, None, None]
+    f1 = _F[None, :, None]
+    f0 = _F[None, None, :]
+    walkthrough = (np.abs(f2 - f1) == 1) & (np.abs(f1 - f0) == 1) & (
+        ((f2 < f1) & (f1 < f0)) | ((f2 > f1) & (f1 > f0))
+    )
+    adj = np.where((f2 == 1) & (f1 == 2) & (f0 == 1), profile.rollover_bonus_121, 0.0)
+    adj = adj + np.where((f2 == 1) & (f1 == 3) & (f0 == 1), profile.rollover_bonus_131, 0.0)
+    adj = adj + np.where(walkthrough, profile.walkthrough_penalty, 0.0)
+    return adj
+
+def stack_parameters(items: list) -> SimpleNamespace:
+    """
+    Stacks the numeric fields of P :class:`HandProfile` (or :class:`ModelConfig`)
+    objects into arrays of shape (P, 1, 1, 1), a stand-in the vectorized
+    builders above broadcast over a leading parameter axis.
+    """
+    fields = [f.name for f in dataclass_fields(items[0]) if f.name != "name"]
+    return SimpleNamespace(**{
+        name: np.array([getattr(x, name) for x in items], dtype=float).reshape(-1, 1, 1, 1) for name in fields
+    })
+
+# The cost model is linear in its weights: every term above is a weight times
+# a feature of (notes, fingers). Exposing that feature map lets the weights be
+# fitted to human fingerings (see ``rules.learning``).
+
+LINEAR_PARAMETERS: Tuple[str, ...] = (
+    "weight_white_key_distance",
+    "weight_semitone_distance",
+    "weight_finger_delta",
+    "jump_bonus_1_to_4",
+    "jump_bonus_4_to_1",
+    "consecutive_step_penalty",
+    "repeat_penalty_non_staccato",
+    "repeat_penalty_staccato",
+    "thumb_on_black_penalty",
+    "thumb_under_prep_bonus",
+    "rollover_bonus_121",
+    "rollover_bonus_131",
+    "walkthrough_penalty",
+    "start_thumb_on_black_penalty",
+)
+_W = {name: j for j, name in enumerate(LINEAR_PARAMETERS)}
+
+def _owner(name: str, profile: HandProfile, cfg: ModelConfig):
+    return profile if hasattr(profile, name) else cfg
+
+def parameter_vector(profile: HandProfile, cfg: ModelConfig) -> np.ndarray:
+    """The :data:`LINEAR_PARAMETERS` of ``(profile, cfg)`` as a vector, shape (W,)."""
+    return np.array([getattr(_owner(name, profile, cfg), name) for name in LINEAR_PARAMETERS], dtype=float)
+
+def with_parameters(profile: HandProfile, cfg: ModelConfig, w: Sequence[float]):
+    """Copies of ``(profile, cfg)`` with the :data:`LINEAR_PARAMETERS` set from ``w``."""
+    w = [float(x) for x in w]
+    if len(w) != len(LINEAR_PARAMETERS):
+        raise ValueError(f"expected {len(LINEAR_PARAMETERS)} parameters, got {len(w)}")
+    values = dict(zip(LINEAR_PARAMETERS, w))
+    own = {f.name for f in dataclass_fields(profile)}
+    return (
+        replace(profile, **{k: v for k, v in values.items() if k in own}),
+        replace(cfg, **{k: v for k, v in values.items() if k not in own}),
+    )
+
+@dataclass
+class LinearFeatures:
+    """
+    Feature tensors of one note sequence, laid out like ``StepCosts`` with a
+    trailing parameter axis: ``start @ w``, ``trans @ w`` and ``roll @ w``
+    are the start, first-order and rollover costs under weights ``w``.
+    """
+    start: np.ndarray   # (5, W)
+    trans: np.ndarray   # (N-1, 5, 5, W) [k, f_prev, f_cur]
+    window: np.ndarray  # (N-2,) bool
+    roll: np.ndarray    # (5, 5, 5, W) [f2, f1, f0]
+
+    def path_features(self, fingers: Sequence[int]) -> np.ndarray:
+        """Summed features of a finger path (fingers 1..5), shape (W,); its cost is this ``@ w``."""
+        f = np.asarray(fingers, dtype=np.intp) - 1
+        phi = self.start[f[0]].copy()
+        if len(f) > 1:
+            phi += self.trans[np.arange(len(f) - 1), f[:-1], f[1:]].sum(axis=0)
+        if len(f) > 2:
+            on = np.flatnonzero(self.window)
+            phi += self.roll[f[on], f[on + 1], f[on + 2]].sum(axis=0)
+        return phi
+
+def linear_features(
+    pitch: np.ndarray, slur: np.ndarray, staccato: np.ndarray, cfg: ModelConfig
+) -> LinearFeatures:
+    """
+    Features of every transition of one sequence (the columns of
+    ``sequence_arrays``) in one NumPy pass. ``cfg`` only supplies the
+    interval thresholds of :func:`rollover_window_mask`, which are not weights.
+    """
+    pitch = np.asarray(pitch, dtype=np.int64)
+    slur = np.asarray(slur, dtype=bool)
+    staccato = np.asarray(staccato, dtype=bool)
+    W, nf = len(LINEAR_PARAMETERS), len(FINGERS)
+
+    start = np.zeros((nf, W))
+    start[0, _W["start_thumb_on_black_penalty"]] = float(BLACK_KEY_MASK[pitch[0]]) if len(pitch) else 0.0
+
+    m_prev, m_cur = pitch[:-1], pitch[1:]
+    under = (slur[1:] | slur[:-1])[:, None, None]
+    stacc = staccato[1:][:, None, None]
+    K = len(m_cur)
+    delta = np.abs(_F_CUR - _F_PREV)
+    trans = np.zeros((K, nf, nf, W))
+    trans[..., _W["weight_white_key_distance"]] = np.abs(WHITE_KEY_ORDINALS[m_cur] - WHITE_KEY_ORDINALS[m_prev])[:, None, None]
+    trans[..., _W["weight_semitone_distance"]] = np.abs(m_cur - m_prev)[:, None, None]
+    trans[..., _W["weight_finger_delta"]] = delta
+    trans[..., _W["jump_bonus_1_to_4"]] = (_F_PREV == 1) & (_F_CUR == 4)
+    trans[..., _W["jump_bonus_4_to_1"]] = (_F_PREV == 4) & (_F_CUR == 1)
+    trans[..., _W["consecutive_step_penalty"]] = (delta == 1) & ~under
+    trans[..., _W["repeat_penalty_non_staccato"]] = (_F_PREV == _F_CUR) & ~stacc
+    trans[..., _W["repeat_penalty_staccato"]] = (_F_PREV == _F_CUR) & stacc
+    trans[..., _W["thumb_on_black_penalty"]] = (_F_CUR == 1) & BLACK_KEY_MASK[m_cur][:, None, None]
+    trans[..., _W["thumb_under_prep_bonus"]] = under & (m_cur > m_prev)[:, None, None] & (_F_CUR <= _F_PREV)
+
+    roll = np.zeros((nf, nf, nf, W))
+    for name in ("rollover_bonus_121", "rollover_bonus_131", "walkthrough_penalty"):
+        # The rollover tensor is linear in these three weights: read each one off a unit profile.
+        unit = SimpleNamespace(rollover_bonus_121=0.0, rollover_bonus_131=0.0, walkthrough_penalty=0.0)
+        setattr(unit, name, 1.0)
+        roll[..., _W[name]] = rollover_adjustment_tensor(unit)
+
+    window = rollover_window_mask(pitch[:-2], pitch[1:-1], pitch[2:], cfg)
+    profiling.count("feature_transitions", K)
+    return LinearFeatures(start=start, trans=trans, window=window, roll=roll)
+
+# Precomputed per-(HandProfile, ModelConfig) tables, shared through a bounded LRU.
+
+COST_TABLE_CACHE_SIZE = 8
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+def config_fingerprint(profile: HandProfile, cfg: ModelConfig) -> str:
+    """
+    Stable hex digest of every field of ``profile`` and ``cfg``.
+    """
+    payload = json.dumps([asdict(profile), asdict(cfg)], sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+class CostTables:
+    """
+    Precomputed cost lookups for one (HandProfile, ModelConfig) pair.
+
+    Start vectors and the rollover tensor are built eagerly; 5x5 first-order
+    matrices are filled lazily per (m_prev, m_cur, under_slur, staccato) key
+    and reused for the lifetime of the table.
+    """
+    def __init__(self, profile: HandProfile, cfg: ModelConfig):
+        # Snapshot the parameters: callers (e.g. the CLI overrides) may mutate theirs later.
+        self.profile = replace(profile)
+        self.cfg = replace(cfg)
+        self.fingerprint = config_fingerprint(profile, cfg)
+        self.white_ordinals = WHITE_KEY_ORDINALS
+        self.black_mask = BLACK_KEY_MASK
+        self.rollover = rollover_adjustment_tensor(self.profile)
+        self._start = {
+            black: np.where((_F == 1) & black, self.cfg.start_thumb_on_black_penalty, 0.0)
+            for black in (False, True)
+        }
+        self._first_order: Dict[int, np.ndarray] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(m_prev, m_cur, under_slur, staccato):
+        return ((np.asarray(m_prev, dtype=np.int64) * 128 + m_cur) * 2 + under_slur) * 2 + staccato
+
+    def start_costs(self, m: int) -> np.ndarray:
+        """Start cost for each finger on pitch ``m``, shape (5,)."""
+        return self._start[bool(self.black_mask[m])]
+
+    def first_order(self, m_prev: int, m_cur: int, under_slur: bool, staccato: bool) -> np.ndarray:
+        """Single 5x5 first-order cost matrix [f_prev, f_cur]."""
+        return self.first_order_stack([m_prev], [m_cur], [under_slur], [staccato])[0]
+
+    def first_order_stack(self, m_prev, m_cur, under_slur, staccato) -> np.ndarray:
+        """
+        First-order matrices for K transitions, shape (K, 5, 5). Only keys not
+        seen before are computed.
+        """
+        m_prev = np.asarray(m_prev, dtype=np.int64)
+        m_cur = np.asarray(m_cur, dtype=np.int64)
+        under_slur = np.asarray(under_slur, dtype=bool)
+        staccato = np.asarray(staccato, dtype=bool)
+        keys = self._key(m_prev, m_cur, under_slur, staccato)
+        uniq, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        missing = [j for j, k in enumerate(uniq.tolist()) if k not in self._first_order]
+        self.misses += len(missing)
+        self.hits += len(uniq) - len(missing)
+        profiling.count("cost_table_lookups", len(keys))
+        # Each fresh 5x5 matrix is 25 first-order cost evaluations.
+        profiling.count("cost_function_calls", 25 * len(missing))
+        if missing:
+            rows = first[missing]
+            fresh = transition_cost_matrices(
+                m_prev[rows], m_cur[rows], under_slur[rows], staccato[rows], self.profile, self.cfg
+            )
+            for j, mat in zip(missing, fresh):
+                self._first_order[int(uniq[j])] = mat
+        if not len(uniq):
+            return np.empty((0, len(FINGERS), len(FINGERS)))
+        table = np.stack([self._first_order[k] for k in uniq.tolist()])
+        return table[inverse.reshape(-1)]
+
+_COST_TABLES: "OrderedDict[str, CostTables]" = OrderedDict()
+_cost_table_hits = 0
+_cost_table_misses = 0
+
+def get_cost_tables(profile: HandProfile, cfg: ModelConfig) -> CostTables:
+    """
+    Returns the shared :class:`CostTables` for ``(profile, cfg)``, building it on
+    first use. At most ``COST_TABLE_CACHE_SIZE`` tables are kept (least recently used evicted).
+    """
+    global _cost_table_hits, _cost_table_misses
+    key = config_fingerprint(profile, cfg)
+    tables = _COST_TABLES.get(key)
+    if tables is not None:
+        _cost_table_hits += 1
+        _COST_TABLES.move_to_end(key)
+        return tables
+    _cost_table_misses += 1
+    tables = CostTables(profile, cfg)
+    _COST_TABLES[key] = tables
+    while len(_COST_TABLES) > COST_TABLE_CACHE_SIZE:
+        _COST_TABLES.popitem(last=False)
+    return tables
+
+def cost_table_cache_info() -> CacheInfo:
+    """Hit/miss counters of the shared table cache, in the style of ``functools.lru_cache``."""
+    return CacheInfo(_cost_table_hits, _cost_table_misses, COST_TABLE_CACHE_SIZE, len(_COST_TABLES))
+
+def clear_cost_table_cache() -> None:
+    """Drops every cached table and resets the counters."""
+    global _cost_table_hits, _cost_table_misses
+    _COST_TABLES.clear()
+    _cost_table_hits = _cost_table_misses = 0
@@ -0,0 +1,180 @@
+"""
+Fits the linear cost weights (:data:`~.costs.LINEAR_PARAMETERS`) to
+human-fingered scores.
+
+Every cost of the model is ``w @ phi`` for the feature map of
+:func:`~.costs.linear_features`, so a fingering's cost is ``w`` dotted with
+its summed features. :func:`train` runs an averaged structured perceptron:
+each epoch decodes every example under the current weights, and moves
+``w`` towards making the reference fingering cheaper than the decoded one,
+
+    w += lr * sum(phi(decoded) - phi(reference)) / notes
+
+Scores are rarely fingered on every note, so the reference path is the
+cheapest fingering that agrees with every annotated finger (a latent-variable
+perceptron), found with the incremental decoder's pins. The examples of an
+epoch are independent given ``w``, so they are decoded on a process pool and
+their updates summed in corpus order (a batch update, which keeps the result
+independent of the number of workers). The returned weights are the average
+over epochs, which generalises better than the last iterate, unless one of
+the epochs' weights made fewer mistakes on the corpus (the "pocket"): the
+early epochs of a run that starts far from the references drag the average
+down.
+"""
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..pfai import profiling
+from ..pfai.config import HandProfile, ModelConfig
+from ..pfai.types import EventTable
+from .costs import LINEAR_PARAMETERS, linear_features, parameter_vector, with_parameters
+
+DEFAULT_EPOCHS = 20
+DEFAULT_LEARNING_RATE = 0.5
+
+@dataclass
+class Example:
+    """One staff of one score with its reference fingers ``{idx: finger}``."""
+    source: str
+    staff: int
+    seq: EventTable
+    reference: Dict[int, int]
+
+def load_corpus(paths: Iterable[str], staves: Sequence[int] = (1, 2), include_chords: bool = False) -> List[Example]:
+    """
+    Reads MusicXML files with the streaming reader and returns one
+    :class:`Example` per staff that has at least one reference finger on
+    its single notes (chord members are not fingered by this model).
+    ``include_chords`` keeps the chord members in ``seq``, for decoders that
+    finger them, without adding them to ``reference``.
+    """
+    from ..decoding.second_order_dp import hand_sequence
+    from ..io.musicxml_stream import read_annotated_events
+
+    examples = []
+    for path in paths:
+        events, reference = read_annotated_events(str(path))
+        for staff in staves:
+            seq = hand_sequence(events, staff, include_chords=include_chords)
+            single = seq.idx[~seq.is_chord].tolist()
+            ref = {k: reference[k][0] for k in single if k in reference}
+            if ref:
+                examples.append(Example(str(path), staff, seq, ref))
+    return examples
+
+class EpochStats(NamedTuple):
+    epoch: int
+    mistakes: int  # annotated notes decoded with another finger, before the epoch's update
+    notes: int     # annotated notes
+    cost_gap: float  # summed cost of the references minus the decoded fingerings (>= 0)
+
+@dataclass
+class TrainResult:
+    profile: HandProfile
+    cfg: ModelConfig
+    weights: np.ndarray
+    history: List[EpochStats] = field(default_factory=list)
+    final: Optional[EpochStats] = None  # the returned weights on the training corpus
+    averaged: bool = True  # False if the best epoch's weights beat the average
+
+def _score_example(example: Example, profile: HandProfile, cfg: ModelConfig) -> Tuple[np.ndarray, int, float]:
+    """
+    ``phi(decoded) - phi(reference)``, the mistakes and the cost gap of one
+    example under ``(profile, cfg)``. Runs in the pool workers.
+    """
+    from ..decoding.incremental import decode_incremental
+    from ..decoding.second_order_dp import decode_monophonic_second_order, sequence_arrays
+
+    seq, staff = example.seq, example.staff
+    feats = linear_features(*sequence_arrays(seq), cfg)
+    order = seq.idx.tolist()
+    decoded = decode_monophonic_second_order(seq, profile, cfg, staff)
+    reference = decode_incremental(seq, profile, cfg, staff, pins=example.reference)
+    phi_dec = feats.path_features([decoded[k][0] for k in order])
+    phi_ref = feats.path_features([reference[k][0] for k in order])
+    mistakes = sum(decoded[k][0] != f for k, f in example.reference.items())
+    w = parameter_vector(profile, cfg)
+    return phi_dec - phi_ref, mistakes, float((phi_ref - phi_dec) @ w)
+
+def _epoch(examples: List[Example], profile: HandProfile, cfg: ModelConfig,
+           executor: Optional[Executor]) -> Tuple[np.ndarray, int, float]:
+    """Summed feature difference, mistakes and cost gap over the corpus (in corpus order)."""
+    n = len(examples)
+    if executor is None:
+        results = [_score_example(ex, profile, cfg) for ex in examples]
+    else:
+        results = list(executor.map(_score_example, examples, [profile] * n, [cfg] * n))
+    diff = np.zeros(len(LINEAR_PARAMETERS))
+    mistakes, gap = 0, 0.0
+    for d, m, g in results:
+        diff += d
+        mistakes += m
+        gap += g
+    return diff, mistakes, gap
+
+def train(
+    examples: List[Example],
+    profile: HandProfile,
+    cfg: ModelConfig,
+    epochs: int = DEFAULT_EPOCHS,
+    lr: float = DEFAULT_LEARNING_RATE,
+    workers: Optional[int] = None,
+    executor: Optional[Executor] = None,
+) -> TrainResult:
+    """
+    Averaged perceptron over ``examples``, starting from the weights of
+    ``(profile, cfg)``; fields outside :data:`LINEAR_PARAMETERS` (spans,
+    interval thresholds) are kept. ``workers`` > 1 starts a process pool
+    for the run, or pass ``executor`` to reuse one. Stops early once an
+    epoch decodes every reference finger.
+    """
+    if not examples:
+        raise ValueError("no annotated notes to train on")
+    notes = sum(len(ex.reference) for ex in examples)
+    own_pool = None
+    if executor is None and workers is not None and workers > 1 and len(examples) > 1:
+        own_pool = executor = ProcessPoolExecutor(max_workers=min(workers, len(examples)))
+    try:
+        w = parameter_vector(profile, cfg)
+        total = np.zeros_like(w)
+        history: List[EpochStats] = []
+        pocket = None  # (stats, weights) of the epoch with the fewest mistakes
+        for epoch in range(1, epochs + 1):
+            p, c = with_parameters(profile, cfg, w)
+            with profiling.stage("train_epoch"):
+                diff, mistakes, gap = _epoch(examples, p, c, executor)
+            stats = EpochStats(epoch, mistakes, notes, gap)
+            history.append(stats)
+            if pocket is None or mistakes < pocket[0].mistakes:
+                pocket = (stats, w)
+            if not mistakes:
+                total += w * (epochs - epoch + 1)  # w stays put for the remaining epochs
+                break
+            w = w + lr * diff / notes
+            total += w
+        w_avg = total / epochs
+        p, c = with_parameters(profile, cfg, w_avg)
+        _, mistakes, gap = _epoch(examples, p, c, executor)
+        final = EpochStats(len(history), mistakes, notes, gap)
+        if pocket[0].mistakes < mistakes:
+            p, c = with_parameters(profile, cfg, pocket[1])
+            return TrainResult(p, c, pocket[1], history, pocket[0], averaged=False)
+        return TrainResult(p, c, w_avg, history, final)
+    finally:
+        if own_pool is not None:
+            own_pool.shutdown()
+
+def corpus_files(paths: Iterable[str]) -> List[str]:
+    """Expands directories (recursively) into their ``.musicxml``/``.xml`` files; keeps files as given."""
+    files = []
+    for path in paths:
+        p = Path(path)
+        if p.is_dir():
+            files += sorted(str(q) for q in p.rglob("*") if q.suffix.lower() in (".musicxml", ".xml") and q.is_file())
+        else:
+            files.append(str(p))
+    return files
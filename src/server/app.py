@@ -0,0 +1,307 @@
+"""
+Long-lived fingering server.
+
+An asyncio HTTP/1.1 server (TCP or Unix socket) that keeps decoder state warm
+across requests. CPU-bound work runs on a process pool whose workers import
+the decoder once and keep their cost tables for the life of the pool.
+
+Endpoints (query parameters ``hand_profile``, ``staff`` = RH/LH/both and
+``engine`` apply to the POSTs):
+
+``POST /fingerings``
+    Body: MusicXML, or event JSON (see :mod:`..io.eventfile`) when the
+    ``Content-Type`` is ``application/json``. Returns JSON with
+    ``fingerings`` (event idx -> finger), ``margin_notes`` and ``events``.
+``POST /annotate``
+    Body: MusicXML. Returns the score with fingerings and margin notes.
+``GET /metrics``
+    Per-endpoint latency histograms, status counts and queue state.
+``GET /health``
+
+At most ``workers`` requests run at once and ``queue_limit`` more may wait;
+beyond that requests get ``503`` with ``Retry-After``. Every response closes
+the connection.
+"""
+import asyncio
+import bisect
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+DEFAULT_PORT = 8765
+DEFAULT_QUEUE_LIMIT = 16
+DEFAULT_MAX_BODY = 32 << 20
+# Upper bounds (milliseconds) of the latency histogram buckets; the last bucket is open.
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            411: "Length Required", 413: "Payload Too Large", 500: "Internal Server Error",
+            503: "Service Unavailable"}
+MUSICXML_TYPE = "application/vnd.recordare.musicxml+xml"
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+# --- work done in pool processes ---------------------------------------------
+
+def _warm_worker() -> None:
+    """Pool initializer: import the decoder and build the default cost tables once."""
+    from ..pfai.config import DEFAULT_CONFIG, PROFILE_L, PROFILE_M, PROFILE_S, PROFILE_XL
+    from ..rules.costs import get_cost_tables
+
+    for profile in (PROFILE_S, PROFILE_M, PROFILE_L, PROFILE_XL):
+        get_cost_tables(profile, DEFAULT_CONFIG)
+
+def _finger_table(events, hand_profile: str, staff: str, engine: str) -> dict:
+    from ..cli.main import _profile_from_name, finger_events
+    from ..pfai.config import DEFAULT_CONFIG
+
+    return finger_events(events, _profile_from_name(hand_profile), DEFAULT_CONFIG, staff, engine)
+
+def finger_event_json(doc: dict, hand_profile: str, staff: str, engine: str) -> dict:
+    from ..io.eventfile import table_from_json
+    return _finger_table(table_from_json(doc), hand_profile, staff, engine)
+
+def finger_musicxml(payload: bytes, hand_profile: str, staff: str, engine: str) -> dict:
+    from ..io.musicxml_stream import read_events
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "in.musicxml")
+        with open(path, "wb") as fh:
+            fh.write(payload)
+        return _finger_table(read_events(path), hand_profile, staff, engine)
+
+def annotate_musicxml(payload: bytes, hand_profile: str, staff: str, engine: str) -> bytes:
+    from ..cli.main import _profile_from_name, annotate_file
+    from ..pfai.config import DEFAULT_CONFIG
+    with tempfile.TemporaryDirectory() as tmp:
+        src, out = os.path.join(tmp, "in.musicxml"), os.path.join(tmp, "out.musicxml")
+        with open(src, "wb") as fh:
+            fh.write(payload)
+        annotate_file(src, out, _profile_from_name(hand_profile), DEFAULT_CONFIG, staff=staff, engine=engine,
+                      backend="xml")
+        with open(out, "rb") as fh:
+            return fh.read()
+
+# --- metrics -----------------------------------------------------------------
+
+class LatencyHistogram:
+    """Bucketed counts of request latencies in milliseconds."""
+    def __init__(self, bounds_ms=LATENCY_BUCKETS_MS):
+        self.bounds_ms = tuple(bounds_ms)
+        self.counts = [0] * (len(self.bounds_ms) + 1)
+        self.total_ms = 0.0
+        self.count = 0
+
+    def observe(self, ms: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds_ms, ms)] += 1
+        self.total_ms += ms
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the ``q`` quantile (None if empty or in the open bucket)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.bounds_ms, self.counts):
+            seen += n
+            if seen >= rank:
+                return float(bound)
+        return None
+
+    def to_dict(self) -> dict:
+        labels = [f"le_{b}" for b in self.bounds_ms] + ["inf"]
+        return {
+            "buckets_ms": dict(zip(labels, self.counts)),
+            "count": self.count,
+            "mean_ms": self.total_ms / self.count if self.count else None,
+            "p50_ms": self.quantile(0.5),
+            "p99_ms": self.quantile(0.99),
+        }
+
+# --- server ------------------------------------------------------------------
+
+class FingeringServer:
+    """
+    Serves the endpoints in the module docstring. ``executor`` overrides the
+    default process pool of ``workers`` processes (e.g. a thread pool in tests).
+    """
+    def __init__(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT, unix_path: Optional[str] = None,
+                 workers: Optional[int] = None, queue_limit: int = DEFAULT_QUEUE_LIMIT,
+                 max_body: int = DEFAULT_MAX_BODY, executor: Optional[Executor] = None):
+        self.host, self.port, self.unix_path = host, port, unix_path
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_limit = queue_limit
+        self.max_body = max_body
+        self._executor = executor
+        self._own_executor = executor is None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._inflight = 0
+        self.started = time.time()
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.status_counts: Dict[str, int] = {}
+        self.rejected = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.queue_limit
+
+    async def start(self) -> None:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker)
+        if self.unix_path:
+            self._server = await asyncio.start_unix_server(self._handle, path=self.unix_path)
+        else:
+            self._server = await asyncio.start_server(self._handle, self.host, self.port)
+            self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._own_executor and self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        if self.unix_path and os.path.exists(self.unix_path):
+            os.unlink(self.unix_path)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        t0 = time.perf_counter()
+        route = "invalid"
+        try:
+            method, target, headers, body = await self._read_request(reader)
+            url = urlsplit(target)
+            route = url.path
+            status, content_type, payload = await self._dispatch(method, url.path, parse_qs(url.query), headers, body)
+        except HTTPError as exc:
+            status, content_type, payload = exc.status, "application/json", _json({"error": str(exc)})
+        except Exception as exc:  # pragma: no cover - defensive
+            status, content_type, payload = 500, "application/json", _json({"error": f"{type(exc).__name__}: {exc}"})
+        extra = {"Retry-After": "1"} if status == 503 else {}
+        try:
+            writer.write(_response(status, content_type, payload, extra))
+            await writer.drain()
+        finally:
+            writer.close()
+        self._record(route, status, 1000 * (time.perf_counter() - t0))
+
+    def _record(self, route: str, status: int, ms: float) -> None:
+        known = route if route in ("/fingerings", "/annotate", "/metrics", "/health") else "other"
+        self.histograms.setdefault(known, LatencyHistogram()).observe(ms)
+        self.status_counts[str(status)] = self.status_counts.get(str(status), 0) + 1
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Tuple[str, str, Dict[str, str], bytes]:
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            raise HTTPError(400, "malformed request head")
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "malformed request line")
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        body = b""
+        if method == "POST":
+            if "content-length" not in headers:
+                raise HTTPError(411, "Content-Length required")
+            value = headers["content-length"]
+            if not (value.isascii() and value.isdigit()):
+                raise HTTPError(400, f"invalid Content-Length {value!r}")
+            length = int(value)
+            if length > self.max_body:
+                raise HTTPError(413, f"body exceeds {self.max_body} bytes")
+            try:
+                body = await reader.readexactly(length)
+            except asyncio.IncompleteReadError:
+                raise HTTPError(400, "body shorter than Content-Length")
+        return method, target, headers, body
+
+    async def _dispatch(self, method: str, path: str, query: Dict[str, List[str]], headers: Dict[str, str],
+                        body: bytes) -> Tuple[int, str, bytes]:
+        if path == "/health":
+            return 200, "application/json", _json({"status": "ok"})
+        if path == "/metrics":
+            return 200, "application/json", _json(self.metrics())
+        if path not in ("/fingerings", "/annotate"):
+            raise HTTPError(404, f"no endpoint {path}")
+        if method != "POST":
+            raise HTTPError(405, f"{path} expects POST")
+
+        options = _options(query)
+        is_json = headers.get("content-type", "").split(";")[0].strip() == "application/json"
+        if path == "/annotate":
+            if is_json:
+                raise HTTPError(400, "/annotate needs a MusicXML body")
+            job = (annotate_musicxml, body)
+        elif is_json:
+            try:
+                job = (finger_event_json, json.loads(body))
+            except ValueError as exc:
+                raise HTTPError(400, f"invalid JSON: {exc}")
+        else:
+            job = (finger_musicxml, body)
+
+        if self._inflight >= self.capacity:
+            self.rejected += 1
+            raise HTTPError(503, "server busy")
+        self._inflight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._executor, job[0], job[1], *options)
+        except (ValueError, SyntaxError) as exc:
+            # Malformed event JSON or MusicXML (ElementTree's ParseError is a SyntaxError).
+            raise HTTPError(400, f"{type(exc).__name__}: {exc}")
+        finally:
+            self._inflight -= 1
+        if path == "/annotate":
+            return 200, MUSICXML_TYPE, result
+        return 200, "application/json", _json(result)
+
+    def metrics(self) -> dict:
+        return {
+            "uptime_s": time.time() - self.started,
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "inflight": self._inflight,
+            "rejected": self.rejected,
+            "status": dict(self.status_counts),
+            "latency": {route: h.to_dict() for route, h in self.histograms.items()},
+        }
+
+def _options(query: Dict[str, List[str]]) -> Tuple[str, str, str]:
+    from ..decoding.second_order_dp import ENGINES
+
+    hand_profile = query.get("hand_profile", ["M"])[0].upper()
+    staff = query.get("staff", ["both"])[0]
+    engine = query.get("engine", ["numpy"])[0]
+    if hand_profile not in ("S", "M", "L", "XL"):
+        raise HTTPError(400, f"unknown hand_profile {hand_profile!r}")
+    if staff not in ("RH", "LH", "both"):
+        raise HTTPError(400, f"staff must be RH, LH or both, not {staff!r}")
+    if engine not in ENGINES:
+        raise HTTPError(400, f"unknown engine {engine!r}")
+    return hand_profile, staff, engine
+
+def _json(obj) -> bytes:
+    return json.dumps(obj).encode("utf-8")
+
+def _response(status: int, content_type: str, body: bytes, extra: Optional[Dict[str, str]] = None) -> bytes:
+    head = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}", f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}", "Connection: close"]
+    head += [f"{k}: {v}" for k, v in (extra or {}).items()]
+    return ("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body
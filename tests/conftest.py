@@ -3,9 +3,117 @@
 import sys
 import pathlib
 
+import pytest
+
 ROOT = pathlib.Path(__file__).resolve().parents[1]
 SRC = ROOT / "src"
 for path in (ROOT, SRC):
     if str(path) not in sys.path:
         sys.path.insert(0, str(path))
 
+MOONLIGHT = ROOT / "Sonate No. 14 Moonlight 3rd Movement.musicxml"
+
+
+@pytest.fixture(autouse=True)
+def _isolated_result_cache(tmp_path_factory, monkeypatch):
+    """Keep CLI runs from reading or filling the user's result cache."""
+    monkeypatch.setenv("PIANO_FINGERING_CACHE_DIR", str(tmp_path_factory.mktemp("cache")))
+
+
+@pytest.fixture(scope="session")
+def moonlight_path() -> pathlib.Path:
+    return MOONLIGHT
+
+
+@pytest.fixture(scope="session")
+def moonlight_events(moonlight_path):
+    from piano_fingering.io.musicxml import load_score, extract_monophonic_events
+
+    return extract_monophonic_events(load_score(str(moonlight_path)))
+
+
+def _note(step, octave, duration, staff, voice, extra="", notations="", alter=0):
+    alter_xml = f"<alter>{alter}</alter>" if alter else ""
+    notations_xml = f"<notations>{notations}</notations>" if notations else ""
+    kind = {1: "eighth", 2: "quarter", 4: "half"}[duration]
+    return (
+        f"<note>{extra}<pitch><step>{step}</step>{alter_xml}<octave>{octave}</octave></pitch>"
+        f"<duration>{duration}</duration><voice>{voice}</voice><type>{kind}</type>"
+        f"<staff>{staff}</staff>{notations_xml}</note>"
+    )
+
+
+def _rest(duration, staff, voice):
+    kind = {1: "eighth", 2: "quarter", 4: "half"}[duration]
+    return f"<note><rest/><duration>{duration}</duration><voice>{voice}</voice><type>{kind}</type><staff>{staff}</staff></note>"
+
+
+TWO_STAFF_XML = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<score-partwise version="3.1"><part-list><score-part id="P1"><part-name>Piano</part-name></score-part></part-list>'
+    '<part id="P1">'
+    '<measure number="1"><attributes><divisions>2</divisions><key><fifths>0</fifths></key>'
+    '<time><beats>4</beats><beat-type>4</beat-type></time><staves>2</staves>'
+    '<clef number="1"><sign>G</sign><line>2</line></clef><clef number="2"><sign>F</sign><line>4</line></clef></attributes>'
+    + _note("C", 5, 1, 1, 1, notations='<slur type="start" number="1"/>')
+    + _note("D", 5, 1, 1, 1)
+    + _note("E", 5, 1, 1, 1, notations='<slur type="stop" number="1"/>')
+    + _note("F", 5, 1, 1, 1, alter=1, notations="<articulations><staccato/></articulations>")
+    + _note("G", 5, 2, 1, 1)
+    + _note("C", 5, 2, 1, 1)
+    + _note("E", 5, 2, 1, 1, extra="<chord/>")
+    + '<backup><duration>8</duration></backup>'
+    + _note("C", 3, 4, 2, 5, extra='<tie type="start"/>', notations='<tied type="start"/>')
+    + _rest(2, 2, 5)
+    + _note("G", 2, 2, 2, 5)
+    + '</measure><measure number="2">'
+    + _note("A", 5, 2, 1, 1)
+    + _note("C", 6, 2, 1, 1)
+    + _note("C", 5, 2, 1, 1)
+    + _note("G", 6, 2, 1, 1)
+    + '<backup><duration>8</duration></backup>'
+    + _note("C", 3, 4, 2, 5, extra='<tie type="stop"/>', notations='<tied type="stop"/>')
+    + _note("E", 3, 4, 2, 5)
+    + '</measure></part></score-partwise>\n'
+)
+
+
+@pytest.fixture(scope="session")
+def two_staff_path(tmp_path_factory) -> pathlib.Path:
+    """Small two-staff piano score with a slur, staccato, tie, rest, chord and leap."""
+    path = tmp_path_factory.mktemp("scores") / "two_staff.musicxml"
+    path.write_text(TWO_STAFF_XML, encoding="utf-8")
+    return path
+
+
+@pytest.fixture(scope="session")
+def teacher():
+    """Weights that differ from the defaults, used to finger :func:`fingered_corpus`."""
+    from dataclasses import replace
+    from piano_fingering.pfai.config import DEFAULT_CONFIG, PROFILE_M
+    return (
+        replace(PROFILE_M, jump_bonus_1_to_4=0.4, jump_bonus_4_to_1=0.4, rollover_bonus_121=0.3),
+        replace(DEFAULT_CONFIG, weight_finger_delta=0.3, repeat_penalty_non_staccato=0.6),
+    )
+
+
+@pytest.fixture(scope="session")
+def fingered_corpus(tmp_path_factory, teacher):
+    """Synthetic scores fingered by ``teacher``; every second score only on every third note."""
+    from piano_fingering.bench.synthetic import write_synthetic_score
+    from piano_fingering.decoding.second_order_dp import decode_monophonic_second_order
+    from piano_fingering.io.musicxml_stream import read_events_with_ordinals, write_fingerings_xml
+
+    root = tmp_path_factory.mktemp("corpus")
+    paths = []
+    for seed in range(4):
+        src = root / f"plain{seed}.musicxml"
+        write_synthetic_score(str(src), 150, seed=seed)
+        events, ordinals = read_events_with_ordinals(str(src))
+        fingering = decode_monophonic_second_order(events, *teacher, 1)
+        if seed % 2:
+            fingering = {k: f for k, f in fingering.items() if k % 3 == 0}
+        out = root / f"fingered{seed}.musicxml"
+        write_fingerings_xml(str(src), str(out), fingering, [], ordinals)
+        paths.append(out)
+    return paths
@@ -0,0 +1,41 @@
+import json
+import shutil
+
+from piano_fingering.cli.batch import collect_inputs, output_path
+from piano_fingering.cli.main import app
+
+
+def _corpus(tmp_path, two_staff_path):
+    corpus = tmp_path / "corpus"
+    (corpus / "book1").mkdir(parents=True)
+    shutil.copy(two_staff_path, corpus / "a.musicxml")
+    shutil.copy(two_staff_path, corpus / "book1" / "b.musicxml")
+    (corpus / "book1" / "broken.musicxml").write_text("<score-partwise><part", encoding="utf-8")
+    return corpus
+
+
+def test_collect_inputs_and_mirror_paths(tmp_path, two_staff_path):
+    corpus = _corpus(tmp_path, two_staff_path)
+    (corpus / "a.fingered.musicxml").write_text("", encoding="utf-8")
+    found = collect_inputs([str(corpus)])
+    assert sorted(p.name for p, _ in found) == ["a.musicxml", "b.musicxml", "broken.musicxml"]
+    assert collect_inputs([str(corpus / "**" / "b.*")]) == [(corpus / "book1" / "b.musicxml", corpus)]
+
+    src = corpus / "book1" / "b.musicxml"
+    assert output_path(src, corpus, None) == corpus / "book1" / "b.fingered.musicxml"
+    assert output_path(src, corpus, tmp_path / "out") == tmp_path / "out" / "book1" / "b.fingered.musicxml"
+
+
+def test_batch_process_pool_writes_mirror_tree_and_manifest(tmp_path, two_staff_path):
+    corpus = _corpus(tmp_path, two_staff_path)
+    out = tmp_path / "out"
+    status = app(["batch", str(corpus), "--outdir", str(out), "--workers", "2", "--backend", "xml"])
+
+    assert status == 1  # the broken file fails, the others still succeed
+    manifest = json.loads((out / "fingering-manifest.json").read_text())
+    by_name = {entry["input"].rsplit("/", 1)[-1]: entry for entry in manifest["files"]}
+    assert manifest["ok"] == 2 and manifest["failed"] == 1
+    assert by_name["broken.musicxml"]["status"] == "error" and "ParseError" in by_name["broken.musicxml"]["error"]
+    assert by_name["b.musicxml"]["events"] == 15 and "decode" in by_name["b.musicxml"]["timings"]
+    assert (out / "a.fingered.musicxml").exists()
+    assert (out / "book1" / "b.fingered.musicxml").exists()
@@ -0,0 +1,50 @@
+import copy
+import json
+
+from piano_fingering.bench.suite import compare, prepare_cases, run_suite
+from piano_fingering.bench.synthetic import synthetic_notes, write_synthetic_score
+from piano_fingering.cli.main import app
+from piano_fingering.io.musicxml import extract_monophonic_events, load_score
+from piano_fingering.io.musicxml_stream import read_events
+
+
+def test_synthetic_stream_mixes_figures(tmp_path):
+    notes = synthetic_notes(500, seed=3)
+    assert len(notes) == 500 and notes == synthetic_notes(500, seed=3)
+    pitches = [p for p, *_ in notes]
+    assert sum(start for _, start, _, _ in notes) == sum(stop for _, _, stop, _ in notes) > 0
+    assert any(stacc for *_, stacc in notes)
+    assert any(abs(b - a) > 12 for a, b in zip(pitches, pitches[1:]))
+    assert any(a == c != b and abs(b - a) <= 2 for a, b, c in zip(pitches, pitches[1:], pitches[2:]))
+
+    path = write_synthetic_score(str(tmp_path / "s.musicxml"), 200, seed=1)
+    events = read_events(path)
+    assert len(events) == 200 and events.pitch.tolist() == [p for p, *_ in synthetic_notes(200, seed=1)]
+    assert events == extract_monophonic_events(load_score(path))
+
+
+def test_suite_results_and_compare(tmp_path):
+    cases = prepare_cases(["300"], str(tmp_path), moonlight=False)
+    results = run_suite(cases, repeat=2, stages=["read_events", "decode", "margin_notes", "write_xml"])
+    case = results["cases"]["synthetic-300"]
+    assert case["events"] == 300 and set(case["stages"]) == {"read_events", "decode", "margin_notes", "write_xml"}
+    assert all(len(t["runs"]) == 2 and t["best"] <= t["median"] for t in case["stages"].values())
+    json.dumps(results)
+
+    assert not any(r["regressed"] for r in compare(results, results))
+    slower = copy.deepcopy(results)
+    slower["cases"]["synthetic-300"]["stages"]["decode"]["best"] += 1.0
+    rows = compare(results, slower, threshold=0.25)
+    assert [r["stage"] for r in rows if r["regressed"]] == ["decode"]
+
+
+def test_bench_cli_compare_fails_on_regression(tmp_path):
+    doc = {"meta": {}, "cases": {"c": {"events": 10, "stages": {"decode": {"best": 0.1, "median": 0.1, "runs": [0.1]}},
+                                       "skipped": [], "failed": {}}}}
+    fast, slow = tmp_path / "fast.json", tmp_path / "slow.json"
+    fast.write_text(json.dumps(doc))
+    doc["cases"]["c"]["stages"]["decode"]["best"] = 0.2
+    slow.write_text(json.dumps(doc))
+    assert app(["bench", "--results", str(slow), "--baseline", str(fast)]) == 1
+    assert app(["bench", "--results", str(fast), "--baseline", str(slow)]) == 0
+    assert app(["bench", "--results", str(slow), "--baseline", str(fast), "--threshold", "1.5"]) == 0
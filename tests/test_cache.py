@@ -0,0 +1,58 @@
+from dataclasses import replace
+
+from piano_fingering.cli.main import annotate_file, app
+from piano_fingering.io.cache import ResultCache, file_digest
+from piano_fingering.io.musicxml_stream import read_events, read_events_with_ordinals
+from piano_fingering.pfai.config import DEFAULT_CONFIG, PROFILE_M
+
+
+def test_events_and_fingerings_round_trip(tmp_path, two_staff_path):
+    events, ordinals = read_events_with_ordinals(str(two_staff_path))
+    with ResultCache(str(tmp_path)) as cache:
+        digest = file_digest(str(two_staff_path))
+        assert cache.get_events(digest, "xml") is None
+        cache.put_events(digest, "xml", events, ordinals)
+        assert cache.get_events(digest, "xml") == (events, ordinals)
+        cache.put_fingering("e", 1, PROFILE_M, DEFAULT_CONFIG, {3: [2], 7: [5]})
+        assert cache.get_fingering("e", 1, PROFILE_M, DEFAULT_CONFIG) == {3: [2], 7: [5]}
+        assert cache.get_fingering("e", 2, PROFILE_M, DEFAULT_CONFIG) is None
+        assert cache.get_fingering("e", 1, replace(PROFILE_M, rollover_bonus_121=0.0), DEFAULT_CONFIG) is None
+        assert cache.stats()["hits"] == {"events": 1, "fingering": 1}
+        assert cache.stats()["misses"] == {"events": 1, "fingering": 2}
+
+
+def test_size_bound_evicts_least_recently_used(tmp_path):
+    with ResultCache(str(tmp_path), max_bytes=2000) as cache:
+        fingering = {k: [1 + k % 5] for k in range(50)}
+        for name in ("a", "b", "c"):
+            cache.put_fingering(name, 1, PROFILE_M, DEFAULT_CONFIG, fingering)
+            cache.get_fingering("a", 1, PROFILE_M, DEFAULT_CONFIG)  # keep "a" recent
+        assert cache.size_bytes() <= 2000
+        assert cache.get_fingering("a", 1, PROFILE_M, DEFAULT_CONFIG) == fingering
+        assert cache.get_fingering("b", 1, PROFILE_M, DEFAULT_CONFIG) is None
+
+
+def test_warm_run_skips_parse_and_decode(tmp_path, two_staff_path):
+    with ResultCache(str(tmp_path / "cache")) as cache:
+        cold = annotate_file(str(two_staff_path), str(tmp_path / "cold.musicxml"), PROFILE_M, DEFAULT_CONFIG,
+                             backend="xml", cache=cache)
+        warm = annotate_file(str(two_staff_path), str(tmp_path / "warm.musicxml"), PROFILE_M, DEFAULT_CONFIG,
+                             backend="xml", cache=cache)
+    assert cold["cache"] == {"hits": {}, "misses": {"events": 1, "fingering": 2}}
+    assert warm["cache"] == {"hits": {"events": 1, "fingering": 2}, "misses": {}}
+    assert "extract" in cold["timings"] and "extract" not in warm["timings"]
+    assert (tmp_path / "cold.musicxml").read_bytes() == (tmp_path / "warm.musicxml").read_bytes()
+
+
+def test_cli_cache_flags(tmp_path, two_staff_path, capsys):
+    args = ["--infile", str(two_staff_path), "--outfile", str(tmp_path / "out.musicxml"), "--backend", "xml",
+            "--cache-dir", str(tmp_path / "cache")]
+    app(args)
+    app(args)
+    assert capsys.readouterr().err.splitlines()[-1] == "cache: events 1/1 hit, fingering 2/2 hit"
+    app(args + ["--no-cache"])
+    assert capsys.readouterr().err == ""
+    app(["--clear-cache", "--cache-dir", str(tmp_path / "cache")])
+    app(args)
+    assert capsys.readouterr().err.splitlines()[-1] == "cache: events 0/1 hit, fingering 0/2 hit"
+    assert read_events(str(tmp_path / "out.musicxml")) == read_events(str(two_staff_path))
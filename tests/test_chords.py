@@ -0,0 +1,90 @@
+import itertools
+
+import pytest
+
+from piano_fingering.decoding.chords import (build_lattice, chord_fingering_cost, chord_shape, chord_slices,
+                                             lattice_path_cost)
+from piano_fingering.decoding.second_order_dp import decode_monophonic_second_order
+from piano_fingering.io.musicxml_stream import read_events
+from piano_fingering.pfai import profiling
+from piano_fingering.pfai.config import DEFAULT_CONFIG, PROFILE_M
+from piano_fingering.pfai.types import Event, EventTable
+
+
+def _table(slices, staff=1):
+    """Events for a list of pitches or pitch tuples (chords)."""
+    events = []
+    for t, notes in enumerate(slices):
+        chord = isinstance(notes, tuple)
+        for p in notes if chord else (notes,):
+            events.append(Event(len(events), p, float(t), False, t == 1, False, staff, chord))
+    return EventTable.from_events(events)
+
+
+def test_matches_numpy_on_chord_free_staves(moonlight_events):
+    for staff in (1, 2):
+        mono = moonlight_events.for_staff(staff)
+        assert decode_monophonic_second_order(mono, PROFILE_M, DEFAULT_CONFIG, staff, engine="chord") == \
+            decode_monophonic_second_order(mono, PROFILE_M, DEFAULT_CONFIG, staff)
+
+
+def test_chord_shapes_are_pruned_and_cached():
+    args = (PROFILE_M.easy_span_semitones, PROFILE_M.max_span_semitones, DEFAULT_CONFIG.chord_stretch_penalty)
+    octave, cost = chord_shape((0, 12), False, *args)
+    assert octave.tolist() == [[0, 4]] and cost[0] == pytest.approx(0.2)
+    assert chord_shape((0, 12), True, *args)[0].tolist() == [[4, 0]]
+    assert len(chord_shape((0, 14), False, *args)[0]) == 0
+    assert len(chord_shape((0, 4, 7), False, *args)[0]) == 10
+    triad, _ = chord_shape((0, 7, 12), False, *args)
+    assert triad.tolist() == [[0, 1, 4], [0, 2, 4], [0, 3, 4]]
+    hits = chord_shape.cache_info().hits
+    assert chord_shape((0, 7, 12), False, *args)[0] is triad
+    assert chord_shape.cache_info().hits == hits + 1
+
+
+def test_decodes_the_optimum_of_a_mixed_staff():
+    table = _table([60, (60, 67, 72), 65, (62, 65), 67, 64])
+    fingering = decode_monophonic_second_order(table, PROFILE_M, DEFAULT_CONFIG, 1, engine="chord")
+    assert sorted(fingering) == table.idx.tolist()
+
+    slices, skipped = chord_slices(table, PROFILE_M, DEFAULT_CONFIG, left_hand=False)
+    assert skipped == 0 and [len(s.rows) for s in slices] == [1, 3, 1, 2, 1, 1]
+    lattice = build_lattice(slices, PROFILE_M, DEFAULT_CONFIG)
+    best = min(lattice_path_cost(lattice, list(states))
+               for states in itertools.product(*(range(len(s.fingers)) for s in slices)))
+    assert chord_fingering_cost(table, fingering, PROFILE_M, DEFAULT_CONFIG, 1) == pytest.approx(best, abs=1e-12)
+
+
+def test_left_hand_chords_and_unreachable_chords():
+    table = _table([48, (36, 48), (40, 43, 48), (20, 60), 45], staff=2)
+    with profiling.Profiler(memory=False) as prof:
+        fingering = decode_monophonic_second_order(table, PROFILE_M, DEFAULT_CONFIG, 2, engine="chord")
+    assert prof.report()["counters"]["chords_skipped"] == 1
+    assert fingering[1] == [5] and fingering[2] == [1]
+    assert fingering[3][0] > fingering[4][0] > fingering[5][0]
+    assert 6 not in fingering and 7 not in fingering and 8 in fingering
+    lattice = build_lattice(chord_slices(table, PROFILE_M, DEFAULT_CONFIG, True)[0], PROFILE_M, DEFAULT_CONFIG)
+    assert [t.shape[0] for t in lattice.trans] == [5, 1, len(lattice.trans[2])]
+
+
+def test_mixed_staves_stay_near_linear(moonlight_path):
+    events = read_events(str(moonlight_path))
+    for staff in (1, 2):
+        with profiling.Profiler(memory=False) as prof:
+            fingering = decode_monophonic_second_order(events, PROFILE_M, DEFAULT_CONFIG, staff, engine="chord")
+        counters = prof.report()["counters"]
+        notes = len(events.for_staff(staff, include_chords=True))
+        assert len(fingering) > 0.95 * notes
+        assert counters["dp_cells"] < 200 * notes
+        chords = events.for_staff(staff, include_chords=True)
+        members = [fingering[k][0] for k in chords.idx[chords.is_chord].tolist() if k in fingering]
+        assert members  # chords are no longer skipped
+
+
+def test_cli_fingers_chord_members(two_staff_path, tmp_path):
+    from piano_fingering.cli.main import app
+
+    out = tmp_path / "out.musicxml"
+    app(["--infile", str(two_staff_path), "--outfile", str(out), "--backend", "xml", "--engine", "chord", "--no-cache"])
+    text = out.read_text()
+    assert text.count("</fingering>") == len(read_events(str(two_staff_path))) == 15
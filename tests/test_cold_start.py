@@ -0,0 +1,63 @@
+import json
+import subprocess
+import sys
+import time
+
+from conftest import ROOT, SRC
+
+from piano_fingering.cli.main import app, finger_events
+from piano_fingering.io.eventfile import read_event_file, read_event_file_with_ordinals
+from piano_fingering.io.musicxml_stream import read_events_with_ordinals
+from piano_fingering.pfai.config import DEFAULT_CONFIG, PROFILE_M
+
+# Generous: these only catch a heavy import sneaking back onto the start-up path.
+HELP_SECONDS = 5.0
+DECODE_SECONDS = 10.0
+
+_RUNNER = """
+import json, sys
+sys.path[:0] = [{root!r}, {src!r}]
+from piano_fingering.cli.main import app
+try:
+    app({argv!r})
+except SystemExit:
+    pass
+print(json.dumps(sorted(m for m in ("music21", "numpy") if m in sys.modules)), file=sys.stderr)
+"""
+
+
+def _cold_run(argv):
+    code = _RUNNER.format(root=str(ROOT), src=str(SRC), argv=list(argv))
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    seconds = time.perf_counter() - t0
+    return proc, seconds, json.loads(proc.stderr.strip().splitlines()[-1])
+
+
+def test_help_imports_neither_music21_nor_numpy():
+    for argv in (["--help"], ["batch", "--help"], ["sweep", "--help"], ["decode", "--help"]):
+        proc, seconds, loaded = _cold_run(argv)
+        assert "usage:" in proc.stdout
+        assert loaded == [], argv
+        assert seconds < HELP_SECONDS
+
+
+def test_decode_from_event_file_skips_music21(tmp_path, two_staff_path):
+    for name in ("events.json", "events.npz"):
+        path = tmp_path / name
+        app(["extract", "--infile", str(two_staff_path), "--out", str(path)])
+        out = tmp_path / (name + ".fingering.json")
+        _, seconds, loaded = _cold_run(["decode", "--events", str(path), "--out", str(out)])
+        assert loaded == ["numpy"]
+        assert seconds < DECODE_SECONDS
+        events = read_events_with_ordinals(str(two_staff_path))[0]
+        assert json.loads(out.read_text()) == finger_events(events, PROFILE_M, DEFAULT_CONFIG)
+
+
+def test_event_files_round_trip_ordinals(tmp_path, two_staff_path):
+    events, ordinals = read_events_with_ordinals(str(two_staff_path))
+    for name in ("e.json", "e.npz"):
+        app(["extract", "--infile", str(two_staff_path), "--out", str(tmp_path / name)])
+        assert read_event_file_with_ordinals(str(tmp_path / name)) == (events, ordinals)
+    app(["extract", "--backend", "music21", "--infile", str(two_staff_path), "--out", str(tmp_path / "m.json")])
+    assert read_event_file(str(tmp_path / "m.json")) == events
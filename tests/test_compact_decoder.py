@@ -0,0 +1,59 @@
+import random
+import tracemalloc
+
+import pytest
+
+from piano_fingering.decoding.second_order_dp import (
+    _decode_compact,
+    _decode_numpy,
+    decode_monophonic_second_order,
+    decoder_memory_bytes,
+)
+from piano_fingering.pfai.config import DEFAULT_CONFIG, PROFILE_M
+from piano_fingering.pfai.types import Event, EventTable
+
+
+def _stream(n, seed=0):
+    rng = random.Random(seed)
+    pitch = 60
+    events = []
+    for i in range(n):
+        pitch = min(96, max(36, pitch + rng.choice([-2, -1, 0, 1, 2, 4, -4, 13, -13])))
+        events.append(Event(i, pitch, float(i), False, rng.random() < 0.2, rng.random() < 0.2, 1, False))
+    return EventTable.from_events(events)
+
+
+@pytest.mark.parametrize("options", [{}, {"chunk": 50}, {"checkpoint": True}, {"checkpoint": True, "chunk": 7}])
+def test_compact_engine_matches_numpy(moonlight_events, options):
+    for staff in (1, 2):
+        assert decode_monophonic_second_order(moonlight_events, PROFILE_M, DEFAULT_CONFIG, staff,
+                                              engine="compact", **options) == \
+            decode_monophonic_second_order(moonlight_events, PROFILE_M, DEFAULT_CONFIG, staff)
+    for n in (1, 2, 3, 5):
+        seq = _stream(n, seed=n)
+        assert _decode_compact(seq, PROFILE_M, DEFAULT_CONFIG, **options) == _decode_numpy(seq, PROFILE_M, DEFAULT_CONFIG)
+
+
+def _peak(fn, *args, **kwargs):
+    tracemalloc.start()
+    try:
+        fn(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_peak_memory_default_and_compact_modes():
+    n = 8000
+    seq = _stream(n)
+    _decode_numpy(seq, PROFILE_M, DEFAULT_CONFIG)  # warm the shared cost tables
+
+    default = _peak(_decode_numpy, seq, PROFILE_M, DEFAULT_CONFIG)
+    compact = _peak(_decode_compact, seq, PROFILE_M, DEFAULT_CONFIG, chunk=1024)
+    checkpointed = _peak(_decode_compact, seq, PROFILE_M, DEFAULT_CONFIG, checkpoint=True, chunk=1024)
+
+    assert default <= decoder_memory_bytes(n)
+    assert compact <= decoder_memory_bytes(n, "compact", chunk=1024)
+    assert checkpointed <= decoder_memory_bytes(n, "compact", checkpoint=True, chunk=1024)
+    assert compact < default / 4
+    assert checkpointed < compact / 2
@@ -0,0 +1,45 @@
+from dataclasses import replace
+
+import numpy as np
+
+from piano_fingering.features.geometry import white_key_distance
+from piano_fingering.pfai.config import DEFAULT_CONFIG, PROFILE_L, PROFILE_M
+from piano_fingering.pfai.constants import FINGERS, MIDI_MAX, MIDI_MIN, WHITE_CHROMA
+from piano_fingering.rules import costs
+
+
+def test_white_key_table_matches_counting():
+    def whites_up_to(m):
+        return sum(1 for x in range(MIDI_MIN, m + 1) if (x % 12) in WHITE_CHROMA)
+
+    for m1 in range(MIDI_MIN, MIDI_MAX + 1, 5):
+        for m2 in range(MIDI_MIN, MIDI_MAX + 1, 7):
+            assert white_key_distance(m1, m2) == abs(whites_up_to(m1) - whites_up_to(m2))
+
+
+def test_first_order_matrix_matches_scalar_cost():
+    tables = costs.CostTables(PROFILE_M, DEFAULT_CONFIG)
+    for m_prev, m_cur, slur, stacc in [(60, 61, True, False), (66, 60, False, True), (60, 60, False, False)]:
+        mat = tables.first_order(m_prev, m_cur, slur, stacc)
+        for a, fp in enumerate(FINGERS):
+            for b, fc in enumerate(FINGERS):
+                assert mat[a, b] == costs.transition_cost_first_order(
+                    fp, m_prev, fc, m_cur, slur, stacc, PROFILE_M, DEFAULT_CONFIG)
+    assert tables.misses == 3
+    tables.first_order_stack([60, 66], [61, 60], [True, False], [False, True])
+    assert tables.hits == 2 and tables.misses == 3
+
+
+def test_tables_shared_by_fingerprint_and_bounded():
+    costs.clear_cost_table_cache()
+    first = costs.get_cost_tables(PROFILE_M, DEFAULT_CONFIG)
+    assert costs.get_cost_tables(replace(PROFILE_M), DEFAULT_CONFIG) is first
+    tuned = replace(PROFILE_M, rollover_bonus_121=-2.0)
+    assert costs.get_cost_tables(tuned, DEFAULT_CONFIG) is not first
+    info = costs.cost_table_cache_info()
+    assert (info.hits, info.misses, info.currsize) == (1, 2, 2)
+
+    for k in range(costs.COST_TABLE_CACHE_SIZE + 3):
+        costs.get_cost_tables(PROFILE_L, replace(DEFAULT_CONFIG, weight_finger_delta=float(k)))
+    assert costs.cost_table_cache_info().currsize == costs.COST_TABLE_CACHE_SIZE
+    assert np.array_equal(first.rollover, costs.rollover_adjustment_tensor(PROFILE_M))
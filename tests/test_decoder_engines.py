@@ -0,0 +1,33 @@
+import random
+
+import pytest
+
+from piano_fingering.decoding.second_order_dp import decode_monophonic_second_order
+from piano_fingering.pfai.config import DEFAULT_CONFIG, PROFILE_M, PROFILE_S, PROFILE_XL
+from piano_fingering.pfai.types import Event
+
+
+def test_numpy_engine_matches_python_on_moonlight(moonlight_events):
+    for staff in (1, 2):
+        fast = decode_monophonic_second_order(moonlight_events, PROFILE_M, DEFAULT_CONFIG, staff, engine="numpy")
+        ref = decode_monophonic_second_order(moonlight_events, PROFILE_M, DEFAULT_CONFIG, staff, engine="python")
+        assert fast == ref
+
+
+@pytest.mark.parametrize("profile", [PROFILE_S, PROFILE_XL])
+def test_numpy_engine_matches_python_on_short_phrases(profile):
+    rng = random.Random(7)
+    for _ in range(100):
+        n = rng.randint(1, 10)
+        events = [
+            Event(idx=i, pitch=rng.choice([60, 61, 62, 64, 72, 75]), time=float(i), tied=False,
+                  slur=rng.random() < 0.3, staccato=rng.random() < 0.3, staff=1, is_chord=False)
+            for i in range(n)
+        ]
+        assert decode_monophonic_second_order(events, profile, DEFAULT_CONFIG, 1, engine="numpy") == \
+            decode_monophonic_second_order(events, profile, DEFAULT_CONFIG, 1, engine="python")
+
+
+def test_unknown_engine_rejected():
+    with pytest.raises(ValueError):
+        decode_monophonic_second_order([], PROFILE_M, DEFAULT_CONFIG, 1, engine="gpu")
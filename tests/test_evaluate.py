@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from piano_fingering.bench.evaluate import Run, evaluate, gate
+from piano_fingering.cli.main import app
+from piano_fingering.pfai.config import DEFAULT_CONFIG, PROFILE_M, save_config
+from piano_fingering.rules.learning import load_corpus
+
+
+def test_teacher_weights_reproduce_the_references(fingered_corpus, teacher):
+    examples = load_corpus(fingered_corpus)
+    runs = [Run("teacher", *teacher, "numpy"), Run("teacher", *teacher, "segmented"),
+            Run("default", PROFILE_M, DEFAULT_CONFIG, "numpy")]
+    rows = evaluate(examples, runs, repeat=2)
+    assert [(r["config"], r["engine"], r["staff"]) for r in rows] == \
+        [("teacher", "numpy", 1), ("teacher", "segmented", 1), ("default", "numpy", 1)]
+    for row in rows[:2]:
+        assert (row["files"], row["notes"], row["events"]) == (4, 400, 600)
+        assert row["agreement"] == 1.0
+        assert row["cost_gap"] == pytest.approx(0.0, abs=1e-9) and row["optimum_gap"] == pytest.approx(0.0, abs=1e-9)
+        assert row["events_per_sec"] > 0
+    default = rows[2]
+    assert default["agreement"] < 1.0 and default["cost_gap"] < 0 and default["optimum_gap"] == 0.0
+    assert gate(rows, 0.0) == []
+
+
+def test_gate_flags_quality_losses():
+    def row(engine, agreement, optimum_gap=0.0, staff=1):
+        return {"config": "c", "engine": engine, "staff": staff, "agreement": agreement, "optimum_gap": optimum_gap}
+    rows = [row("numpy", 0.9), row("fast", 0.85), row("approx", 0.9, 0.5), row("fast", 0.5, staff=2)]
+    assert [(r["engine"], r["staff"]) for r in gate(rows, 0.1)] == [("approx", 1)]
+    assert [(r["engine"], r["staff"]) for r in gate(rows, 0.01)] == [("fast", 1), ("approx", 1)]
+
+
+def test_evaluate_cli(fingered_corpus, teacher, tmp_path):
+    config = tmp_path / "teacher.json"
+    save_config(str(config), *teacher)
+    out = tmp_path / "table.json"
+    corpus = str(fingered_corpus[0].parent)
+    assert app(["evaluate", corpus, "--engines", "numpy,chord,motif", "--config", str(config),
+                "--workers", "2", "--format", "json", "--out", str(out), "--gate", "0"]) == 0
+    rows = json.loads(out.read_text())
+    assert [(r["config"], r["engine"]) for r in rows] == [("teacher", "numpy"), ("teacher", "chord"), ("teacher", "motif")]
+    assert all(r["agreement"] == 1.0 for r in rows)
+    with pytest.raises(SystemExit):
+        app(["evaluate", corpus, "--engines", "numpy,fastest"])
+
+
+def test_configs_sharing_a_name_stay_apart(fingered_corpus, teacher, tmp_path):
+    paths = [tmp_path / "a" / "weights.json", tmp_path / "b" / "weights.json"]
+    for path, setting in zip(paths, [teacher, (PROFILE_M, DEFAULT_CONFIG)]):
+        path.parent.mkdir()
+        save_config(str(path), *setting)
+    out = tmp_path / "table.json"
+    assert app(["evaluate", str(fingered_corpus[0]), "--staff", "RH", "--config", str(paths[0]),
+                "--config", str(paths[1]), "--format", "json", "--out", str(out)]) == 0
+    rows = json.loads(out.read_text())
+    assert [(r["config"], r["files"]) for r in rows] == [(str(paths[0]), 1), (str(paths[1]), 1)]
+    assert rows[0]["agreement"] == 1.0 > rows[1]["agreement"]
+    with pytest.raises(SystemExit):
+        app(["evaluate", str(fingered_corpus[0]), "--config", str(paths[0]), "--config", str(paths[0])])
@@ -0,0 +1,37 @@
+import pickle
+
+import numpy as np
+
+from piano_fingering.annotate.notes import collect_margin_notes
+from piano_fingering.decoding.second_order_dp import decode_monophonic_second_order
+from piano_fingering.pfai.config import DEFAULT_CONFIG, PROFILE_M
+from piano_fingering.pfai.types import CHORD, SLUR, EventTable
+
+
+def test_table_round_trips_events(moonlight_events):
+    events = moonlight_events.to_events()
+    table = EventTable.from_events(events)
+    assert table == moonlight_events == events
+    assert table[5] == events[5] and table[10:20] == events[10:20]
+    assert table.event(events[-1].idx) == events[-1]
+    assert table.positions([0, len(events) - 1, len(events), -3]).tolist() == [0, len(events) - 1, -1, -1]
+    assert pickle.loads(pickle.dumps(table)) == table
+
+
+def test_staff_views_and_flags():
+    table = EventTable([0, 1, 2, 3], [60, 48, 64, 67], [0.0, 0.0, 1.0, 1.0], [1, 2, 1, 1], [SLUR, 0, CHORD, 0])
+    rh = table.for_staff(1)
+    assert rh.idx.tolist() == [0, 3] and rh.slur.tolist() == [True, False]
+    assert table.for_staff(1, include_chords=True).idx.tolist() == [0, 2, 3]
+    assert table.for_staff(1) is rh
+    assert table.is_chord.tolist() == [False, False, True, False]
+
+
+def test_table_and_list_inputs_agree(moonlight_events):
+    events = moonlight_events.to_events()
+    for staff, label in ((1, "RH"), (2, "LH")):
+        fingering = decode_monophonic_second_order(moonlight_events, PROFILE_M, DEFAULT_CONFIG, staff)
+        assert fingering == decode_monophonic_second_order(events, PROFILE_M, DEFAULT_CONFIG, staff)
+        assert collect_margin_notes(moonlight_events, fingering, DEFAULT_CONFIG, label) == \
+            collect_margin_notes(events, fingering, DEFAULT_CONFIG, label)
+        assert all(isinstance(k, int) for k in fingering) and np.all(np.diff(sorted(fingering)) > 0)
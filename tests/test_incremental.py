@@ -0,0 +1,97 @@
+import itertools
+import random
+
+import numpy as np
+import pytest
+
+from piano_fingering.bench.synthetic import synthetic_notes
+from piano_fingering.decoding.incremental import IncrementalDecoder, decode_incremental
+from piano_fingering.decoding.second_order_dp import (
+    build_step_costs, decode_monophonic_second_order, fingering_cost, path_cost, sequence_arrays,
+)
+from piano_fingering.pfai import profiling
+from piano_fingering.pfai.config import DEFAULT_CONFIG, PROFILE_M
+from piano_fingering.pfai.types import Event
+
+
+def _stream(n, seed=0):
+    return [Event(i, p, float(i), False, slur, stacc, 1, False)
+            for i, (p, slur, _, stacc) in enumerate(synthetic_notes(n, seed))]
+
+
+def test_matches_serial_optimum_on_moonlight(moonlight_events):
+    for staff in (1, 2):
+        serial = decode_monophonic_second_order(moonlight_events, PROFILE_M, DEFAULT_CONFIG, staff)
+        decoder = IncrementalDecoder(moonlight_events, PROFILE_M, DEFAULT_CONFIG, staff, block=32)
+        incremental = decoder.fingering()
+        assert incremental.keys() == serial.keys()
+        best = fingering_cost(moonlight_events, serial, PROFILE_M, DEFAULT_CONFIG, staff)
+        assert decoder.cost() == pytest.approx(best, abs=1e-9)
+        assert fingering_cost(moonlight_events, incremental, PROFILE_M, DEFAULT_CONFIG, staff) == \
+            pytest.approx(best, abs=1e-9)
+        # Equal-cost optima may be broken differently, as with the segmented engine.
+        assert np.mean([incremental[k] == serial[k] for k in serial]) > 0.99
+
+
+def test_edits_and_pins_equal_a_fresh_decode():
+    rng = random.Random(7)
+    events = {e.idx: e for e in _stream(400, seed=3)}
+    decoder = IncrementalDecoder(list(events.values()), PROFILE_M, DEFAULT_CONFIG, 1, block=16)
+    previous = decoder.fingering()
+    for _ in range(25):
+        k = rng.randrange(len(events))
+        if rng.random() < 0.4:
+            decoder.pin({k: rng.randint(1, 5)})
+        elif rng.random() < 0.2 and decoder.pins():
+            decoder.unpin([rng.choice(list(decoder.pins()))])
+        else:
+            e = events[k]
+            events[k] = Event(e.idx, e.pitch + rng.choice([-7, -2, 1, 5, 12]), e.time, e.tied,
+                              not e.slur, e.staccato, e.staff, e.is_chord)
+            decoder.edit([events[k]])
+        changed = decoder.solve()
+        current = decoder.fingering()
+        assert changed == {k: f for k, f in current.items() if previous[k] != f}
+        fresh = decode_incremental(list(events.values()), PROFILE_M, DEFAULT_CONFIG, 1, decoder.pins(), block=16)
+        assert current == fresh
+        assert all(current[k] == [f] for k, f in decoder.pins().items())
+        previous = current
+
+
+def test_pinned_optimum_on_short_sequences():
+    events = _stream(5, seed=1)
+    assert decode_incremental(events[:1], PROFILE_M, DEFAULT_CONFIG, 1, {0: 4}) == {0: [4]}
+    for n in (2, 3, 5):
+        seq = events[:n]
+        steps = build_step_costs(*sequence_arrays(seq), PROFILE_M, DEFAULT_CONFIG)
+        for pins in ({}, {0: 5}, {n - 1: 2, 0: 1}):
+            decoder = IncrementalDecoder(seq, PROFILE_M, DEFAULT_CONFIG, 1, block=2)
+            decoder.pin(pins)
+            fingers = [f for f, in decoder.fingering().values()]
+            allowed = [[pins[i]] if i in pins else range(1, 6) for i in range(n)]
+            brute = min(path_cost(steps, list(p)) for p in itertools.product(*allowed))
+            assert decoder.cost() == pytest.approx(brute)
+            assert path_cost(steps, fingers) == pytest.approx(brute)
+
+
+def test_update_work_does_not_grow_with_length():
+    cells = []
+    for n in (2_000, 20_000):
+        decoder = IncrementalDecoder(_stream(n), PROFILE_M, DEFAULT_CONFIG, 1)
+        decoder.solve()
+        with profiling.Profiler(memory=False) as prof:
+            decoder.pin({n // 2: 3})
+            decoder.edit([Event(n // 2 + 5, 70, 0.0, False, False, False, 1, False)])
+            decoder.solve()
+        cells.append(prof.report()["counters"]["dp_cells"])
+    assert cells[1] <= 1.5 * cells[0]
+
+
+def test_rejects_unknown_notes_and_fingers():
+    decoder = IncrementalDecoder(_stream(10), PROFILE_M, DEFAULT_CONFIG, 1)
+    with pytest.raises(ValueError):
+        decoder.pin({99: 1})
+    with pytest.raises(ValueError):
+        decoder.pin({3: 6})
+    with pytest.raises(ValueError):
+        decoder.edit([Event(3, 60, 0.0, False, False, False, 2, False)])
@@ -0,0 +1,101 @@
+import itertools
+import json
+
+import pytest
+from music21 import articulations, converter
+
+from piano_fingering.cli.main import app
+from piano_fingering.decoding.kbest import decode_kbest, note_alternatives, with_alternatives
+from piano_fingering.decoding.motif import MotifCache
+from piano_fingering.decoding.second_order_dp import decode_monophonic_second_order, fingering_cost, hand_sequence
+from piano_fingering.io.eventfile import write_event_file
+from piano_fingering.pfai import profiling
+from piano_fingering.pfai.config import DEFAULT_CONFIG, PROFILE_M
+from piano_fingering.pfai.types import Event, EventTable
+
+
+def _events(pitches, slur=()):
+    return [Event(i, p, float(i), False, i in slur, False, 1, False) for i, p in enumerate(pitches)]
+
+
+def test_matches_brute_force_ranking():
+    events = _events([60, 62, 60, 64, 65, 67], slur={3, 4})
+    costs = sorted(fingering_cost(events, {i: [f] for i, f in enumerate(fs)}, PROFILE_M, DEFAULT_CONFIG, 1)
+                   for fs in itertools.product(range(1, 6), repeat=len(events)))
+    paths = decode_kbest(events, PROFILE_M, DEFAULT_CONFIG, 1, k=40)
+    assert [p.cost for p in paths] == pytest.approx(costs[:40], abs=1e-12)
+    assert len({tuple(f for (f,) in p.fingering.values()) for p in paths}) == 40
+    assert paths[0].fingering == decode_monophonic_second_order(events, PROFILE_M, DEFAULT_CONFIG, 1)
+
+
+def test_short_sequences_and_exhaustion():
+    assert [p.fingering[0] for p in decode_kbest(_events([61]), PROFILE_M, DEFAULT_CONFIG, 1, k=3)] == [[2], [3], [4]]
+    assert len(decode_kbest(_events([60, 64]), PROFILE_M, DEFAULT_CONFIG, 1, k=100)) == 25
+    assert decode_kbest(_events([60, 64]), PROFILE_M, DEFAULT_CONFIG, 2) == []
+
+
+def test_moonlight_k_best_is_lazy(moonlight_events):
+    k = 8
+    with profiling.Profiler(memory=False) as prof:
+        paths = decode_kbest(moonlight_events, PROFILE_M, DEFAULT_CONFIG, 2, k=k)
+    assert len(paths) == k
+    assert paths[0].fingering == decode_monophonic_second_order(moonlight_events, PROFILE_M, DEFAULT_CONFIG, 2)
+    assert [p.cost for p in paths] == sorted(p.cost for p in paths)
+    for p in paths:
+        assert fingering_cost(moonlight_events, p.fingering, PROFILE_M, DEFAULT_CONFIG, 2) == pytest.approx(p.cost)
+    # Only the nodes the k paths deviate through are expanded, not the whole 25 x N trellis.
+    assert prof.report()["counters"]["kbest_nodes"] <= k * len(hand_sequence(moonlight_events, 2)) + 1
+
+    alternatives = note_alternatives(paths)
+    assert all(fingers[0] == paths[0].fingering[i][0] for i, fingers in alternatives.items())
+    assert any(len(fingers) > 1 for fingers in alternatives.values())
+
+
+@pytest.mark.parametrize("backend", ["music21", "xml"])
+def test_cli_writes_alternates(two_staff_path, tmp_path, backend):
+    plain, alt = tmp_path / "plain.musicxml", tmp_path / "alt.musicxml"
+    base = ["--infile", str(two_staff_path), "--backend", backend, "--no-cache"]
+    app(base + ["--outfile", str(plain)])
+    app(base + ["--outfile", str(alt), "--alternatives", "4"])
+
+    def marks(path):
+        out = []
+        for n in converter.parse(str(path), forceSource=True).recurse().notes:
+            out += [(a.fingerNumber, bool(a.alternate)) for a in n.articulations if isinstance(a, articulations.Fingering)]
+        return out
+
+    assert [m for m in marks(alt) if not m[1]] == marks(plain)
+    # music21 exports a single fingering per note; the streaming writer adds the alternates.
+    assert any(m[1] for m in marks(alt)) == (backend == "xml")
+
+
+def test_decode_subcommand_reports_alternatives(tmp_path, capsys):
+    events = tmp_path / "events.json"
+    write_event_file(str(events), EventTable.from_events(_events([60, 62, 64, 65, 67, 65, 64, 62])))
+    app(["decode", "--events", str(events), "--staff", "RH", "--alternatives", "3"])
+    result = json.loads(capsys.readouterr().out)
+    assert result["alternatives"]
+    assert all(result["fingerings"][k] not in alts for k, alts in result["alternatives"].items())
+
+
+def test_alternatives_start_from_the_engine_fingering(moonlight_events):
+    motif = decode_monophonic_second_order(moonlight_events, PROFILE_M, DEFAULT_CONFIG, 1, engine="motif",
+                                           cache=MotifCache())
+    numpy = decode_monophonic_second_order(moonlight_events, PROFILE_M, DEFAULT_CONFIG, 1)
+    assert motif != numpy  # an equal-cost optimum, tie broken differently
+    # The engine's fingering is the best path: its tie with numpy's is no alternative.
+    assert with_alternatives(motif, moonlight_events, PROFILE_M, DEFAULT_CONFIG, 1, 1) == motif
+    extended = with_alternatives(motif, moonlight_events, PROFILE_M, DEFAULT_CONFIG, 1, 2)
+    assert all(fingers[:1] == motif[k] for k, fingers in extended.items())
+    assert sum(len(fingers) > 1 for fingers in extended.values()) <= 2
+
+
+def test_alternatives_reject_the_chord_engine(two_staff_path, tmp_path):
+    with pytest.raises(SystemExit):
+        app(["--infile", str(two_staff_path), "--outfile", str(tmp_path / "out.musicxml"), "--no-cache",
+             "--engine", "chord", "--alternatives", "2"])
+    events = tmp_path / "events.json"
+    write_event_file(str(events), EventTable.from_events(_events([60, 62, 64])))
+    with pytest.raises(SystemExit):
+        app(["decode", "--events", str(events), "--engine", "chord", "--alternatives", "2"])
+    assert not (tmp_path / "out.musicxml").exists()
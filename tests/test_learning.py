@@ -0,0 +1,93 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+
+import numpy as np
+import pytest
+
+from piano_fingering.cli.main import app
+from piano_fingering.decoding.second_order_dp import (
+    build_step_costs,
+    decode_monophonic_second_order,
+    fingering_cost,
+    hand_sequence,
+    sequence_arrays,
+)
+from piano_fingering.io.musicxml_stream import read_annotated_events
+from piano_fingering.pfai.config import DEFAULT_CONFIG, PROFILE_M, PROFILE_S, load_config, save_config
+from piano_fingering.rules.costs import linear_features, parameter_vector, with_parameters
+from piano_fingering.rules.learning import load_corpus, train
+
+
+def test_features_reproduce_costs(moonlight_events):
+    w = parameter_vector(PROFILE_S, DEFAULT_CONFIG)
+    for staff in (1, 2):
+        seq = hand_sequence(moonlight_events, staff)
+        feats = linear_features(*sequence_arrays(seq), DEFAULT_CONFIG)
+        steps = build_step_costs(*sequence_arrays(seq), PROFILE_S, DEFAULT_CONFIG)
+        assert np.allclose(feats.trans @ w, steps.trans, atol=1e-12)
+        assert np.allclose(feats.roll @ w, steps.roll) and np.allclose(feats.start @ w, steps.start)
+        assert np.array_equal(feats.window, steps.window)
+        fingering = decode_monophonic_second_order(seq, PROFILE_S, DEFAULT_CONFIG, staff)
+        phi = feats.path_features([fingering[k][0] for k in seq.idx.tolist()])
+        assert phi @ w == pytest.approx(fingering_cost(seq, fingering, PROFILE_S, DEFAULT_CONFIG, staff))
+
+
+def test_parameters_round_trip(tmp_path):
+    w = np.arange(14, dtype=float)
+    profile, cfg = with_parameters(PROFILE_S, DEFAULT_CONFIG, w)
+    assert np.array_equal(parameter_vector(profile, cfg), w)
+    assert (profile.name, profile.max_span_semitones) == ("S", PROFILE_S.max_span_semitones)
+
+    path = tmp_path / "weights.json"
+    save_config(str(path), profile, cfg)
+    loaded = load_config(str(path), PROFILE_M)
+    assert loaded[1] == cfg and loaded[0] == replace(profile, name="M", easy_span_semitones=10, max_span_semitones=12)
+    doc = json.loads(path.read_text())
+    doc["model_config"]["no_such_weight"] = 1.0
+    path.write_text(json.dumps(doc))
+    with pytest.raises(ValueError, match="no_such_weight"):
+        load_config(str(path), PROFILE_M)
+    del doc["model_config"]["no_such_weight"]
+    doc["model_config"]["neighbor_turn_max_interval"] = 3.0
+    path.write_text(json.dumps(doc))
+    assert load_config(str(path), PROFILE_M)[1].neighbor_turn_max_interval == 3
+    for bad in (2.7, "2", None):
+        doc["model_config"]["neighbor_turn_max_interval"] = bad
+        path.write_text(json.dumps(doc))
+        with pytest.raises(ValueError, match="neighbor_turn_max_interval"):
+            load_config(str(path), PROFILE_M)
+
+
+def test_reads_reference_fingerings(fingered_corpus, teacher):
+    events, reference = read_annotated_events(str(fingered_corpus[0]))
+    assert reference == decode_monophonic_second_order(events, *teacher, 1)
+    examples = load_corpus(fingered_corpus)
+    assert [len(ex.reference) for ex in examples] == [150, 50, 150, 50]
+
+
+def test_training_moves_towards_the_teacher(fingered_corpus):
+    examples = load_corpus(fingered_corpus)
+    result = train(examples, PROFILE_M, DEFAULT_CONFIG, epochs=8)
+    assert result.final.mistakes < result.history[0].mistakes / 2
+    # Epochs are batch updates summed in corpus order, so a pool gives the same weights.
+    with ThreadPoolExecutor(2) as pool:
+        pooled = train(examples, PROFILE_M, DEFAULT_CONFIG, epochs=8, executor=pool)
+    assert np.array_equal(pooled.weights, result.weights)
+    assert pooled.history == result.history
+
+
+def test_train_cli_writes_a_loadable_config(fingered_corpus, two_staff_path, tmp_path, capsys):
+    config = tmp_path / "fitted.json"
+    assert app(["train", str(fingered_corpus[0].parent), "--out", str(config), "--epochs", "3"]) == 0
+    assert "agreement" in capsys.readouterr().out
+    profile, cfg = load_config(str(config), PROFILE_M)
+    assert cfg != DEFAULT_CONFIG
+
+    out = tmp_path / "out.musicxml"
+    app(["--infile", str(two_staff_path), "--outfile", str(out), "--backend", "xml", "--config", str(config)])
+    _, fingered = read_annotated_events(str(out))
+    events, _ = read_annotated_events(str(two_staff_path))
+    expected = {**decode_monophonic_second_order(events, profile, cfg, 1),
+                **decode_monophonic_second_order(events, profile, cfg, 2)}
+    assert fingered == expected
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from music21 import converter, expressions, stream
+
+from piano_fingering.annotate.notes import collect_margin_notes
+from piano_fingering.cli.main import annotate_file
+from piano_fingering.decoding.second_order_dp import decode_monophonic_second_order
+from piano_fingering.io.musicxml import MeasureIndex, ScorePipeline, _staff_number, write_fingerings_and_notes
+from piano_fingering.io.musicxml_stream import read_events, write_fingerings_xml
+from piano_fingering.pfai.config import DEFAULT_CONFIG, PROFILE_M
+
+
+def _placed(path):
+    """(text, staff, measure number, offset in the measure) of every text expression in ``path``."""
+    score = converter.parse(str(path), forceSource=True)
+    out = []
+    for part in score.parts:
+        for measure in part.getElementsByClass(stream.Measure):
+            for te in measure.recurse().getElementsByClass(expressions.TextExpression):
+                out.append((te.content, _staff_number(part), measure.number, float(te.offset)))
+    return sorted(out)
+
+
+def test_event_times_are_part_offsets(two_staff_path, moonlight_path, moonlight_events):
+    events = read_events(str(two_staff_path))
+    assert events.for_staff(1).time.tolist() == [0.0, 0.5, 1.0, 1.5, 2.0, 4.0, 5.0, 6.0, 7.0]
+    assert events.for_staff(2).time.tolist() == [0.0, 3.0, 4.0, 6.0]
+    assert np.array_equal(read_events(str(moonlight_path)).time, moonlight_events.time)
+
+
+def test_measure_index():
+    score = converter.parse("tinyNotation: 4/4 c4 d e f g1 a2 b")
+    index = MeasureIndex(score)
+    assert [(m.number, off) for m, off in map(index.locate, [0.0, 3.5, 4.0, 9.0, 100.0])] == \
+        [(1, 0.0), (1, 3.5), (2, 0.0), (3, 1.0), (3, 92.0)]
+
+
+@pytest.mark.parametrize("backend", ["music21", "xml"])
+def test_margin_notes_land_in_their_bar_and_staff(two_staff_path, tmp_path, backend):
+    notes = [(5.0, "RH bar 2", 1), (6.0, "LH bar 2", 2), (1.5, "bar 1")]
+    out = tmp_path / "out.musicxml"
+    if backend == "xml":
+        write_fingerings_xml(str(two_staff_path), str(out), {}, notes)
+    else:
+        write_fingerings_and_notes(str(two_staff_path), str(out), {}, notes)
+    assert _placed(out) == [("LH bar 2", 2, 2, 2.0), ("RH bar 2", 1, 2, 1.0), ("bar 1", 1, 1, 1.5)]
+
+
+def test_backends_agree_on_moonlight(moonlight_path, moonlight_events, tmp_path):
+    placed = {}
+    for backend in ("music21", "xml"):
+        out = tmp_path / f"{backend}.musicxml"
+        annotate_file(str(moonlight_path), str(out), PROFILE_M, DEFAULT_CONFIG, backend=backend)
+        placed[backend] = [p for p in _placed(out) if p[0].endswith(("(RH)", "(LH)"))]
+    assert placed["music21"] == placed["xml"]
+
+    # Every note sits in the bar of the event it was written for.
+    pipeline = ScorePipeline(str(moonlight_path))
+    pipeline.extract()
+    expected = []
+    for staff, label in ((1, "RH"), (2, "LH")):
+        fingering = decode_monophonic_second_order(moonlight_events, PROFILE_M, DEFAULT_CONFIG, staff)
+        by_time = {float(e.time): e.idx for e in moonlight_events.for_staff(staff)}
+        for t, text in collect_margin_notes(moonlight_events, fingering, DEFAULT_CONFIG, label):
+            measure = pipeline.note_refs[by_time[t]].measureNumber
+            expected.append((text, staff, measure))
+    assert sorted(p[:3] for p in placed["xml"]) == sorted(expected)
@@ -0,0 +1,98 @@
+import random
+
+import numpy as np
+import pytest
+
+from piano_fingering.decoding.motif import MotifCache, motif_windows, step_signatures
+from piano_fingering.decoding.second_order_dp import decode_monophonic_second_order, fingering_cost, sequence_arrays
+from piano_fingering.pfai import profiling
+from piano_fingering.pfai.config import DEFAULT_CONFIG, PROFILE_M
+from piano_fingering.pfai.types import Event
+
+
+def _events(pitches):
+    return [Event(i, p, float(i), False, False, False, 1, False) for i, p in enumerate(pitches)]
+
+
+def _cost(events, fingering):
+    return fingering_cost(events, fingering, PROFILE_M, DEFAULT_CONFIG, 1)
+
+
+def test_matches_serial_optimum_on_moonlight(moonlight_events):
+    cache = MotifCache()
+    for staff in (1, 2):
+        serial = decode_monophonic_second_order(moonlight_events, PROFILE_M, DEFAULT_CONFIG, staff)
+        motif = decode_monophonic_second_order(moonlight_events, PROFILE_M, DEFAULT_CONFIG, staff, engine="motif",
+                                               cache=cache)
+        assert motif.keys() == serial.keys()
+        assert fingering_cost(moonlight_events, motif, PROFILE_M, DEFAULT_CONFIG, staff) == pytest.approx(
+            fingering_cost(moonlight_events, serial, PROFILE_M, DEFAULT_CONFIG, staff), abs=1e-9)
+        assert np.mean([motif[k] == serial[k] for k in serial]) > 0.99
+        with profiling.Profiler(memory=False) as prof:
+            again = decode_monophonic_second_order(moonlight_events, PROFILE_M, DEFAULT_CONFIG, staff,
+                                                   engine="motif", cache=cache)
+        assert again == motif
+        counters = prof.report()["counters"]
+        assert counters["motif_hits"] > 0 and "motif_misses" not in counters
+
+
+def test_transposed_figures_share_signatures():
+    figure = [0, 4, 7, 12, 7, 4]
+    c_major, f_major, c_sharp = ([root + x for x in figure] for root in (60, 65, 61))
+    sig = lambda ps: step_signatures(*sequence_arrays(_events(ps)), DEFAULT_CONFIG)
+    assert np.array_equal(sig(c_major), sig(f_major))
+    assert np.array_equal(sig(c_major), sig([p + 12 for p in c_major]))
+    # Same intervals, different black/white geometry: costs differ, so must the signatures.
+    assert not np.array_equal(sig(c_major), sig(c_sharp))
+
+
+def test_repeated_transposed_passage_is_memoized_and_optimal():
+    roots = [60, 65, 67, 62, 64, 57, 55, 60]
+    pitches = [roots[k % len(roots)] + x for k in range(120) for x in (0, 4, 7, 12, 7, 4)]
+    events = _events(pitches)
+    serial = decode_monophonic_second_order(events, PROFILE_M, DEFAULT_CONFIG, 1)
+    with profiling.Profiler(memory=False) as prof:
+        motif = decode_monophonic_second_order(events, PROFILE_M, DEFAULT_CONFIG, 1, engine="motif",
+                                               cache=MotifCache())
+    counters = prof.report()["counters"]
+    assert counters["motif_hits"] > 10 * counters["motif_misses"]
+    assert _cost(events, motif) == pytest.approx(_cost(events, serial), abs=1e-9)
+
+
+def test_decode_outgrowing_the_cache():
+    # More memoized windows than the cache holds: the backtrace meets windows evicted by the forward pass.
+    rng = random.Random(5)
+    figures = [[rng.randrange(48, 84) for _ in range(24)] for _ in range(10)]
+    events = _events([p for figure in figures for _ in range(2) for p in figure])
+    cache = MotifCache(max_entries=2)
+    motif = decode_monophonic_second_order(events, PROFILE_M, DEFAULT_CONFIG, 1, engine="motif", cache=cache)
+    serial = decode_monophonic_second_order(events, PROFILE_M, DEFAULT_CONFIG, 1)
+    assert len(cache) == 2
+    assert _cost(events, motif) == pytest.approx(_cost(events, serial), abs=1e-9)
+
+
+@pytest.mark.parametrize("window", [1, 2, 3, 8])
+def test_small_windows_stay_optimal(window):
+    rng = random.Random(window)
+    for n in (1, 2, 3, 7, 40):
+        pitches = [rng.choice([60, 62, 64, 65, 67]) for _ in range(n)]
+        events = _events(pitches)
+        reference = decode_monophonic_second_order(events, PROFILE_M, DEFAULT_CONFIG, 1, engine="python")
+        motif = decode_monophonic_second_order(events, PROFILE_M, DEFAULT_CONFIG, 1, engine="motif",
+                                               window=window, cache=MotifCache())
+        assert _cost(events, motif) == pytest.approx(_cost(events, reference), abs=1e-9)
+
+
+def test_without_repeats_equals_numpy_engine():
+    rng = random.Random(3)
+    events = _events([rng.randrange(40, 90) for _ in range(300)])
+    assert decode_monophonic_second_order(events, PROFILE_M, DEFAULT_CONFIG, 1, engine="motif", cache=MotifCache()) == \
+        decode_monophonic_second_order(events, PROFILE_M, DEFAULT_CONFIG, 1)
+
+
+def test_windows_cover_every_step():
+    sig = np.arange(1000) % 7
+    windows = motif_windows(sig, 8)
+    assert windows[0][0] == 2 and windows[-1][1] == 1002
+    assert all(a < b <= a + 32 for a, b in windows)
+    assert all(w[1] == v[0] for w, v in zip(windows, windows[1:]))
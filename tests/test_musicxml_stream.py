@@ -0,0 +1,63 @@
+import sys
+import tracemalloc
+
+from music21 import articulations, converter
+
+from piano_fingering.cli import main as cli
+from piano_fingering.io.musicxml import ScorePipeline, _iter_events
+from piano_fingering.io.musicxml_stream import read_events, read_events_with_ordinals, write_fingerings_xml
+
+
+def _fingerings(path):
+    """Fingerings per event; music21 keeps a chord's fingerings on the chord, in member order."""
+    score = converter.parse(str(path), forceSource=True)
+    found, member = {}, 0
+    for e, n, start in _iter_events(score):
+        member = 0 if start else member + 1
+        fingers = [a.fingerNumber for a in n.articulations if isinstance(a, articulations.Fingering)]
+        found[e.idx] = fingers[member:member + 1] if e.is_chord else fingers
+    return found
+
+
+def test_stream_reader_matches_music21(two_staff_path, moonlight_path, moonlight_events):
+    assert read_events(str(two_staff_path)) == ScorePipeline(str(two_staff_path)).extract()
+    assert read_events(str(moonlight_path)) == moonlight_events
+
+
+def test_staff_numbers_follow_part_staves(two_staff_path):
+    events = read_events(str(two_staff_path))
+    assert [e.staff for e in events] == [1] * 11 + [2] * 4
+    assert [e.pitch for e in events if e.staff == 2] == [48, 43, 48, 52]
+
+
+def test_stream_reader_memory_is_flat(moonlight_path):
+    tracemalloc.start()
+    try:
+        read_events_with_ordinals(str(moonlight_path))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert peak < 1.5 * moonlight_path.stat().st_size
+
+
+def test_direct_writer_places_fingerings_on_the_right_notes(two_staff_path, tmp_path):
+    events = read_events(str(two_staff_path))
+    fingering = {e.idx: [1 + e.idx % 5] for e in events}
+    out = tmp_path / "direct.musicxml"
+    write_fingerings_xml(str(two_staff_path), str(out), fingering, [(0.5, "Aim 3 (RH)")])
+
+    assert read_events(str(out)) == events
+    assert _fingerings(out) == fingering
+    text = out.read_text()
+    assert text.count("<words>Aim 3 (RH)</words>") == 1
+    assert text.startswith('<?xml version="1.0" encoding="UTF-8"?>')
+
+
+def test_cli_xml_backend(two_staff_path, tmp_path, monkeypatch):
+    out = tmp_path / "cli.musicxml"
+    monkeypatch.setattr(sys, "argv", ["piano-fingering", "--infile", str(two_staff_path),
+                                      "--outfile", str(out), "--backend", "xml"])
+    cli.app()
+    events = read_events(str(two_staff_path))
+    found = _fingerings(out)
+    assert all(len(found[e.idx]) == (0 if e.is_chord else 1) for e in events)
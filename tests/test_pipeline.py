@@ -0,0 +1,43 @@
+import sys
+
+from music21 import converter
+
+from piano_fingering.cli import main as cli
+from piano_fingering.io import musicxml
+from piano_fingering.io.musicxml import ScorePipeline
+
+
+def _count_parses(monkeypatch):
+    calls = []
+    real_parse = converter.parse
+
+    def counting_parse(*args, **kwargs):
+        calls.append(args[0])
+        return real_parse(*args, **kwargs)
+
+    monkeypatch.setattr(musicxml.converter, "parse", counting_parse)
+    return calls
+
+
+def test_pipeline_parses_once_and_times_stages(two_staff_path, tmp_path, monkeypatch):
+    calls = _count_parses(monkeypatch)
+    pipeline = ScorePipeline(str(two_staff_path))
+    events = pipeline.extract()
+    assert all(e.pitch in [p.midi for p in pipeline.note_refs[e.idx].pitches] for e in events)
+
+    pipeline.annotate({e.idx: [1] for e in events}, [(0.0, "Move early (RH)")])
+    pipeline.write(str(tmp_path / "out.musicxml"))
+
+    assert pipeline.parse_count == 1 and len(calls) == 1
+    assert set(pipeline.timings) == {"parse", "extract", "annotate", "export"}
+    assert all(t >= 0.0 for t in pipeline.timings.values())
+    assert ">1</fingering>" in (tmp_path / "out.musicxml").read_text()
+
+
+def test_cli_parses_input_once(two_staff_path, tmp_path, monkeypatch):
+    calls = _count_parses(monkeypatch)
+    out = tmp_path / "cli.musicxml"
+    monkeypatch.setattr(sys, "argv", ["piano-fingering", "--infile", str(two_staff_path), "--outfile", str(out)])
+    cli.app()
+    assert calls == [str(two_staff_path)]
+    assert out.read_text().count("</fingering>") == 13
@@ -0,0 +1,49 @@
+import json
+import pstats
+
+import pytest
+
+from piano_fingering.cli.main import annotate_file, app
+from piano_fingering.pfai import profiling
+from piano_fingering.pfai.config import DEFAULT_CONFIG, PROFILE_M
+
+
+@pytest.mark.parametrize("backend", ["music21", "xml"])
+def test_profiler_records_stages_and_counters(tmp_path, two_staff_path, backend):
+    with profiling.Profiler() as prof:
+        annotate_file(str(two_staff_path), str(tmp_path / "out.musicxml"), PROFILE_M, DEFAULT_CONFIG, backend=backend)
+    report = json.loads(prof.to_json())
+    assert {"extract", "decode", "margin_notes", "export"} <= set(report["stages"])
+    assert all(s["calls"] == 1 and s["seconds"] >= 0 and s["peak_bytes"] >= 0 for s in report["stages"].values())
+    counters = report["counters"]
+    assert counters["events_staff1"] == 11 and counters["events_staff2"] == 4
+    assert counters["decoded_notes"] == 13
+    assert counters["dp_cells"] == (25 + 125 * 7) + (25 + 125 * 2)
+    assert counters["cost_table_lookups"] == 8 + 3
+    assert counters["measures_touched"] >= 2
+
+
+def test_nested_stages_and_inactive_hooks():
+    profiling.count("ignored")  # no active profiler: no-op
+    with profiling.stage("ignored"):
+        pass
+    with profiling.Profiler() as prof:
+        with profiling.stage("outer"):
+            with profiling.stage("inner"):
+                block = bytearray(1 << 20)
+            del block
+        with profiling.stage("inner"):
+            profiling.count("things", 3)
+    assert profiling.active_profiler() is None
+    assert prof.stages["inner"]["calls"] == 2
+    assert prof.stages["outer"]["peak_bytes"] >= prof.stages["inner"]["peak_bytes"] >= 1 << 20
+    assert prof.counters == {"things": 3}
+
+
+def test_cli_profile_json_and_cprofile(tmp_path, two_staff_path):
+    out = str(tmp_path / "out.musicxml")
+    app(["--infile", str(two_staff_path), "--outfile", out, "--backend", "xml", "--profile", str(tmp_path / "p.json")])
+    assert json.loads((tmp_path / "p.json").read_text())["counters"]["decoded_notes"] == 13
+    app(["--infile", str(two_staff_path), "--outfile", out, "--backend", "xml",
+         "--profile", str(tmp_path / "p.prof"), "--profile-format", "cprofile"])
+    assert pstats.Stats(str(tmp_path / "p.prof")).total_calls > 0
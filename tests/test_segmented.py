@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from piano_fingering.decoding.second_order_dp import decode_monophonic_second_order, fingering_cost
+from piano_fingering.decoding.segmented import split_segments
+from piano_fingering.pfai.config import DEFAULT_CONFIG, PROFILE_M
+from piano_fingering.pfai.types import Event
+
+
+@pytest.mark.parametrize("options", [{"segment_length": 64}, {"segment_length": 5}, {"segment_length": 400, "workers": 2}])
+def test_segmented_matches_serial_optimum_on_moonlight(moonlight_events, options):
+    for staff in (1, 2):
+        serial = decode_monophonic_second_order(moonlight_events, PROFILE_M, DEFAULT_CONFIG, staff)
+        parallel = decode_monophonic_second_order(moonlight_events, PROFILE_M, DEFAULT_CONFIG, staff,
+                                                  engine="segmented", **options)
+        assert parallel.keys() == serial.keys()
+        assert fingering_cost(moonlight_events, parallel, PROFILE_M, DEFAULT_CONFIG, staff) == pytest.approx(
+            fingering_cost(moonlight_events, serial, PROFILE_M, DEFAULT_CONFIG, staff), abs=1e-9)
+        # Equal-cost optima may be broken differently; they are rare.
+        agree = np.mean([parallel[k] == serial[k] for k in serial])
+        assert agree > 0.99
+
+
+def test_short_sequences():
+    events = [Event(i, p, float(i), False, False, False, 1, False) for i, p in enumerate([60, 64, 67])]
+    for n in (1, 2, 3):
+        assert decode_monophonic_second_order(events[:n], PROFILE_M, DEFAULT_CONFIG, 1, engine="segmented",
+                                              segment_length=1) == \
+            decode_monophonic_second_order(events[:n], PROFILE_M, DEFAULT_CONFIG, 1)
+
+
+def test_split_prefers_large_leaps():
+    pitch = np.array([60, 62] * 10 + [90] + [60, 62] * 10)
+    segments = split_segments(pitch, DEFAULT_CONFIG, target=16)
+    assert segments[0] == (2, 20)
+    assert segments[-1][1] == len(pitch)
+    assert all(a < b for a, b in segments) and all(s[1] == t[0] for s, t in zip(segments, segments[1:]))
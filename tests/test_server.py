@@ -0,0 +1,114 @@
+import asyncio
+import http.client
+import json
+import socket
+import threading
+
+import pytest
+
+from piano_fingering.io.eventfile import table_to_json
+from piano_fingering.io.musicxml_stream import read_events
+from piano_fingering.server.app import FingeringServer, LatencyHistogram
+
+
+@pytest.fixture
+def server(request):
+    options = getattr(request, "param", {})
+    srv = FingeringServer(port=0, workers=1, **options)
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(srv.start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield srv
+    asyncio.run_coroutine_threadsafe(srv.close(), loop).result(10)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(10)
+    loop.close()
+
+
+def _request(srv, method, path, body=None, content_type="application/json"):
+    conn = http.client.HTTPConnection("127.0.0.1", srv.port, timeout=30)
+    conn.request(method, path, body=body, headers={"Content-Type": content_type} if body is not None else {})
+    resp = conn.getresponse()
+    data = resp.read()
+    conn.close()
+    return resp.status, resp.getheader("Content-Type"), data
+
+
+def test_fingerings_from_events_and_musicxml_agree(server, two_staff_path):
+    xml = two_staff_path.read_bytes()
+    events = read_events(str(two_staff_path))
+    status, _, from_json = _request(server, "POST", "/fingerings?staff=both", json.dumps(table_to_json(events)))
+    assert status == 200
+    status, _, from_xml = _request(server, "POST", "/fingerings", xml, "application/vnd.recordare.musicxml+xml")
+    assert status == 200
+    from_json, from_xml = json.loads(from_json), json.loads(from_xml)
+    assert from_json == from_xml
+    assert from_json["events"] == 15 and len(from_json["fingerings"]) == 13
+    assert any("Move early" in n["text"] for n in from_json["margin_notes"])
+
+    status, _, rh = _request(server, "POST", "/fingerings?staff=RH&hand_profile=xl",
+                             json.dumps({"events": [{"pitch": p} for p in (60, 62, 64, 65, 67)]}))
+    assert status == 200 and list(json.loads(rh)["fingerings"]) == ["0", "1", "2", "3", "4"]
+
+
+def test_annotate_returns_fingered_score(server, two_staff_path, tmp_path):
+    status, content_type, body = _request(server, "POST", "/annotate", two_staff_path.read_bytes(), "application/xml")
+    assert status == 200 and content_type == "application/vnd.recordare.musicxml+xml"
+    assert body.count(b"</fingering>") == 13
+
+
+def test_errors_metrics_and_queue_limit(server):
+    assert _request(server, "GET", "/nope")[0] == 404
+    assert _request(server, "GET", "/fingerings")[0] == 405
+    assert _request(server, "POST", "/fingerings", "{not json")[0] == 400
+    assert _request(server, "POST", "/fingerings", json.dumps({"events": [{}]}))[0] == 400
+    assert _request(server, "POST", "/fingerings?engine=fast", "{}")[0] == 400
+    assert _request(server, "POST", "/fingerings", b"<score-partwise", "application/xml")[0] == 400
+
+    server._inflight = server.capacity  # every worker and queue slot taken
+    status, _, _ = _request(server, "POST", "/fingerings", json.dumps({"pitch": [60]}))
+    server._inflight = 0
+    assert status == 503
+
+    status, _, body = _request(server, "GET", "/metrics")
+    metrics = json.loads(body)
+    assert metrics["rejected"] == 1 and metrics["status"]["503"] == 1 and metrics["status"]["400"] == 4
+    assert metrics["latency"]["/fingerings"]["count"] == 6
+    assert sum(metrics["latency"]["/fingerings"]["buckets_ms"].values()) == 6
+
+
+@pytest.mark.parametrize("length, body", [("12x", b"{}"), ("-1", b"{}"), ("10", b"{}")])
+def test_bad_content_length_is_a_client_error(server, length, body):
+    with socket.create_connection(("127.0.0.1", server.port), timeout=30) as sock:
+        sock.sendall(b"POST /fingerings HTTP/1.1\r\nContent-Type: application/json\r\n"
+                     b"Content-Length: " + length.encode() + b"\r\n\r\n" + body)
+        sock.shutdown(socket.SHUT_WR)  # a body shorter than declared ends at EOF
+        response = sock.makefile("rb").read()
+    assert response.startswith(b"HTTP/1.1 400 ")
+
+
+def test_unix_socket(tmp_path):
+    path = str(tmp_path / "fingering.sock")
+
+    async def scenario():
+        srv = FingeringServer(unix_path=path, workers=1)
+        await srv.start()
+        try:
+            reader, writer = await asyncio.open_unix_connection(path)
+            writer.write(b"GET /health HTTP/1.1\r\nHost: x\r\n\r\n")
+            await writer.drain()
+            return await reader.read()
+        finally:
+            await srv.close()
+
+    response = asyncio.run(scenario())
+    assert response.startswith(b"HTTP/1.1 200 OK") and response.endswith(b'{"status": "ok"}')
+
+
+def test_latency_histogram_buckets():
+    h = LatencyHistogram((10, 100))
+    for ms in (1, 5, 50, 500):
+        h.observe(ms)
+    assert h.to_dict()["buckets_ms"] == {"le_10": 2, "le_100": 1, "inf": 1}
+    assert h.quantile(0.5) == 10.0 and h.quantile(1.0) is None
@@ -0,0 +1,78 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+from music21 import converter
+
+from piano_fingering.cli.main import app
+from piano_fingering.decoding.second_order_dp import decode_monophonic_second_order, fingering_cost, hand_sequence
+from piano_fingering.decoding.streaming import FixedLagDecoder, decode_stream, decode_stream_async, lag_agreement
+from piano_fingering.io.musicxml_stream import read_events
+from piano_fingering.io.replay import read_replay_events, replay, replay_async
+from piano_fingering.pfai import profiling
+from piano_fingering.pfai.config import DEFAULT_CONFIG, PROFILE_M
+
+
+def test_full_lag_reproduces_the_offline_optimum(moonlight_events):
+    seq = list(hand_sequence(moonlight_events, 1))
+    streamed = dict(decode_stream(seq, PROFILE_M, DEFAULT_CONFIG, 1, lag=len(seq)))
+    offline = decode_monophonic_second_order(moonlight_events, PROFILE_M, DEFAULT_CONFIG, 1)
+    assert {k: [f] for k, f in streamed.items()} == offline
+
+
+def test_commits_after_the_lag_with_constant_work(moonlight_events):
+    seq = list(hand_sequence(moonlight_events, 2))[:600]
+    lag = 5
+    decoder = FixedLagDecoder(PROFILE_M, DEFAULT_CONFIG, lag)
+    committed = []
+    for t, event in enumerate(seq):
+        with profiling.Profiler(memory=False) as prof:
+            out = decoder.push(event)
+        assert [k for k, _ in out] == ([seq[t - lag].idx] if t >= lag else [])
+        assert prof.report()["counters"].get("dp_cells", 0) <= 125
+        assert len(decoder._back) <= lag
+        committed += out
+    committed += decoder.flush()
+    assert [k for k, _ in committed] == [e.idx for e in seq]
+    # Committed fingers always form one path of the model, never worse than a finite detour.
+    fingering = {k: [f] for k, f in committed}
+    optimum = decode_monophonic_second_order(seq, PROFILE_M, DEFAULT_CONFIG, 2)
+    cost = fingering_cost(seq, fingering, PROFILE_M, DEFAULT_CONFIG, 2)
+    assert np.isfinite(cost) and cost >= fingering_cost(seq, optimum, PROFILE_M, DEFAULT_CONFIG, 2) - 1e-9
+
+
+def test_lag_agreement_reaches_the_optimum(moonlight_events):
+    table = moonlight_events.for_staff(1)[:300]
+    report = lag_agreement(table, PROFILE_M, DEFAULT_CONFIG, [0, 4, 300], 1)
+    assert report[300].agreement == 1.0 and report[300].cost_gap == pytest.approx(0.0, abs=1e-9)
+    assert all(r.cost_gap >= -1e-9 and 0.0 <= r.agreement <= 1.0 for r in report.values())
+    with pytest.raises(ValueError):
+        FixedLagDecoder(PROFILE_M, DEFAULT_CONFIG, -1)
+
+
+def test_async_stream_matches_sync(two_staff_path):
+    async def collect():
+        return [c async for c in decode_stream_async(replay_async(str(two_staff_path)), PROFILE_M, DEFAULT_CONFIG, 1, 2)]
+
+    assert asyncio.run(collect()) == list(decode_stream(replay(str(two_staff_path)), PROFILE_M, DEFAULT_CONFIG, 1, 2))
+
+
+def test_midi_replay_and_cli(two_staff_path, tmp_path, capsys):
+    midi = tmp_path / "two_staff.mid"
+    converter.parse(str(two_staff_path)).write("midi", fp=str(midi))
+    events = read_replay_events(str(midi))
+    xml_events = read_events(str(two_staff_path))
+    assert {e.staff for e in events} == {1, 2}
+    # MIDI has no ties: the tied C3 pair becomes one note.
+    assert [e.pitch for e in events if e.staff == 2] == [48, 43, 52]
+    assert [e.pitch for e in events if e.staff == 1] == [e.pitch for e in xml_events if e.staff == 1]
+
+    app(["stream", "--infile", str(midi), "--lag", "2"])
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert len(lines) == sum(not e.is_chord for e in events)
+    assert all(1 <= line["finger"] <= 5 for line in lines)
+
+    app(["stream", "--infile", str(two_staff_path), "--lags", "0,2,16"])
+    rows = capsys.readouterr().out.splitlines()
+    assert rows[0] == "staff,lag,agreement,cost_gap" and len(rows) == 7
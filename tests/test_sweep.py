@@ -0,0 +1,48 @@
+import csv
+from dataclasses import replace
+
+import pytest
+
+from piano_fingering.cli.main import app
+from piano_fingering.cli.sweep import expand_grid, parse_grid_axis
+from piano_fingering.decoding.batched import decode_batched
+from piano_fingering.decoding.second_order_dp import decode_monophonic_second_order, fingering_cost
+from piano_fingering.pfai.config import DEFAULT_CONFIG, PROFILE_L, PROFILE_M, PROFILE_S, PROFILE_XL
+
+
+def test_batched_decode_equals_individual_decodes(moonlight_events):
+    configs = [
+        (replace(profile, rollover_bonus_121=r121, jump_bonus_1_to_4=j14), replace(DEFAULT_CONFIG, weight_finger_delta=w))
+        for profile in (PROFILE_S, PROFILE_XL)
+        for r121 in (-1.0, 0.0)
+        for j14 in (-0.8, 0.2)
+        for w in (0.05, 0.3)
+    ]
+    for staff in (1, 2):
+        results = decode_batched(moonlight_events, configs, staff, chunk=100)
+        for result, (profile, cfg) in zip(results, configs):
+            expected = decode_monophonic_second_order(moonlight_events, profile, cfg, staff)
+            assert result.fingering == expected
+            assert result.cost == fingering_cost(moonlight_events, expected, profile, cfg, staff)
+
+
+def test_grid_axes():
+    assert parse_grid_axis("jump_bonus_1_to_4=-1:0:3") == ("jump_bonus_1_to_4", [-1.0, -0.5, 0.0])
+    assert parse_grid_axis("hand_profile=s,xl") == ("hand_profile", ["S", "XL"])
+    with pytest.raises(ValueError):
+        parse_grid_axis("no_such_weight=1")
+    grid = expand_grid([parse_grid_axis("hand_profile=S,L"), parse_grid_axis("neighbor_turn_max_interval=1,3")], PROFILE_M)
+    assert [(p.name, c.neighbor_turn_max_interval) for _, p, c in grid] == [("S", 1), ("S", 3), ("L", 1), ("L", 3)]
+    assert isinstance(grid[0][2].neighbor_turn_max_interval, int)
+    assert grid[2][1] == PROFILE_L
+
+
+def test_sweep_cli_writes_table(two_staff_path, tmp_path):
+    out = tmp_path / "sweep.csv"
+    assert app(["sweep", "--infile", str(two_staff_path), "--grid", "hand_profile=S,M",
+                "--grid", "rollover_bonus_121=-1,-0.5,0", "--fingerings", "--out", str(out)]) == 0
+    rows = list(csv.DictReader(out.open()))
+    assert len(rows) == 6
+    assert {"hand_profile", "rollover_bonus_121", "cost_staff1", "cost_staff2", "cost_total",
+            "fingering_staff1", "fingering_staff2"} <= set(rows[0])
+    assert len(rows[0]["fingering_staff1"]) == 9 and len(rows[0]["fingering_staff2"]) == 4